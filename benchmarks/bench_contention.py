@@ -0,0 +1,136 @@
+"""Multi-process write contention benchmark.
+
+    python -m benchmarks.bench_contention --storage sqlite --processes 1,2,4,8
+    python -m benchmarks.bench_contention --hot-cars 5 --operations 200 --output contention.json
+
+Each client is a separate process with its own storage engine opened on
+one shared data directory, like several terminals running main_script.py
+at once. Clients rent cars from a small shared pool (and return them),
+and top up their balance, so commits collide on the same records. For
+every client count the report gives throughput, how many commits
+succeeded or were refused, and how many had to be retried because
+another process changed a record first.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from models import stats
+from models.service import RentalService
+from models.storage import ENGINES, set_storage
+from benchmarks.datagen import parse_scale, populate
+
+
+def client(storage_name, data_dir, username, car_ids, operations, seed, results):
+    """One process: rent, return and top up until the operation budget is used"""
+    set_storage(ENGINES[storage_name](data_dir))
+    service = RentalService()
+    rng = random.Random(seed)
+    committed = rejected = 0
+    active = None
+
+    start = time.perf_counter()
+    for _ in range(operations):
+        if active:
+            result = service.return_car(username, *active)
+            active = None
+        elif rng.random() < 0.2:
+            result = service.top_up(username, 100.0)
+        else:
+            begin = date.today() + timedelta(days=rng.randrange(0, 30))
+            end = begin + timedelta(days=rng.randrange(0, 4))
+            car_id = rng.choice(car_ids)
+            result = service.rent_car(username, car_id, begin.isoformat(), end.isoformat())
+            if result:
+                active = (car_id, end.isoformat())
+        if result:
+            committed += 1
+        else:
+            rejected += 1
+    elapsed = time.perf_counter() - start
+
+    conflicts = stats.snapshot().get("(total)", {}).get("conflicts", 0)
+    results.put({"committed": committed, "rejected": rejected, "conflicts": conflicts, "elapsed_s": elapsed})
+
+
+def run(storage_name, processes, operations, hot_cars, scale, seed=42):
+    """Run processes clients against a fresh data set; returns one result row"""
+    data_dir = tempfile.mkdtemp(prefix="car-rental-contention-")
+    try:
+        storage = ENGINES[storage_name](data_dir)
+        cars, customers, rentals = populate(storage, max(scale, hot_cars), scale + processes, scale, seed)
+        idle = [c["username"] for c in customers if c["username"] not in rentals][:processes]
+        for username in idle:
+            storage.update_user(username, balance=1_000_000.0)
+        car_ids = [car["car_id"] for car in cars[:hot_cars]]
+
+        # spawn, so every client opens the stores itself as a separate program would
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        workers = [context.Process(target=client, args=(storage_name, data_dir, username, car_ids,
+                                                         operations, seed + i, results))
+                   for i, username in enumerate(idle)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        rows = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    committed = sum(r["committed"] for r in rows)
+    conflicts = sum(r["conflicts"] for r in rows)
+    return {
+        "processes": processes,
+        "operations": committed + sum(r["rejected"] for r in rows),
+        "committed": committed,
+        "rejected": sum(r["rejected"] for r in rows),
+        "conflicts": conflicts,
+        "retries_per_commit": conflicts / committed if committed else 0.0,
+        "ops_per_sec": (committed + sum(r["rejected"] for r in rows)) / max(r["elapsed_s"] for r in rows),
+        "elapsed_s": elapsed,
+    }
+
+
+def print_results(report):
+    print(f"\n{report['storage']} engine, {report['hot_cars']} shared cars, "
+          f"{report['operations']} operations per process")
+    header = f"{'processes':>10}{'ops/sec':>10}{'committed':>11}{'rejected':>10}{'conflicts':>11}{'retries/commit':>16}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        print(f"{r['processes']:>10}{r['ops_per_sec']:>10.1f}{r['committed']:>11}{r['rejected']:>10}"
+              f"{r['conflicts']:>11}{r['retries_per_commit']:>16.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure throughput and commit conflicts with several client processes")
+    parser.add_argument("--storage", choices=sorted(ENGINES), default="json")
+    parser.add_argument("--processes", default="1,2,4,8", help="comma-separated client counts to run")
+    parser.add_argument("--operations", type=int, default=100, help="operations per process")
+    parser.add_argument("--hot-cars", type=int, default=10, help="size of the car pool every client rents from")
+    parser.add_argument("--scale", default="1k", help="size of the synthetic data set (default 1k)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    scale = parse_scale(args.scale)
+    results = [run(args.storage, int(n), args.operations, args.hot_cars, scale, args.seed)
+               for n in args.processes.split(",")]
+    report = {"storage": args.storage, "hot_cars": args.hot_cars, "operations": args.operations,
+              "results": results}
+    print_results(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""On-disk format comparison for the rentals snapshot.
+
+    python -m benchmarks.bench_formats --scale 1m --output formats.json
+
+Generates a synthetic rental history (see benchmarks.datagen) and, for
+every serializer in models.serializers, writes it as the rentals store
+and reads it back, reporting file size and save/load latency.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+from models.fileio import read_document, write_document
+from models.serializers import SERIALIZERS
+from benchmarks.bench_storage import measure
+from benchmarks.datagen import generate_cars, generate_customers, generate_rentals, parse_scale
+
+
+def run(rentals, repeat, data_dir, seed=42):
+    rng = random.Random(seed)
+    cars = generate_cars(max(1, rentals // 100), rng)
+    customers = generate_customers(max(1, rentals // 10), rng)
+    document = generate_rentals(rentals, cars, customers, rng)
+
+    results = []
+    for name, serializer in SERIALIZERS.items():
+        path = os.path.join(data_dir, "rentals" + serializer.extension)
+        save = measure(f"{name} save", lambda: write_document(path, document, serializer), repeat)
+        load = measure(f"{name} load", lambda: read_document(path, serializer), repeat)
+        results.append({
+            "format": name,
+            "size_kb": os.stat(path).st_size / 1024,
+            "save_p50_ms": save["p50_ms"],
+            "load_p50_ms": load["p50_ms"],
+            "load_peak_mem_kb": load["peak_mem_kb"],
+        })
+        os.remove(path)
+    return {"rentals": rentals, "repeat": repeat, "results": results}
+
+
+def print_results(report):
+    print(f"\nrentals snapshot with {report['rentals']} rentals, {report['repeat']} runs each")
+    header = f"{'format':<10}{'size KB':>12}{'vs json':>9}{'save ms':>10}{'load ms':>10}{'vs json':>9}"
+    print(header)
+    print("-" * len(header))
+    base = report["results"][0]
+    for r in report["results"]:
+        print(f"{r['format']:<10}{r['size_kb']:>12.1f}{base['size_kb'] / r['size_kb']:>8.1f}x"
+              f"{r['save_p50_ms']:>10.1f}{r['load_p50_ms']:>10.1f}"
+              f"{base['load_p50_ms'] / r['load_p50_ms']:>8.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the on-disk formats of the file engine")
+    parser.add_argument("--scale", default="100k", help="number of rentals: 1k, 100k, 1m or a number")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per format")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    data_dir = tempfile.mkdtemp(prefix="car-rental-formats-")
+    try:
+        report = run(parse_scale(args.scale), args.repeat, data_dir)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print_results(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""HTTP load test of the rental server.
+
+    python -m benchmarks.bench_http --storage sqlite --clients 1,8,32
+    python -m benchmarks.bench_http --scale 100k --requests 500 --workers 16 --output http.json
+
+Starts models.server in its own process on a generated data set and
+drives it from this process with concurrent keep-alive connections, one
+per client. Each client searches the fleet, lists cars, rents a car and
+returns it, tops up its balance and reads the reports, in proportions
+like a busy front desk. For every client count the report gives
+requests/sec and latency percentiles per endpoint; refused operations
+(409, e.g. a car someone else just booked) are counted separately from
+errors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from models.storage import ENGINES
+from benchmarks.bench_storage import percentile
+from benchmarks.datagen import parse_scale, populate
+
+# Share of requests per endpoint; renting includes the matching return
+MIX = [
+    ("search", 0.45),
+    ("list", 0.15),
+    ("rent", 0.2),
+    ("top_up", 0.1),
+    ("history", 0.05),
+    ("report", 0.05),
+]
+BRANDS = ["Toyota", "Honda", "Ford", "Tesla", "BMW", "Kia"]
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection speaking JSON"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        """Send one request; returns (status, decoded JSON body)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+async def client(host, port, username, car_ids, requests, seed, samples):
+    """Issue requests from the mix on one connection, recording (endpoint, status, seconds)"""
+    rng = random.Random(seed)
+    connection = Client(host, port)
+    names, weights = zip(*MIX)
+    try:
+        for _ in range(requests):
+            endpoint = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            if endpoint == "search":
+                status, _ = await connection.request(
+                    "GET", f"/cars/search?brand={rng.choice(BRANDS)}&max_price={rng.randrange(40, 200)}&limit=20")
+            elif endpoint == "list":
+                status, _ = await connection.request("GET", f"/cars?page_size=20&cursor={rng.choice(car_ids)}")
+            elif endpoint == "rent":
+                begin = date.today() + timedelta(days=rng.randrange(0, 60))
+                end = begin + timedelta(days=rng.randrange(0, 4))
+                car_id = rng.choice(car_ids)
+                status, _ = await connection.request("POST", "/rentals", {
+                    "username": username, "car_id": car_id,
+                    "start_date": begin.isoformat(), "end_date": end.isoformat()})
+                if status == 200:
+                    samples.append(("rent", status, time.perf_counter() - start))
+                    endpoint, start = "return", time.perf_counter()
+                    status, _ = await connection.request("POST", "/returns", {
+                        "username": username, "car_id": car_id, "return_date": end.isoformat()})
+            elif endpoint == "top_up":
+                status, _ = await connection.request("POST", f"/customers/{username}/top-up", {"amount": 50})
+            elif endpoint == "history":
+                status, _ = await connection.request("GET", f"/customers/{username}/rentals?page_size=20")
+            else:
+                status, _ = await connection.request("GET", "/reports/active-rentals")
+            samples.append((endpoint, status, time.perf_counter() - start))
+    finally:
+        await connection.close()
+
+
+def start_server(storage_name, data_dir, workers, write_behind=False):
+    """Start models.server on a free port; returns (process, port)"""
+    env = dict(os.environ, CAR_RENTAL_STORAGE=storage_name, CAR_RENTAL_DATA_DIR=data_dir,
+               CAR_RENTAL_WRITE_BEHIND="1" if write_behind else "")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    process = subprocess.Popen([sys.executable, "-m", "models.server", "--port", "0", "--workers", str(workers)],
+                               env=env, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Serving on"):
+        process.kill()
+        raise RuntimeError(f"The server did not start: {line!r}")
+    return process, int(line.split()[2].rsplit(":", 1)[1])
+
+
+async def warm_up(port):
+    """One search, so the server has loaded the fleet before anything is timed"""
+    connection = Client("127.0.0.1", port)
+    try:
+        await connection.request("GET", "/cars/search?limit=1")
+    finally:
+        await connection.close()
+
+
+async def drive(port, usernames, car_ids, requests, seed):
+    samples = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client("127.0.0.1", port, username, car_ids, requests, seed + i, samples)
+                           for i, username in enumerate(usernames)))
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    """Count and latency percentiles per endpoint, plus the overall row"""
+    rows = {}
+    for endpoint in sorted({s[0] for s in samples}) + ["(total)"]:
+        chosen = [s for s in samples if endpoint in (s[0], "(total)")]
+        latencies = sorted(s[2] for s in chosen)
+        rows[endpoint] = {
+            "count": len(chosen),
+            "refused": sum(1 for s in chosen if s[1] == 409),
+            "errors": sum(1 for s in chosen if s[1] not in (200, 409)),
+            "requests_per_sec": len(chosen) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+    return rows
+
+
+def run(storage_name, clients, requests, workers, scale, write_behind=False, seed=42):
+    """Load a fresh server with clients connections; returns one result row"""
+    data_dir = tempfile.mkdtemp(prefix="car-rental-http-")
+    process = None
+    try:
+        storage = ENGINES[storage_name](data_dir)
+        cars, customers, rentals = populate(storage, scale, scale + clients, scale, seed)
+        usernames = [c["username"] for c in customers if c["username"] not in rentals][:clients]
+        for username in usernames:
+            storage.update_user(username, balance=1_000_000.0)
+        car_ids = [car["car_id"] for car in cars]
+        del storage
+
+        process, port = start_server(storage_name, data_dir, workers, write_behind)
+        asyncio.run(warm_up(port))
+        samples, elapsed = asyncio.run(drive(port, usernames, car_ids, requests, seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {"clients": clients, "elapsed_s": elapsed, "endpoints": summarize(samples, elapsed)}
+
+
+def print_results(report):
+    mode = ", write-behind" if report["write_behind"] else ""
+    print(f"\n{report['storage']} engine{mode}, {report['records']} records, {report['workers']} server threads, "
+          f"{report['requests']} requests per client")
+    for result in report["results"]:
+        print(f"\n{result['clients']} clients")
+        header = (f"{'endpoint':<10}{'count':>8}{'refused':>9}{'errors':>8}{'req/sec':>10}"
+                  f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        print(header)
+        print("-" * len(header))
+        for endpoint, r in result["endpoints"].items():
+            print(f"{endpoint:<10}{r['count']:>8}{r['refused']:>9}{r['errors']:>8}{r['requests_per_sec']:>10.1f}"
+                  f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure requests/sec of the HTTP server under concurrent clients")
+    parser.add_argument("--storage", choices=sorted(ENGINES), default="json")
+    parser.add_argument("--clients", default="1,8,32", help="comma-separated connection counts to run")
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--workers", type=int, default=8, help="server thread pool size")
+    parser.add_argument("--scale", default="1k", help="size of the synthetic data set (default 1k)")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="run the server with write-behind persistence (see models.write_behind)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    scale = parse_scale(args.scale)
+    results = [run(args.storage, int(n), args.requests, args.workers, scale, args.write_behind, args.seed)
+               for n in args.clients.split(",")]
+    report = {"storage": args.storage, "write_behind": args.write_behind, "records": scale,
+              "workers": args.workers, "requests": args.requests, "results": results}
+    print_results(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
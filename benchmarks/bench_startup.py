@@ -0,0 +1,127 @@
+"""Cold start benchmark.
+
+    python -m benchmarks.bench_startup --scale 1m
+    python -m benchmarks.bench_startup --storage json,mmap --repeat 5 --output startup.json
+
+Every measurement starts a fresh interpreter on a generated data set,
+as running main_script.py does, and reports (median of --repeat runs):
+
+    import       importing main_script and the models it needs
+    first menu   import plus opening the storage engine and the checks
+                 initialize_system makes before the main menu is shown
+    login        looking up a customer through the username index
+    first search the first fleet search, which loads the fleet and
+                 builds its indexes
+    snapshot     the same search with a fleet snapshot saved (see
+                 models.snapshot); "-" for engines that cannot use one
+
+The data files are in the OS page cache, so this measures the work the
+program does rather than the disk. Imports are timed from cached
+bytecode; without it (PYTHONDONTWRITEBYTECODE) they include compiling.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Run in a new interpreter, so nothing is imported or cached beforehand
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import main_script
+imported = time.perf_counter()
+main_script.initialize_system()
+ready = time.perf_counter()
+main_script.get_user("user0")
+logged_in = time.perf_counter()
+from models.fleet import FleetRepository
+FleetRepository.search(max_price=50.0)
+searched = time.perf_counter()
+if "--save-snapshot" in sys.argv:
+    FleetRepository.save_snapshot()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_menu_ms": (ready - start) * 1000,
+                  "login_ms": (logged_in - ready) * 1000, "first_search_ms": (searched - logged_in) * 1000,
+                  "snapshot": FleetRepository._snapshot_key is not None}))
+"""
+
+
+def start(storage_name, data_dir, save_snapshot=False):
+    """Start the program once in a new process; returns its timings"""
+    env = dict(os.environ, CAR_RENTAL_STORAGE=storage_name, CAR_RENTAL_DATA_DIR=data_dir)
+    env.pop("CAR_RENTAL_WRITE_BEHIND", None)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    args = [sys.executable, "-c", CHILD] + (["--save-snapshot"] if save_snapshot else [])
+    output = subprocess.run(args, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def median(runs, key):
+    return statistics.median(run[key] for run in runs)
+
+
+def run(storage_name, scale, repeat, seed=42):
+    """Measure one engine on a fresh data set; returns one result row"""
+    from benchmarks.datagen import populate
+    from models.storage import ENGINES
+
+    data_dir = tempfile.mkdtemp(prefix="car-rental-startup-")
+    try:
+        populate(ENGINES[storage_name](data_dir), scale, scale, scale, seed)
+        cold = [start(storage_name, data_dir) for _ in range(repeat)]
+        # Saves the snapshot the following runs start from, if the engine can use one
+        start(storage_name, data_dir, save_snapshot=True)
+        warm = [start(storage_name, data_dir) for _ in range(repeat)]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {
+        "storage": storage_name,
+        "records": scale,
+        "import_ms": median(cold, "import_ms"),
+        "first_menu_ms": median(cold, "first_menu_ms"),
+        "login_ms": median(cold, "login_ms"),
+        "first_search_ms": median(cold, "first_search_ms"),
+        "snapshot_search_ms": median(warm, "first_search_ms") if all(r["snapshot"] for r in warm) else None,
+    }
+
+
+def print_results(report):
+    print(f"\nStartup with {report['records']} cars, customers and rentals, "
+          f"median of {report['repeat']} runs (ms)")
+    header = f"{'storage':<10}{'import':>10}{'first menu':>12}{'login':>10}{'first search':>14}{'snapshot':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        snapshot = "-" if r["snapshot_search_ms"] is None else f"{r['snapshot_search_ms']:.1f}"
+        print(f"{r['storage']:<10}{r['import_ms']:>10.1f}{r['first_menu_ms']:>12.1f}{r['login_ms']:>10.1f}"
+              f"{r['first_search_ms']:>14.1f}{snapshot:>10}")
+
+
+def main(argv=None):
+    from benchmarks.datagen import parse_scale
+    from models.storage import ENGINES
+
+    parser = argparse.ArgumentParser(description="Measure time to the first menu, login and search of a fresh process")
+    parser.add_argument("--storage", default=",".join(sorted(ENGINES)), help="comma-separated engines to measure")
+    parser.add_argument("--scale", default="100k", help="size of the synthetic data set (default 100k)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the median is reported")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    scale = parse_scale(args.scale)
+    results = [run(name, scale, args.repeat, args.seed) for name in args.storage.split(",")]
+    report = {"records": scale, "repeat": args.repeat, "results": results}
+    print_results(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Storage-layer microbenchmarks.
+
+    python -m benchmarks.bench_storage --scale 100k --storage json --output results.json
+    python -m benchmarks.bench_storage --scale 100k --compare results.json
+
+Generates a synthetic data directory (see benchmarks.datagen), then times
+each load/save/lookup/update path of the models layer. For every path it
+reports latency percentiles and the peak traced memory of one extra run,
+and can write the results as JSON and compare them against an earlier
+results file to spot regressions.
+"""
+import argparse
+import json
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from models.car import Car
+from models.customer import Customer
+from models.fleet import FleetRepository
+from models.rental import RentalManager
+from models.storage import ENGINES, set_storage
+from benchmarks.datagen import parse_scale, populate
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(name, func, repeat, setup=None):
+    """Time func repeat times and trace the peak memory of one more call"""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": name,
+        "runs": repeat,
+        "mean_ms": statistics.mean(samples) * 1000,
+        "min_ms": min(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples) * 1000,
+        "peak_mem_kb": peak / 1024,
+    }
+
+
+def run(storage_name, data_dir, cars, customers, rentals, repeat, lookups, seed=42):
+    engine_class = ENGINES[storage_name]
+    storage = engine_class(data_dir)
+    set_storage(storage)
+    car_records, customer_records, _ = populate(storage, cars, customers, rentals, seed)
+    FleetRepository.invalidate()
+
+    rng = random.Random(seed)
+    car_ids = [car["car_id"] for car in car_records]
+    usernames = [customer["username"] for customer in customer_records]
+    fleet = Car.load_cars()
+    rental_snapshot = RentalManager.load_rentals()
+    sample_customer = Customer(**storage.get_user(rng.choice(usernames)))
+
+    def cold_rentals():
+        # A fresh engine has no in-process rental state to reuse
+        engine_class(data_dir).load_rentals()
+
+    def lookup_cars():
+        for _ in range(lookups):
+            Car.get_car_by_id(rng.choice(car_ids))
+
+    def lookup_users():
+        for _ in range(lookups):
+            storage.get_user(rng.choice(usernames))
+
+    def toggle_availability():
+        car_id = rng.choice(car_ids)
+        car = Car.get_car_by_id(car_id)
+        Car.update_car_availability(car_id, not car.available)
+
+    def add_rental():
+        RentalManager.add_rental(rng.choice(usernames), {
+            "car_id": rng.choice(car_ids), "start_date": "2020-01-01", "end_date": "2020-01-02",
+            "days": 2, "total_cost": 100.0, "status": "completed",
+            "return_date": "2020-01-02", "fine_amount": 0,
+        })
+
+    results = [
+        measure("Car.load_cars (cold)", Car.load_cars, repeat, setup=FleetRepository.invalidate),
+        measure("Car.load_cars (cached)", Car.load_cars, repeat),
+        measure("Car.save_cars", lambda: Car.save_cars(fleet), repeat),
+        measure(f"Car.get_car_by_id x{lookups}", lookup_cars, repeat),
+        measure("Car.update_car_availability", toggle_availability, repeat),
+        measure("RentalManager.load_rentals (cold)", cold_rentals, repeat),
+        measure("RentalManager.load_rentals", RentalManager.load_rentals, repeat),
+        measure("RentalManager.save_rentals", lambda: RentalManager.save_rentals(rental_snapshot), repeat),
+        measure("RentalManager.add_rental", add_rental, repeat),
+        measure("load_users", storage.load_users, repeat),
+        measure(f"get_user x{lookups}", lookup_users, repeat),
+        measure("Customer._update_customer_data", sample_customer._update_customer_data, repeat),
+    ]
+
+    return {
+        "storage": storage_name,
+        "cars": cars,
+        "customers": customers,
+        "rentals": rentals,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def print_results(report, baseline=None):
+    previous = {}
+    if baseline:
+        previous = {r["name"]: r for r in baseline["results"]}
+
+    print(f"\n{report['storage']} storage: {report['cars']} cars, {report['customers']} customers, "
+          f"{report['rentals']} rentals, {report['repeat']} runs each")
+    header = f"{'operation':<38}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KB':>12}"
+    if previous:
+        header += f"{'p50 vs base':>14}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        line = f"{r['name']:<38}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['peak_mem_kb']:>12.1f}"
+        if r["name"] in previous and previous[r["name"]]["p50_ms"] > 0:
+            line += f"{r['p50_ms'] / previous[r['name']]['p50_ms']:>13.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the storage layer")
+    parser.add_argument("--scale", default="1k", help="1k, 100k, 1m or a number (default 1k)")
+    parser.add_argument("--cars", type=int)
+    parser.add_argument("--customers", type=int)
+    parser.add_argument("--rentals", type=int)
+    parser.add_argument("--storage", choices=sorted(ENGINES), default="json")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per operation")
+    parser.add_argument("--lookups", type=int, default=1000, help="point lookups per lookup run")
+    parser.add_argument("--data-dir", help="where to generate data (default: a temporary directory)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    scale = parse_scale(args.scale)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="car-rental-bench-")
+    try:
+        report = run(args.storage, data_dir, args.cars or scale, args.customers or scale,
+                     args.rentals or scale, args.repeat, args.lookups)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    print_results(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Synthetic data generator for benchmarks.
+
+    python -m benchmarks.datagen /tmp/bench-data --scale 100k
+    python -m benchmarks.datagen /tmp/bench-data --cars 5000 --customers 20000 --rentals 1000000 --storage sqlite
+
+Writes a fleet, customer accounts and rental histories through the
+storage engines, so the result is a normal data directory.
+"""
+import argparse
+import random
+from datetime import date, timedelta
+from models.storage import ENGINES
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+BRANDS = {
+    "Toyota": ["Corolla", "Camry", "RAV4", "Yaris"],
+    "Honda": ["Civic", "Accord", "CR-V", "Jazz"],
+    "Ford": ["Mustang", "Focus", "Explorer", "Fiesta"],
+    "Tesla": ["Model 3", "Model Y", "Model S"],
+    "BMW": ["X5", "3 Series", "i4"],
+    "Kia": ["Rio", "Sportage", "Picanto"],
+}
+
+
+def parse_scale(value):
+    value = value.lower()
+    if value in SCALES:
+        return SCALES[value]
+    return int(value)
+
+
+def generate_cars(count, rng):
+    cars = []
+    brands = list(BRANDS)
+    for i in range(count):
+        brand = rng.choice(brands)
+        cars.append({
+            "car_id": str(1001 + i),
+            "brand": brand,
+            "model": rng.choice(BRANDS[brand]),
+            "seating_capacity": rng.choice([2, 4, 5, 5, 5, 7, 8]),
+            "rental_price": float(rng.randrange(30, 200)),
+            "available": True,
+        })
+    return cars
+
+
+def generate_customers(count, rng):
+    return [{
+        "username": f"user{i}",
+        "password": f"pw{i}",
+        "first_name": f"First{i}",
+        "last_name": f"Last{i}",
+        "balance": float(rng.randrange(0, 5000)),
+    } for i in range(count)]
+
+
+def generate_rentals(count, cars, customers, rng, today=None, active_share=0.05):
+    """Rental histories over the last two years; a few are still active.
+
+    Active rentals use distinct cars and customers so the data respects the
+    one-active-rental rules. Their cars are marked unavailable.
+    """
+    today = today or date.today()
+    rentals = {}
+    active_budget = min(int(count * active_share), len(cars), len(customers))
+    active_cars = rng.sample(range(len(cars)), active_budget)
+    active_customers = rng.sample(range(len(customers)), active_budget)
+
+    for i in range(count):
+        if i < active_budget:
+            car = cars[active_cars[i]]
+            customer = customers[active_customers[i]]
+            start = today - timedelta(days=rng.randrange(0, 7))
+        else:
+            car = cars[rng.randrange(len(cars))]
+            customer = customers[rng.randrange(len(customers))]
+            start = today - timedelta(days=rng.randrange(15, 730))
+
+        days = rng.randrange(1, 15)
+        end = start + timedelta(days=days - 1)
+        rental = {
+            "rental_id": f"r{i}",
+            "car_id": car["car_id"],
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "days": days,
+            "total_cost": days * car["rental_price"],
+            "status": "active",
+            "return_date": None,
+            "fine_amount": 0,
+        }
+        if i < active_budget:
+            car["available"] = False
+        else:
+            days_late = rng.choice([0, 0, 0, 0, 0, 0, 1, 2, 3])
+            rental["status"] = "completed"
+            rental["return_date"] = (end + timedelta(days=days_late)).isoformat()
+            rental["fine_amount"] = days_late * car["rental_price"] * 1.5
+
+        rentals.setdefault(customer["username"], []).append(rental)
+    return rentals
+
+
+def populate(storage, cars=1000, customers=1000, rentals=1000, seed=42):
+    """Fill a storage engine with synthetic data and return the generated records"""
+    rng = random.Random(seed)
+    car_records = generate_cars(cars, rng)
+    customer_records = generate_customers(customers, rng)
+    rental_records = generate_rentals(rentals, car_records, customer_records, rng)
+
+    storage.save_cars(car_records)
+    storage.save_users(customer_records)
+    storage.save_rentals(rental_records)
+    if storage.get_admin("admin") is None:
+        storage.add_admin({"username": "admin", "password": "admin123",
+                           "first_name": "System", "last_name": "Admin"})
+    return car_records, customer_records, rental_records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic car rental data directory")
+    parser.add_argument("data_dir")
+    parser.add_argument("--scale", default="1k", help="1k, 100k, 1m or a number (default 1k)")
+    parser.add_argument("--cars", type=int, help="fleet size (default: scale)")
+    parser.add_argument("--customers", type=int, help="customer accounts (default: scale)")
+    parser.add_argument("--rentals", type=int, help="rental records (default: scale)")
+    parser.add_argument("--storage", choices=sorted(ENGINES), default="json")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    scale = parse_scale(args.scale)
+    storage = ENGINES[args.storage](args.data_dir)
+    cars, customers, rentals = populate(storage, args.cars or scale, args.customers or scale,
+                                        args.rentals or scale, args.seed)
+    print(f"Wrote {len(cars)} cars, {len(customers)} customers and "
+          f"{sum(map(len, rentals.values()))} rentals to {args.data_dir} ({args.storage})")
+
+
+if __name__ == "__main__":
+    main()
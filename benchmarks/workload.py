@@ -0,0 +1,230 @@
+"""End-to-end workload simulator.
+
+    python -m benchmarks.workload --clients 8 --operations 2000
+    python -m benchmarks.workload --clients 16 --duration 30 --mix rent=40,return=40,topup=10,report=10
+
+Simulated clients run concurrently (one thread each) against a synthetic
+data directory and drive the real flows through models.service instead of
+the input() menus: registration, login, renting, returning, balance
+top-ups and admin reports, chosen at random according to the mix. The
+report gives throughput and latency percentiles per operation type.
+"""
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from models.fleet import FleetRepository
+from models.service import RentalService
+from models.storage import ENGINES, set_storage
+from models.write_behind import WriteBehindStorage
+from benchmarks.bench_storage import percentile
+from benchmarks.datagen import parse_scale, populate
+
+DEFAULT_MIX = "login=15,register=5,browse=10,rent=25,return=25,topup=10,history=5,report=5"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(SimulatedClient.OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+class SimulatedClient:
+    """One scripted customer session issuing operations from a weighted mix"""
+
+    OPERATIONS = ("login", "register", "browse", "rent", "return", "topup", "history", "report")
+
+    def __init__(self, client_id, service, username, password, mix, rng):
+        self.client_id = client_id
+        self.service = service
+        self.username = username
+        self.password = password
+        self.rng = rng
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.active = None
+        self.registered = 0
+
+    def login(self):
+        return self.service.login(self.username, self.password)
+
+    def register(self):
+        self.registered += 1
+        name = f"sim{self.client_id}_{self.registered}"
+        return self.service.register(name, "pw", "Sim", "Client", 500.0)
+
+    def browse(self):
+        start = date.today() + timedelta(days=self.rng.randrange(0, 30))
+        return self.service.available_cars(start.isoformat(), (start + timedelta(days=3)).isoformat())
+
+    def rent(self):
+        start = date.today() + timedelta(days=self.rng.randrange(0, 30))
+        end = start + timedelta(days=self.rng.randrange(0, 7))
+        free = self.service.available_cars(start.isoformat(), end.isoformat()).data
+        if not free:
+            return self.service.available_cars()
+        car = self.rng.choice(free)
+        result = self.service.rent_car(self.username, car.car_id, start.isoformat(), end.isoformat())
+        if result:
+            self.active = (car.car_id, end)
+        return result
+
+    def return_(self):
+        if not self.active:
+            return self.service.rental_history(self.username)
+        car_id, end = self.active
+        returned = end + timedelta(days=self.rng.choice([0, 0, 0, 1, 2]))
+        result = self.service.return_car(self.username, car_id, returned.isoformat())
+        self.active = None
+        return result
+
+    def topup(self):
+        return self.service.top_up(self.username, float(self.rng.randrange(50, 500)))
+
+    def history(self):
+        return self.service.rental_history(self.username)
+
+    def report(self):
+        return self.rng.choice([
+            self.service.active_rentals_report,
+            self.service.customer_rentals_report,
+            lambda: self.service.customer_history_report(self.username),
+        ])()
+
+    def step(self):
+        """Run one operation; returns (name, ok, seconds)"""
+        name = self.rng.choices(self.names, self.weights)[0]
+        handler = self.return_ if name == "return" else getattr(self, name)
+        start = time.perf_counter()
+        result = handler()
+        return name, bool(result), time.perf_counter() - start
+
+
+def simulate(service, clients, mix, operations=None, duration=None, seed=42):
+    """Run the clients concurrently until the operation budget or time is used up"""
+    samples = {name: [] for name in mix}
+    failures = {name: 0 for name in mix}
+    lock = threading.Lock()
+    remaining = [operations] if operations else None
+    deadline = time.perf_counter() + duration if duration else None
+
+    def take_ticket():
+        if remaining is None:
+            return time.perf_counter() < deadline
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(client):
+        local = []
+        while take_ticket():
+            local.append(client.step())
+        with lock:
+            for name, ok, seconds in local:
+                samples[name].append(seconds)
+                if not ok:
+                    failures[name] += 1
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for name, latencies in samples.items():
+        if not latencies:
+            continue
+        results.append({
+            "operation": name,
+            "count": len(latencies),
+            "rejected": failures[name],
+            "ops_per_sec": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies) * 1000,
+        })
+    total = sum(r["count"] for r in results)
+    return {"clients": len(clients), "elapsed_s": elapsed, "operations": total,
+            "ops_per_sec": total / elapsed if elapsed else 0.0, "results": results}
+
+
+def print_report(report):
+    print(f"\n{report['operations']} operations from {report['clients']} clients in "
+          f"{report['elapsed_s']:.2f}s ({report['ops_per_sec']:,.1f} ops/sec)")
+    if report.get("write_behind"):
+        print(f"write-behind: {report['flush_s'] * 1000:.1f} ms to flush the queue after the run")
+    header = f"{'operation':<12}{'count':>8}{'rejected':>10}{'ops/sec':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        print(f"{r['operation']:<12}{r['count']:>8}{r['rejected']:>10}{r['ops_per_sec']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated clients through the rental flows")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--operations", type=int, help="total operations across all clients (default 1000)")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--scale", default="1k", help="size of the synthetic data set (default 1k)")
+    parser.add_argument("--storage", choices=sorted(ENGINES), default="json")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="persist changes on a background writer thread (see models.write_behind)")
+    parser.add_argument("--data-dir", help="where to generate data (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    operations = args.operations or (None if args.duration else 1000)
+    mix = parse_mix(args.mix)
+    scale = parse_scale(args.scale)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="car-rental-workload-")
+    try:
+        storage = ENGINES[args.storage](data_dir)
+        # Clients start with no rentals so their sessions stay independent
+        _, customers, rentals = populate(storage, scale, scale + args.clients, scale, args.seed)
+        if args.write_behind:
+            storage = WriteBehindStorage(storage)
+        set_storage(storage)
+        FleetRepository.invalidate()
+        idle = [c for c in customers if c["username"] not in rentals][:args.clients]
+        service = RentalService()
+        clients = [SimulatedClient(i, service, c["username"], c["password"], mix, random.Random(args.seed + i))
+                   for i, c in enumerate(idle)]
+        report = simulate(service, clients, mix, operations, args.duration, args.seed)
+        # Writes still queued count towards the run
+        start = time.perf_counter()
+        storage.flush()
+        report["flush_s"] = time.perf_counter() - start
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report["storage"] = args.storage
+    report["write_behind"] = args.write_behind
+    report["mix"] = mix
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,91 @@
 from models.customer import Customer
 from models.admin import Admin
 from models.car import Car
+from models.paging import PAGE_SIZE
 from models.rental import RentalManager
-import json
+from models import stats
+from models.stats import track
+from models.fleet import FleetRepository
+from models.storage import STORAGE_ENGINE, file_data_present, get_storage
 import os
 import time
-from getpass import getpass
 import sys
-import os
-import msvcrt
 
 
 def get_password(prompt="Password: "):
-    """Reads password from user input with * display"""
+    """Reads password from user input with * display (hidden input outside Windows)"""
+    if os.name != 'nt':
+        from getpass import getpass
+        return getpass(prompt)
+
+    import msvcrt
     print(prompt, end='', flush=True)
     password = ''
     
-    if os.name == 'nt':
-        while True:
-            char = msvcrt.getch()
-            if char in {b'\r', b'\n'}:
-                print('')
-                break
-            elif char == b'\x08':  # Backspace
-                if len(password) > 0:
-                    password = password[:-1]
-                    print('\b \b', end='', flush=True)
-            elif char == b'\x03':  # Ctrl+C
-                raise KeyboardInterrupt
-            else:
-                password += char.decode('utf-8', errors='ignore')
-                print('*', end='', flush=True)
+    while True:
+        char = msvcrt.getch()
+        if char in {b'\r', b'\n'}:
+            print('')
+            break
+        elif char == b'\x08':  # Backspace
+            if len(password) > 0:
+                password = password[:-1]
+                print('\b \b', end='', flush=True)
+        elif char == b'\x03':  # Ctrl+C
+            raise KeyboardInterrupt
+        else:
+            password += char.decode('utf-8', errors='ignore')
+            print('*', end='', flush=True)
     
     return password
 
-# Helper functions for file management
+# Helper functions for the user store
+@track("load_users")
 def load_users():
-    if not os.path.exists("data"):
-        os.makedirs("data")
-        
-    if not os.path.exists("data/users.json") or os.stat("data/users.json").st_size == 0:
-        return []
-    
     try:
-        with open("data/users.json", "r") as f:
-            return json.load(f)
+        return get_storage().load_users()
     except Exception as e:
         print(f"Error loading users: {e}")
         return []
 
+@track("save_users")
 def save_users(users):
-    if not os.path.exists("data"):
-        os.makedirs("data")
-        
     try:
-        with open("data/users.json", "w") as f:
-            json.dump(users, f, indent=4)
+        get_storage().save_users(users)
     except Exception as e:
         print(f"Error saving users: {e}")
 
+@track("get_user")
+def get_user(username):
+    try:
+        return get_storage().get_user(username)
+    except Exception as e:
+        print(f"Error loading users: {e}")
+        return None
+
+@track("save_user")
 def save_user(customer):
-    users = load_users()
-    for u in users:
-        if u["username"] == customer.username:
+    try:
+        if not get_storage().add_user(customer.to_dict()):
             print("Username already exists.")
             return False
-    users.append(customer.__dict__)
-    save_users(users)
+    except Exception as e:
+        print(f"Error saving users: {e}")
+        return False
     print("Customer registered successfully.")
     return True
 
 def initialize_system():
-    """Setup initial data directories and sample data if needed"""
-    # Create data directory if it doesn't exist
-    if not os.path.exists("data"):
-        os.makedirs("data")
-    
+    """Setup initial sample data if needed"""
+    storage = get_storage()
+    # Switching engines starts from an empty store: point at the copy tool instead of seeding samples
+    if (STORAGE_ENGINE == "sqlite" and file_data_present()
+            and all(storage.is_empty(store) for store in ("cars", "users", "admins"))):
+        print("The SQLite database is empty, but the data directory holds data saved by the file engines.")
+        print("Copy it with: python -m models.storage copy --from json --to sqlite")
+        return
     # Add sample cars if no cars exist
-    if not os.path.exists("data/cars.json") or os.stat("data/cars.json").st_size == 0:
+    if storage.is_empty("cars"):
         sample_cars = [
             Car("1001", "Toyota", "Corolla", 5, 50.0),
             Car("1002", "Honda", "Civic", 5, 55.0),
@@ -89,7 +97,7 @@ def initialize_system():
         print("Sample cars added to the system.")
     
     # Add default admin if no admins exist
-    if not os.path.exists("data/admins.json") or os.stat("data/admins.json").st_size == 0:
+    if storage.is_empty("admins"):
         default_admin = Admin("admin", "admin123", "System", "Admin")
         Admin.save_admin(default_admin)
         print("Default admin account created (username: admin, password: admin123)")
@@ -115,14 +123,16 @@ def main_menu():
         elif choice == '2':
             register()
         elif choice == '3':
-            Car.display_available_cars()
+            Car.display_available_cars(page_size=PAGE_SIZE)
             input("\nPress Enter to continue...")
         elif choice == '4':
+            save_changes()
             print("\nThank you for using the Car Rental System. Goodbye!")
             break
         else:
             print("Invalid choice. Please select 1, 2, 3, or 4.")
 
+@track("register")
 def register():
     """Register a new customer only"""
     print("\n=== CUSTOMER REGISTRATION ===")
@@ -147,6 +157,35 @@ def register():
     except ValueError:
         print("Invalid balance amount. Please enter a number.")
 
+@track("search_cars")
+def search_cars():
+    """Search the fleet by brand, model, seats and price (blank to skip a filter)"""
+    print("\n=== SEARCH CARS ===")
+    
+    brand = input("Brand: ").strip() or None
+    model = input("Model: ").strip() or None
+    
+    try:
+        min_seats = input("Minimum seats: ").strip()
+        min_price = input("Minimum price per day: $").strip()
+        max_price = input("Maximum price per day: $").strip()
+        min_seats = int(min_seats) if min_seats else None
+        min_price = float(min_price) if min_price else None
+        max_price = float(max_price) if max_price else None
+    except ValueError:
+        print("Invalid input. Please enter numeric values for seats and prices.")
+        return
+    
+    cars = Car.search(brand, model, min_seats, min_price, max_price)
+    if not cars:
+        print("No cars match your search.")
+        return
+    
+    print(f"\n=== {len(cars)} MATCHING CARS ===")
+    for car in cars:
+        print(car)
+
+@track("login")
 def login():
     """Handle user login for both admin and customer"""
     print("\n=== LOGIN ===")
@@ -155,23 +194,21 @@ def login():
     password = get_password("Password: ")
     
     # Check admin login first
-    admins = Admin.load_admins()
-    for a in admins:
-        if a["username"] == username and a["password"] == password:
-            print("\nAdmin login successful.")
-            time.sleep(0.5)
-            admin_menu()
-            return
+    a = Admin.get_admin(username)
+    if a and a["password"] == password:
+        print("\nAdmin login successful.")
+        time.sleep(0.5)
+        admin_menu()
+        return
     
     # Check customer login
-    users = load_users()
-    for u in users:
-        if u["username"] == username and u["password"] == password:
-            print("\nCustomer login successful.")
-            time.sleep(0.5)
-            customer = Customer(**u)
-            customer_menu(customer)
-            return
+    u = get_user(username)
+    if u and u["password"] == password:
+        print("\nCustomer login successful.")
+        time.sleep(0.5)
+        customer = Customer(**u)
+        customer_menu(customer)
+        return
     
     print("Login failed. Incorrect username or password.")
 
@@ -185,7 +222,8 @@ def admin_menu():
         print("2. Remove Car")
         print("3. View All Cars")
         print("4. View Rental Reports")
-        print("5. Logout")
+        print("5. Search Cars")
+        print("6. Logout")
         
         choice = input("\nChoose an option: ")
         
@@ -194,15 +232,19 @@ def admin_menu():
         elif choice == '2':
             Admin.remove_car()
         elif choice == '3':
-            Car.display_all_cars()
+            Car.display_all_cars(page_size=PAGE_SIZE)
             input("\nPress Enter to continue...")
         elif choice == '4':
             Admin.view_rentals()
         elif choice == '5':
+            search_cars()
+            input("\nPress Enter to continue...")
+        elif choice == '6':
+            save_changes()
             print("Logging out as Admin.")
             break
         else:
-            print("Invalid choice. Please select 1 to 5.")
+            print("Invalid choice. Please select 1 to 6.")
 
 def customer_menu(customer):
     """Display customer menu and handle customer interactions"""
@@ -218,43 +260,42 @@ def customer_menu(customer):
         print("5. View Rental History")
         print("6. View Personal Info")
         print("7. View Rental Policy")
-        print("8. Logout")
+        print("8. Search Cars")
+        print("9. Logout")
         
         choice = input("\nChoose an option: ")
         
         if choice == '1':
-            Car.display_available_cars()
+            Car.display_available_cars(page_size=PAGE_SIZE)
             input("\nPress Enter to continue...")
         elif choice == '2':
             # Check if user already has an active rental
-            has_active = False
-            for rental in customer.rentals:
-                if rental.get("status") == "active":
-                    print("\nYou already have an active rental. You can only rent one car at a time.")
-                    has_active = True
-                    break
-            
-            if not has_active:
+            has_active = customer.totals["active"] > 0
+            if has_active:
+                print("\nYou already have an active rental. You can only rent one car at a time.")
+            else:
                 RentalManager.display_fine_policy()
-                Car.display_available_cars()
+                start_date = input('Enter Start Date (YYYY-MM-DD): ')
+                end_date = input('Enter End Date (YYYY-MM-DD): ')
+                Car.display_available_cars(start_date, end_date, page_size=PAGE_SIZE)
                 car_id = input('\nEnter Car ID to rent (or 0 to cancel): ')
                 
                 if car_id == '0':
                     continue
                     
-                start_date = input('Enter Start Date (YYYY-MM-DD): ')
-                end_date = input('Enter End Date (YYYY-MM-DD): ')
                 customer.rent_car(car_id, start_date, end_date)
                 
             input("\nPress Enter to continue...")
         elif choice == '3':
             # Check if user has any active rentals
             active_rentals = []
-            for rental in customer.rentals:
-                if rental.get("status") == "active":
-                    car = Car.get_car_by_id(rental.get("car_id"))
-                    if car:
-                        active_rentals.append((rental.get("car_id"), f"{car.brand} {car.model}"))
+            if customer.totals["active"] > 0:
+                car_map = Car.load_car_map()
+                for rental in customer.rentals:
+                    if rental.get("status") == "active":
+                        car = car_map.get(rental.get("car_id"))
+                        if car:
+                            active_rentals.append((rental.get("car_id"), f"{car.brand} {car.model}"))
             
             if not active_rentals:
                 print("\nYou don't have any active rentals to return.")
@@ -278,14 +319,13 @@ def customer_menu(customer):
                 if amount <= 0:
                     print("Amount must be positive.")
                 else:
-                    customer + amount  # Using operator overloading
-                    update_customer_balance(customer)
+                    customer.top_up(amount)
             except ValueError:
                 print("Invalid amount. Please enter a number.")
                 
             input("\nPress Enter to continue...")
         elif choice == '5':
-            customer.view_rental_history()
+            customer.view_rental_history(page_size=PAGE_SIZE)
             input("\nPress Enter to continue...")
         elif choice == '6':
             customer.view_profile()
@@ -294,20 +334,44 @@ def customer_menu(customer):
             RentalManager.display_fine_policy()
             input("\nPress Enter to continue...")
         elif choice == '8':
+            search_cars()
+            input("\nPress Enter to continue...")
+        elif choice == '9':
+            save_changes()
             print("\nLogging out. Thank you for using our service!")
-            update_customer_balance(customer)
             break
         else:
-            print("Invalid choice. Please select 1 to 8.")
+            print("Invalid choice. Please select 1 to 9.")
             
-def update_customer_balance(customer):
-    """Update customer balance in the stored data"""
-    users = load_users()
-    for user in users:
-        if user["username"] == customer.username:
-            user["balance"] = customer.balance
-            break
-    save_users(users)
+def save_changes():
+    """Wait for changes still being written in the background (write-behind mode)
+    and refresh the fleet snapshot used for fast startup"""
+    storage = get_storage()
+    if not storage.flush(timeout=30):
+        dropped = storage.dropped_changes()
+        if dropped:
+            print(f"Error: {dropped} changes could not be saved and were lost.")
+        else:
+            print("Some changes are still being saved. Please wait a moment before closing the program.")
+    FleetRepository.save_snapshot()
+
+def print_operation_stats(name, counters):
+    """Show the I/O cost of a menu action as soon as it finishes"""
+    print(f"[stats] {name}: {stats.format_counters(counters)}")
 
 if __name__ == "__main__":
-    main_menu()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Car Rental System")
+    parser.add_argument("--stats", action="store_true",
+                        help="print file I/O counters after every operation and a summary on exit")
+    args = parser.parse_args()
+    
+    if args.stats:
+        stats.on_complete = print_operation_stats
+    try:
+        main_menu()
+    finally:
+        if args.stats:
+            print("\n=== I/O STATISTICS ===")
+            print(stats.report())
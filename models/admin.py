@@ -1,6 +1,8 @@
-import json
-import os
 from models.car import Car
+from models.paging import PAGE_SIZE
+from models.reservation import ReservationIndex
+from models.stats import track
+from models.storage import get_storage
 
 class Admin:
     def __init__(self, username, password, first_name, last_name):
@@ -10,38 +12,31 @@ class Admin:
         self.last_name = last_name
     
     @classmethod
+    @track("Admin.load_admins")
     def load_admins(cls):
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        if not os.path.exists("data/admins.json") or os.stat("data/admins.json").st_size == 0:
-            return []
-        
         try:
-            with open("data/admins.json", "r") as f:
-                return json.load(f)
+            return get_storage().load_admins()
         except Exception as e:
             print(f"Error loading admins: {e}")
             return []
     
     @classmethod
+    @track("Admin.get_admin")
+    def get_admin(cls, username):
+        """Look up a single admin record by username"""
+        try:
+            return get_storage().get_admin(username)
+        except Exception as e:
+            print(f"Error loading admins: {e}")
+            return None
+    
+    @classmethod
+    @track("Admin.save_admin")
     def save_admin(cls, admin):
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        admins = cls.load_admins()
-        
-        # Check if username already exists
-        for a in admins:
-            if a["username"] == admin.username:
+        try:
+            if not get_storage().add_admin(dict(admin.__dict__)):
                 print("Username already exists.")
                 return False
-        
-        admins.append(admin.__dict__)
-        
-        try:
-            with open("data/admins.json", "w") as f:
-                json.dump(admins, f, indent=4)
             print("Admin registered successfully.")
             return True
         except Exception as e:
@@ -49,21 +44,13 @@ class Admin:
             return False
     
     @staticmethod
+    @track("Admin.add_car")
     def add_car():
         """Add a new car to the system"""
         print("\n=== ADD NEW CAR ===")
         
-        # Generate a unique car ID
-        cars = Car.load_cars()
-        if cars:
-            # Find the highest existing ID and increment by 1
-            try:
-                max_id = max(int(car.car_id) for car in cars if car.car_id.isdigit())
-                car_id = str(max_id + 1)
-            except ValueError:
-                car_id = "1001"  # Fallback if no numeric IDs
-        else:
-            car_id = "1001"  # Starting ID if no cars exist
+        # Take the next ID from the shared sequence
+        car_id = Car.allocate_car_ids()[0]
         
         print(f"New Car ID: {car_id}")
         
@@ -80,8 +67,14 @@ class Admin:
                 
             new_car = Car(car_id, brand, model, seating_capacity, rental_price)
             
-            cars.append(new_car)
-            Car.save_cars(cars)
+            problem = Car.check(new_car)
+            if problem:
+                print(f"Could not add car: {problem}.")
+                return
+            
+            if not Car.add_car(new_car):
+                print(f"Could not add car: ID {car_id} is already in use.")
+                return
             
             print(f"Car added successfully: {brand} {model} (ID: {car_id})")
             
@@ -89,33 +82,32 @@ class Admin:
             print("Invalid input. Please enter numeric values for capacity and price.")
     
     @staticmethod
+    @track("Admin.remove_car")
     def remove_car():
         """Remove a car from the system"""
-        Car.display_all_cars()
+        Car.display_all_cars(page_size=PAGE_SIZE)
         
         car_id = input("\nEnter ID of car to remove: ")
         
-        cars = Car.load_cars()
-        found = False
+        car = Car.get_car_by_id(car_id)
         
-        for i, car in enumerate(cars):
-            if car.car_id == car_id:
-                # Check if the car is currently rented
-                if not car.available:
-                    print("Cannot remove a car that is currently rented.")
-                    return
-                
-                car_info = f"{car.brand} {car.model}"
-                cars.pop(i)
-                Car.save_cars(cars)
-                print(f"Car removed successfully: {car_info} (ID: {car_id})")
-                found = True
-                break
+        if not car:
+            print(f"Car with ID {car_id} not found.")
+            return
         
-        if not found:
+        # Check if the car is currently rented or reserved
+        if ReservationIndex.has_bookings(car_id):
+            print("Cannot remove a car that is currently rented or reserved.")
+            return
+        
+        car_info = f"{car.brand} {car.model}"
+        if Car.remove_car(car_id):
+            print(f"Car removed successfully: {car_info} (ID: {car_id})")
+        else:
             print(f"Car with ID {car_id} not found.")
     
     @staticmethod
+    @track("Admin.view_rentals")
     def view_rentals():
         """View all current rentals in the system"""
         from models.rental import RentalManager
@@ -124,6 +116,8 @@ class Admin:
         print("1. View all active rentals")
         print("2. View all customers with rentals")
         print("3. View rental history for specific customer")
+        print("4. View revenue and utilization analytics")
+        print("5. View cars due back today and overdue rentals")
         choice = input("Choose: ")
         
         if choice == '1':
@@ -132,6 +126,12 @@ class Admin:
             RentalManager.view_customer_rentals()
         elif choice == '3':
             username = input("Enter customer username: ")
-            RentalManager.view_customer_rental_history(username)
+            RentalManager.view_customer_rental_history(username, page_size=PAGE_SIZE)
+        elif choice == '4':
+            from models import analytics
+            analytics.print_report()
+        elif choice == '5':
+            from models import scheduler
+            scheduler.print_report()
         else:
             print("Invalid choice.")
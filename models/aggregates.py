@@ -0,0 +1,68 @@
+CUSTOMER_TOTALS = ("active", "rentals", "revenue", "fines")
+CAR_TOTALS = ("rentals", "revenue", "fines")
+
+
+class RentalTotals:
+    """Running per-customer and per-car rental totals.
+
+    For each customer: active rentals, lifetime rentals, revenue (rental
+    charges) and late fines; for each car: rentals, revenue and fines.
+    A change to a rental is applied by counting its old version out and
+    its new version in, so every update costs O(1) and nobody has to
+    rescan the rental history to read a total.
+    """
+
+    def __init__(self, customers=None, cars=None):
+        self.customers = customers or {}
+        self.cars = cars or {}
+
+    @classmethod
+    def from_rentals(cls, rentals):
+        """Count every rental in a username -> rentals mapping"""
+        totals = cls()
+        for username, user_rentals in rentals.items():
+            for rental in user_rentals:
+                totals.count(username, rental)
+        return totals
+
+    @classmethod
+    def from_document(cls, document):
+        return cls(document["customers"], document["cars"])
+
+    def to_document(self):
+        return {"customers": self.customers, "cars": self.cars}
+
+    def count(self, username, rental, sign=1):
+        """Count a rental in (sign=1) or back out (sign=-1)"""
+        revenue = sign * (rental.get("total_cost") or 0)
+        fines = sign * (rental.get("fine_amount") or 0)
+
+        customer = self.customers.setdefault(username, dict.fromkeys(CUSTOMER_TOTALS, 0))
+        customer["active"] += sign if rental.get("status") == "active" else 0
+        customer["rentals"] += sign
+        customer["revenue"] += revenue
+        customer["fines"] += fines
+
+        car = self.cars.setdefault(rental["car_id"], dict.fromkeys(CAR_TOTALS, 0))
+        car["rentals"] += sign
+        car["revenue"] += revenue
+        car["fines"] += fines
+
+    def merge(self, other):
+        """Add another set of totals into this one"""
+        for table, other_table in ((self.customers, other.customers), (self.cars, other.cars)):
+            for key, values in other_table.items():
+                entry = table.setdefault(key, dict.fromkeys(values, 0))
+                for name, value in values.items():
+                    entry[name] += value
+        return self
+
+    def customer(self, username):
+        return dict(self.customers.get(username) or dict.fromkeys(CUSTOMER_TOTALS, 0))
+
+    def car(self, car_id):
+        return dict(self.cars.get(car_id) or dict.fromkeys(CAR_TOTALS, 0))
+
+    def copy(self):
+        return RentalTotals({k: dict(v) for k, v in self.customers.items()},
+                            {k: dict(v) for k, v in self.cars.items()})
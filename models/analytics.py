@@ -0,0 +1,143 @@
+"""Vectorised revenue, utilization and late-fee analytics (requires numpy).
+
+Rental records are loaded once into columnar numpy arrays and every
+metric is computed with whole-array operations (bincount, clip, datetime
+arithmetic) rather than Python loops over the rental dicts.
+"""
+from models.car import Car
+from models.rental import RentalManager
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class RentalColumns:
+    """All rentals as parallel numpy arrays, one entry per rental.
+
+    String columns (username, car_id, brand) are stored as integer codes
+    into the matching *_names array so they can be grouped with bincount.
+    """
+
+    def __init__(self, rentals, car_map):
+        if np is None:
+            raise ImportError("Rental analytics need numpy. Install it with: pip install numpy")
+
+        rows = [(username, r) for username, user_rentals in rentals.items() for r in user_rentals]
+        usernames = [username for username, _ in rows]
+        car_ids = [r["car_id"] for _, r in rows]
+        brands = [car_map[c].brand if c in car_map else "Unknown" for c in car_ids]
+
+        self.usernames, self.user_codes = np.unique(np.array(usernames, dtype=str), return_inverse=True)
+        self.car_ids, self.car_codes = np.unique(np.array(car_ids, dtype=str), return_inverse=True)
+        self.brands, self.brand_codes = np.unique(np.array(brands, dtype=str), return_inverse=True)
+
+        self.start = np.array([r["start_date"] for _, r in rows], dtype="datetime64[D]")
+        self.end = np.array([r["end_date"] for _, r in rows], dtype="datetime64[D]")
+        self.returned = np.array([r.get("return_date") or "NaT" for _, r in rows], dtype="datetime64[D]")
+        self.days = np.array([r["days"] for _, r in rows], dtype=np.int64)
+        self.cost = np.array([r["total_cost"] for _, r in rows], dtype=np.float64)
+        self.fine = np.array([r.get("fine_amount") or 0 for _, r in rows], dtype=np.float64)
+        self.active = np.array([r["status"] == "active" for _, r in rows], dtype=bool)
+        self.fleet_size = len(car_map)
+
+    @classmethod
+    def load(cls):
+        """Build the columns from the rental store and the current fleet"""
+        return cls(RentalManager.load_rentals(), Car.load_car_map())
+
+    def __len__(self):
+        return len(self.cost)
+
+    @property
+    def revenue(self):
+        """Rental charges plus late fines, per rental"""
+        return self.cost + self.fine
+
+    @staticmethod
+    def _totals(names, codes, values):
+        sums = np.bincount(codes, weights=values, minlength=len(names))
+        return dict(zip(names.tolist(), sums.tolist()))
+
+    def revenue_per_car(self):
+        return self._totals(self.car_ids, self.car_codes, self.revenue)
+
+    def revenue_per_brand(self):
+        return self._totals(self.brands, self.brand_codes, self.revenue)
+
+    def revenue_per_month(self):
+        """Revenue grouped by the month each rental started in (YYYY-MM)"""
+        months, codes = np.unique(self.start.astype("datetime64[M]"), return_inverse=True)
+        return self._totals(months.astype(str), codes, self.revenue)
+
+    def occupied_until(self):
+        """Last day each car was (or is) out: the return date, else the booked end"""
+        return np.where(np.isnat(self.returned), self.end, self.returned)
+
+    def utilization(self, period_start=None, period_end=None):
+        """Share of available car-days in the period that were rented out"""
+        if len(self) == 0 or self.fleet_size == 0:
+            return 0.0
+
+        until = self.occupied_until()
+        first = np.datetime64(period_start, "D") if period_start else self.start.min()
+        last = np.datetime64(period_end, "D") if period_end else until.max()
+        if last < first:
+            return 0.0
+
+        lo = np.maximum(self.start, first)
+        hi = np.minimum(until, last)
+        rented_days = np.clip((hi - lo).astype(np.int64) + 1, 0, None).sum()
+        period_days = int((last - first).astype(np.int64)) + 1
+        return float(rented_days) / (self.fleet_size * period_days)
+
+    def average_rental_length(self):
+        """Mean number of booked days per rental"""
+        return float(self.days.mean()) if len(self) else 0.0
+
+    def total_late_fines(self):
+        return float(self.fine.sum())
+
+    def late_fines_per_customer(self):
+        """Fines per customer, leaving out customers who were never fined"""
+        fines = self._totals(self.usernames, self.user_codes, self.fine)
+        return {username: total for username, total in fines.items() if total > 0}
+
+
+def print_report(period_start=None, period_end=None):
+    """Print the month-end analytics summary"""
+    try:
+        columns = RentalColumns.load()
+    except ImportError as e:
+        print(e)
+        return
+
+    if not len(columns):
+        print("No rental records found in the system.")
+        return
+
+    print("\n=== RENTAL ANALYTICS ===")
+    print(f"Rentals: {len(columns)} ({int(columns.active.sum())} active)")
+    print(f"Fleet utilization: {columns.utilization(period_start, period_end):.1%}")
+    print(f"Average rental length: {columns.average_rental_length():.1f} days")
+    print(f"Total late fines: ${columns.total_late_fines():.2f}")
+
+    print("\nRevenue by month:")
+    for month, revenue in sorted(columns.revenue_per_month().items()):
+        print(f"  {month}: ${revenue:.2f}")
+
+    print("\nRevenue by brand:")
+    for brand, revenue in sorted(columns.revenue_per_brand().items(), key=lambda item: -item[1]):
+        print(f"  {brand}: ${revenue:.2f}")
+
+    print("\nTop cars by revenue:")
+    top_cars = sorted(columns.revenue_per_car().items(), key=lambda item: -item[1])[:10]
+    for car_id, revenue in top_cars:
+        print(f"  {car_id}: ${revenue:.2f}")
+
+    fines = columns.late_fines_per_customer()
+    if fines:
+        print("\nLate fines by customer:")
+        for username, total in sorted(fines.items(), key=lambda item: -item[1]):
+            print(f"  {username}: ${total:.2f}")
@@ -0,0 +1,165 @@
+"""Monthly archive partitions for completed rentals.
+
+    python -m models.archive                      # archive months before this one
+    python -m models.archive --before 2025-01-01
+
+The file engine keeps active and recently completed rentals in its hot
+rental store (see RentalJournal). The archiving job moves completed
+rentals that started before a cut-off date into one partition per start
+month, so everyday queries only touch the small hot store and history
+queries only load the months (and users) they ask for.
+"""
+import os
+import threading
+from datetime import date
+from models.aggregates import RentalTotals
+from models.fileio import read_document, write_document
+
+
+class RentalArchive:
+    """Completed rentals partitioned by the month they started in.
+
+    Each partition is a username -> rentals document named YYYY-MM in the
+    archive directory; index maps each username to the months holding
+    their rentals. Partitions are cached until their file changes. Adding
+    a rental that is already archived (same rental_id) is a no-op, so an
+    interrupted archiving run can simply be repeated.
+    """
+
+    def __init__(self, directory, serializer):
+        self.directory = directory
+        self.serializer = serializer
+        self._lock = threading.RLock()
+        self._cache = {}
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + self.serializer.extension)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def signature(self):
+        """Changes whenever an archiving run finishes"""
+        return self._signature(self._path("index"))
+
+    def _load(self, name):
+        path = self._path(name)
+        signature = self._signature(path)
+        if signature is None:
+            return {}
+        cached = self._cache.get(name)
+        if cached is None or cached[0] != signature:
+            cached = (signature, read_document(path, self.serializer))
+            self._cache[name] = cached
+        return cached[1]
+
+    def months(self, first_month=None, last_month=None):
+        """Partition names (YYYY-MM) within the given months, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        months = sorted(name[:-len(self.serializer.extension)] for name in os.listdir(self.directory)
+                        if name.endswith(self.serializer.extension) and name[:4].isdigit())
+        return [m for m in months
+                if (first_month is None or m >= first_month) and (last_month is None or m <= last_month)]
+
+    def query(self, start_date=None, end_date=None):
+        """Archived rentals keyed by username, only from partitions that can match the start date range"""
+        with self._lock:
+            rentals = {}
+            for month in self.months(start_date and start_date[:7], end_date and end_date[:7]):
+                for username, user_rentals in self._load(month).items():
+                    matches = [dict(r) for r in user_rentals
+                               if (start_date is None or r["start_date"] >= start_date)
+                               and (end_date is None or r["start_date"] <= end_date)]
+                    if matches:
+                        rentals.setdefault(username, []).extend(matches)
+            return rentals
+
+    def user_rentals(self, username):
+        """One user's archived rentals, oldest month first"""
+        return list(self.iter_user_rentals(username))
+
+    def iter_user_rentals(self, username):
+        """Yield one user's archived rentals, loading one month at a time"""
+        with self._lock:
+            months = list(self._load("index").get(username, []))
+        for month in months:
+            with self._lock:
+                rentals = [dict(r) for r in self._load(month).get(username, [])]
+            yield from rentals
+
+    def totals(self):
+        """Rental totals counted over every partition"""
+        with self._lock:
+            totals = RentalTotals()
+            for month in self.months():
+                for username, user_rentals in self._load(month).items():
+                    for rental in user_rentals:
+                        totals.count(username, rental)
+            return totals
+
+    def add(self, rentals):
+        """Write username -> completed rentals into their monthly partitions.
+
+        Every rental needs a rental_id. Returns the rental_ids of the given
+        rentals that are now archived, whether written here or before.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            by_month = {}
+            for username, user_rentals in rentals.items():
+                for rental in user_rentals:
+                    by_month.setdefault(rental["start_date"][:7], {}).setdefault(username, []).append(rental)
+
+            index = {username: list(months) for username, months in self._load("index").items()}
+            stored = set()
+            for month, month_rentals in sorted(by_month.items()):
+                partition = {username: list(rs) for username, rs in self._load(month).items()}
+                archived = {r["rental_id"] for rs in partition.values() for r in rs if r.get("rental_id")}
+                for username, user_rentals in month_rentals.items():
+                    new = [r for r in user_rentals if not r.get("rental_id") or r["rental_id"] not in archived]
+                    stored.update(r["rental_id"] for r in user_rentals if r.get("rental_id"))
+                    if new:
+                        partition.setdefault(username, []).extend(new)
+                    months = index.setdefault(username, [])
+                    if month not in months:
+                        months.append(month)
+                        months.sort()
+                write_document(self._path(month), partition, self.serializer)
+            # The index goes last: it is what readers use to notice new archives
+            write_document(self._path("index"), index, self.serializer)
+            return stored
+
+    def clear(self):
+        with self._lock:
+            for name in self.months() + ["index"]:
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            self._cache.clear()
+
+
+def first_of_month(day=None):
+    """The first day of the month of day (default today) as an ISO date"""
+    return (day or date.today()).replace(day=1).isoformat()
+
+
+def main(argv=None):
+    import argparse
+    from models.rental import RentalManager
+
+    parser = argparse.ArgumentParser(description="Move completed rentals into monthly archive partitions")
+    parser.add_argument("--before", default=first_of_month(),
+                        help="archive rentals that started before this date (default: start of this month)")
+    args = parser.parse_args(argv)
+
+    moved = RentalManager.archive_rentals(args.before)
+    print(f"Archived {moved} completed rentals that started before {args.before}.")
+
+
+if __name__ == "__main__":
+    main()
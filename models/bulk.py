@@ -0,0 +1,197 @@
+"""Bulk fleet import/export.
+
+    python -m models.bulk import depot.csv
+    python -m models.bulk export fleet.jsonl
+
+Files are streamed row by row as CSV (with a header row) or JSON Lines,
+chosen by file extension. Imports validate every row, assign IDs to rows
+without a car_id from the car ID sequence and commit all accepted cars in a single storage write.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from models.car import Car
+from models.fleet import FleetRepository
+from models.storage import CAR_FIELDS
+
+TRUE_VALUES = {"true", "1", "yes", "y"}
+FALSE_VALUES = {"false", "0", "no", "n"}
+
+
+class BulkReport:
+    """Outcome and throughput of one bulk import or export"""
+
+    def __init__(self, action, path):
+        self.action = action
+        self.path = path
+        self.rows = 0
+        self.written = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        lines = [
+            f"{self.action.capitalize()} {self.path}: {self.rows} rows read, {self.written} written, "
+            f"{len(self.errors)} rejected in {self.elapsed:.3f}s ({self.rows_per_sec:,.0f} rows/sec)"
+        ]
+        for line_no, message in self.errors[:20]:
+            lines.append(f"  row {line_no}: {message}")
+        if len(self.errors) > 20:
+            lines.append(f"  ... and {len(self.errors) - 20} more")
+        return "\n".join(lines)
+
+
+def _file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported file type '{ext}'. Use .csv or .jsonl")
+
+
+def _read_rows(path):
+    """Yield (line number, row) pairs without loading the whole file"""
+    with open(path, "r", newline="") as f:
+        if _file_format(path) == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_no, line
+
+
+def _parse_row(row):
+    """Turn a CSV row or JSON line into a car record, raising ValueError if it is invalid"""
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except ValueError:
+            raise ValueError("not valid JSON")
+        if not isinstance(row, dict):
+            raise ValueError("expected a JSON object")
+
+    brand = str(row.get("brand") or "").strip()
+    model = str(row.get("model") or "").strip()
+    if not brand or not model:
+        raise ValueError("brand and model are required")
+
+    try:
+        seating_capacity = int(row.get("seating_capacity"))
+        rental_price = float(row.get("rental_price"))
+    except (TypeError, ValueError):
+        raise ValueError("seating_capacity and rental_price must be numbers")
+    if seating_capacity <= 0 or rental_price <= 0:
+        raise ValueError("capacity and price must be positive numbers")
+
+    available = row.get("available", True)
+    if isinstance(available, str):
+        value = available.strip().lower()
+        if value in TRUE_VALUES or value == "":
+            available = True
+        elif value in FALSE_VALUES:
+            available = False
+        else:
+            raise ValueError(f"invalid available value '{available}'")
+
+    return {
+        "car_id": str(row.get("car_id") or "").strip(),
+        "brand": brand,
+        "model": model,
+        "seating_capacity": seating_capacity,
+        "rental_price": rental_price,
+        "available": bool(available),
+    }
+
+
+def import_cars(path):
+    """Validate and import every car in a CSV/JSONL file with one storage write"""
+    report = BulkReport("import", path)
+    start = time.perf_counter()
+
+    existing_ids = {car["car_id"] for car in FleetRepository.all()}
+    new_cars = []
+    needs_id = []
+
+    for line_no, row in _read_rows(path):
+        report.rows += 1
+        try:
+            car = _parse_row(row)
+        except ValueError as e:
+            report.errors.append((line_no, str(e)))
+            continue
+
+        # Rows the storage engine cannot hold (e.g. too long for the mmap engine's fields)
+        problem = Car.check(Car(**car))
+        if problem:
+            report.errors.append((line_no, problem))
+            continue
+
+        if not car["car_id"]:
+            needs_id.append(car)
+        elif car["car_id"] in existing_ids:
+            report.errors.append((line_no, f"car ID {car['car_id']} already exists"))
+            continue
+        else:
+            existing_ids.add(car["car_id"])
+        new_cars.append(car)
+
+    if needs_id:
+        # Reserve one block of IDs, starting past any numeric IDs given in the file
+        numeric = [int(car_id) for car_id in existing_ids if car_id.isdigit()]
+        floor = max(numeric) + 1 if numeric else None
+        for car, car_id in zip(needs_id, Car.allocate_car_ids(len(needs_id), floor)):
+            car["car_id"] = car_id
+
+    if new_cars and Car.add_cars([Car(**car) for car in new_cars]):
+        report.written = len(new_cars)
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def export_cars(path):
+    """Stream the whole fleet to a CSV/JSONL file"""
+    report = BulkReport("export", path)
+    start = time.perf_counter()
+    file_format = _file_format(path)
+
+    with open(path, "w", newline="") as f:
+        if file_format == "csv":
+            writer = csv.DictWriter(f, fieldnames=CAR_FIELDS)
+            writer.writeheader()
+        for car in FleetRepository.all():
+            report.rows += 1
+            if file_format == "csv":
+                writer.writerow({field: car[field] for field in CAR_FIELDS})
+            else:
+                f.write(json.dumps({field: car[field] for field in CAR_FIELDS}) + "\n")
+            report.written += 1
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export the car fleet")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path", help="a .csv or .jsonl file")
+    args = parser.parse_args(argv)
+
+    if args.action == "import":
+        report = import_cars(args.path)
+    else:
+        report = export_cars(args.path)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,181 @@
-import json
-import os
+from datetime import date
+from models.fleet import FleetRepository
+from models.paging import PAGE_SIZE, iter_pages, paginate, show_pages
+from models.reservation import ReservationIndex
+from models.sequence import IdSequence
+from models.stats import track
+from models.storage import get_storage
 
 class Car:
-    def __init__(self, car_id, brand, model, seating_capacity, rental_price, available=True):
+    _id_sequences = {}
+
+    def __init__(self, car_id, brand, model, seating_capacity, rental_price, available=True, version=0):
         self.car_id = car_id
         self.brand = brand
         self.model = model
         self.seating_capacity = seating_capacity
         self.rental_price = rental_price  # per day
         self.available = available
+        self.version = version  # bumped by the storage engine on every change
 
     def __str__(self):
-        status = "Available" if self.available else "Currently Rented"
+        status = "Available" if self.available else "Booked"
         return f"ID: {self.car_id} | {self.brand} {self.model} | Seats: {self.seating_capacity} | Price: ${self.rental_price}/day | Status: {status}"
 
     @classmethod
+    @track("Car.load_cars")
     def load_cars(cls):
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        if not os.path.exists("data/cars.json") or os.stat("data/cars.json").st_size == 0:
-            return []
-        
         try:
-            with open("data/cars.json", "r") as f:
-                car_data = json.load(f)
-                return [cls(**car) for car in car_data]
+            return [cls(**car) for car in FleetRepository.all()]
         except Exception as e:
             print(f"Error loading cars: {e}")
             return []
 
     @classmethod
+    @track("Car.save_cars")
     def save_cars(cls, cars):
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
         try:
-            with open("data/cars.json", "w") as f:
-                cars_dict = [car.__dict__ for car in cars]
-                json.dump(cars_dict, f, indent=4)
+            cars_dict = [dict(car.__dict__) for car in cars]
+            if get_storage().save_cars(cars_dict):
+                FleetRepository.prime(cars_dict)
+            else:
+                FleetRepository.invalidate()
         except Exception as e:
+            FleetRepository.invalidate()
             print(f"Error saving cars: {e}")
 
     @classmethod
+    @track("Car.get_car_by_id")
     def get_car_by_id(cls, car_id):
-        cars = cls.load_cars()
-        for car in cars:
-            if car.car_id == car_id:
-                return car
-        return None
-
-    @classmethod
-    def display_all_cars(cls):
-        cars = cls.load_cars()
-        if not cars:
-            print("No cars available in the system.")
-            return
-        
-        print("\n=== ALL CARS ===")
-        for car in cars:
-            print(car)
-
-    @classmethod
-    def display_available_cars(cls):
-        cars = cls.load_cars()
-        available_cars = [car for car in cars if car.available]
-        
-        if not available_cars:
-            print("No cars available for rent at the moment.")
-            return
-        
-        print("\n=== AVAILABLE CARS ===")
-        for car in available_cars:
-            print(car)
+        car = FleetRepository.get(car_id)
+        return cls(**car) if car else None
+
+    @classmethod
+    @track("Car.load_car_map")
+    def load_car_map(cls, car_ids=None):
+        """Load the fleet (or only car_ids) once as a car_id -> Car map for joining against rentals"""
+        if car_ids is None:
+            return {car.car_id: car for car in cls.load_cars()}
+        return {car_id: cls(**car) for car_id, car in FleetRepository.get_many(car_ids).items()}
+
+    @classmethod
+    def iter_cars(cls, after=None):
+        """Yield every car in storage order, starting after the car_id after"""
+        for car in FleetRepository.iter_records(after):
+            yield cls(**car)
+
+    @classmethod
+    @track("Car.page_cars")
+    def page_cars(cls, page_size=PAGE_SIZE, after=None, offset=0):
+        """One page of the fleet; pass the page's next_cursor as after for the next one"""
+        return paginate(cls.iter_cars(after), lambda car: car.car_id, page_size, offset)
+
+    @classmethod
+    @track("Car.display_all_cars")
+    def display_all_cars(cls, page_size=None):
+        """Print the fleet; with a page_size, one page at a time asking before each next page"""
+        pages = iter_pages(lambda cursor: cls.page_cars(page_size or PAGE_SIZE, cursor))
+        show_pages(pages, print, "\n=== ALL CARS ===", "No cars available in the system.",
+                   prompt=page_size is not None)
+
+    @classmethod
+    def iter_available(cls, start_date, end_date, after=None):
+        """Yield the cars with no booking between start_date and end_date, starting after the car_id after"""
+        busy = ReservationIndex.busy_car_ids(start_date, end_date)
+        for car in FleetRepository.iter_records(after):
+            if car["car_id"] not in busy:
+                # Free for the requested window even if booked at another time
+                yield cls(**dict(car, available=True))
+
+    @classmethod
+    @track("Car.page_available")
+    def page_available(cls, start_date, end_date, page_size=PAGE_SIZE, after=None, offset=0):
+        return paginate(cls.iter_available(start_date, end_date, after), lambda car: car.car_id,
+                        page_size, offset)
+
+    @classmethod
+    @track("Car.find_available")
+    def find_available(cls, start_date, end_date):
+        """Return the cars with no booking between start_date and end_date (YYYY-MM-DD)"""
+        return list(cls.iter_available(start_date, end_date))
+
+    @classmethod
+    @track("Car.search")
+    def search(cls, brand=None, model=None, min_seats=None, min_price=None, max_price=None,
+               start_date=None, end_date=None):
+        """Find cars by brand/model, minimum seats and daily price range, cheapest first.
+
+        If start_date is given, only cars free from start_date to end_date
+        (defaulting to start_date) are returned.
+        """
+        records = FleetRepository.search(brand, model, min_seats, min_price, max_price)
+        if start_date:
+            busy = ReservationIndex.busy_car_ids(start_date, end_date or start_date)
+            return [cls(**dict(car, available=True)) for car in records if car["car_id"] not in busy]
+        return [cls(**car) for car in records]
+
+    @classmethod
+    @track("Car.display_available_cars")
+    def display_available_cars(cls, start_date=None, end_date=None, page_size=None):
+        start_date = start_date or date.today().isoformat()
+        end_date = end_date or start_date
+        pages = iter_pages(lambda cursor: cls.page_available(start_date, end_date, page_size or PAGE_SIZE, cursor))
+        show_pages(pages, print, f"\n=== AVAILABLE CARS ({start_date} to {end_date}) ===",
+                   "No cars available for rent at the moment.", prompt=page_size is not None)
+
+    @classmethod
+    @track("Car.allocate_car_ids")
+    def allocate_car_ids(cls, count=1, floor=None):
+        """Reserve count new car IDs from the persistent car ID sequence"""
+        data_dir = get_storage().data_dir
+        if data_dir not in cls._id_sequences:
+            cls._id_sequences[data_dir] = IdSequence("car_id", data_dir)
+
+        def seed():
+            # First use only: continue after the highest numeric ID in the fleet
+            numeric = [int(car["car_id"]) for car in FleetRepository.all() if car["car_id"].isdigit()]
+            return max(numeric) + 1 if numeric else 1001
+
+        return [str(i) for i in cls._id_sequences[data_dir].allocate(count, floor, seed)]
+
+    @classmethod
+    def check(cls, car):
+        """Return why car cannot be stored (e.g. a field too long for the engine), or None"""
+        return get_storage().check_car(dict(car.__dict__))
+
+    @classmethod
+    @track("Car.add_car")
+    def add_car(cls, car):
+        """Store a single new car without rewriting the rest of the fleet"""
+        record = dict(car.__dict__)
+        return FleetRepository.apply(lambda storage: storage.add_car(record), car.car_id, record)
+
+    @classmethod
+    @track("Car.add_cars")
+    def add_cars(cls, cars):
+        """Store many new cars with a single storage write"""
+        records = [dict(car.__dict__) for car in cars]
+        try:
+            if not get_storage().add_cars(records):
+                return False
+        except Exception as e:
+            print(f"Error saving cars: {e}")
+            return False
+        finally:
+            FleetRepository.invalidate()
+        return True
+
+    @classmethod
+    @track("Car.remove_car")
+    def remove_car(cls, car_id):
+        """Delete a single car from the fleet"""
+        return FleetRepository.apply(lambda storage: storage.remove_car(car_id), car_id, None)
 
     @classmethod
+    @track("Car.update_car_availability")
     def update_car_availability(cls, car_id, available):
-        cars = cls.load_cars()
-        for car in cars:
-            if car.car_id == car_id:
-                car.available = available
-                cls.save_cars(cars)
-                return True
-        return False
+        car = FleetRepository.get(car_id)
+        if not car:
+            return False
+        return FleetRepository.apply(lambda storage: storage.update_car(car_id, available=available),
+                                     car_id, dict(car, available=available, version=car.get("version", 0) + 1))
@@ -1,16 +1,42 @@
-import json
-import os
 from datetime import datetime
 from models.car import Car
+from models.reservation import ReservationIndex
+from models import stats
+from models.stats import track
+from models.storage import COMMIT_ATTEMPTS, get_storage, new_rental_id
 
 class Customer:
-    def __init__(self, username, password, first_name, last_name, balance=0.0, rentals=None):
+    def __init__(self, username, password, first_name, last_name, balance=0.0, rentals=None, version=0):
         self.username = username
         self.password = password
         self.first_name = first_name
         self.last_name = last_name
         self.balance = float(balance)
-        self.rentals = rentals if rentals else []
+        self._rentals = rentals
+        self.version = version  # of the stored record this copy was read from
+        
+    @property
+    def rentals(self):
+        """This customer's rentals, read from the rental store on first use"""
+        if self._rentals is None:
+            self._rentals = get_storage().load_user_rentals(self.username)
+        return self._rentals
+    
+    @property
+    def totals(self):
+        """Active and lifetime rentals, revenue and fines, without loading the history"""
+        return get_storage().rental_totals(self.username)
+        
+    def to_dict(self):
+        """The account record kept in the user store"""
+        return {
+            "username": self.username,
+            "password": self.password,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "balance": self.balance,
+            "version": self.version
+        }
         
     def __add__(self, amount):
         """Operator overloading for adding balance"""
@@ -20,151 +46,155 @@ class Customer:
         print(f"Balance updated. New balance: ${self.balance:.2f}")
         return self
         
+    @track("Customer.rent_car")
     def rent_car(self, car_id, start_date, end_date):
         """Rent a car if it's available and user has sufficient balance"""
         from models.rental import RentalManager
         
-        # Check if user already has an active rental
-        for rental in self.rentals:
-            if rental.get("status") == "active":
-                print("You cannot reserve more than one car at a time.")
-                return False
+        # Checked and committed against freshly read copies of this customer and the car
+        committed = RentalManager._rent([(self.username, car_id, start_date, end_date)])
+        if committed is None:
+            return False
+        
+        customers, new_rentals, _ = committed
+        self._adopt(customers[self.username])
+        rental = new_rentals[0][1]
+        print(f"Car rented successfully for ${rental['total_cost']:.2f}. Enjoy your trip!")
+        return True
+    
+    def _book(self, car_id, start_date, end_date, claimed=(), fleet=False):
+        """Validate a booking and apply it to this customer in memory.
+
+        claimed lists (start_date, end_date) windows of car_id already taken
+        by other bookings that are not stored yet. Fleet bookings (corporate
+        batches) are exempt from the one-car-at-a-time limit. Returns the new
+        rental record, or None after printing why the booking was refused.
+        """
+        # Check if user already has an active rental, from the running totals
+        if not fleet and self.totals["active"] > 0:
+            print("You cannot reserve more than one car at a time.")
+            return None
         
         # Get the car
         car = Car.get_car_by_id(car_id)
         if not car:
             print(f"Car with ID {car_id} not found.")
-            return False
-            
-        if not car.available:
-            print(f"Car with ID {car_id} is not available for rent.")
-            return False
+            return None
             
         # Calculate rental cost
         try:
             start = datetime.strptime(start_date, "%Y-%m-%d")
             end = datetime.strptime(end_date, "%Y-%m-%d")
-            days = (end - start).days + 1
-            
-            if days <= 0:
-                print("End date must be after start date.")
-                return False
-                
-            total_cost = days * car.rental_price
-            
-            if self.balance < total_cost:
-                print(f"Insufficient balance. Required: ${total_cost:.2f}, Available: ${self.balance:.2f}")
-                return False
-                
-            # Deduct balance and update car availability
-            self.balance -= total_cost
-            Car.update_car_availability(car_id, False)
-            
-            # Create rental record
-            rental = {
-                "car_id": car_id,
-                "start_date": start_date,
-                "end_date": end_date,
-                "days": days,
-                "total_cost": total_cost,
-                "status": "active",
-                "return_date": None,
-                "fine_amount": 0
-            }
-            
-            self.rentals.append(rental)
-            
-            # Update global rental records
-            RentalManager.add_rental(self.username, rental)
-            
-            # Save customer data
-            self._update_customer_data()
-            
-            print(f"Car rented successfully for ${total_cost:.2f}. Enjoy your trip!")
-            return True
-            
         except ValueError as e:
             print(f"Error processing dates: {e}")
-            return False
+            return None
+            
+        days = (end - start).days + 1
+        if days <= 0:
+            print("End date must be after start date.")
+            return None
+        
+        # Normalise so dates compare correctly as strings in the booking index
+        start_date = start.date().isoformat()
+        end_date = end.date().isoformat()
+        
+        if (not ReservationIndex.is_free(car_id, start_date, end_date)
+                or any(s <= end_date and start_date <= e for s, e in claimed)):
+            print(f"Car with ID {car_id} is already booked between {start_date} and {end_date}.")
+            return None
+            
+        total_cost = days * car.rental_price
+        
+        if self.balance < total_cost:
+            print(f"Insufficient balance. Required: ${total_cost:.2f}, Available: ${self.balance:.2f}")
+            return None
+            
+        # Deduct balance and create rental record
+        self.balance -= total_cost
+        rental = {
+            "rental_id": new_rental_id(),
+            "car_id": car_id,
+            "start_date": start_date,
+            "end_date": end_date,
+            "days": days,
+            "total_cost": total_cost,
+            "status": "active",
+            "return_date": None,
+            "fine_amount": 0,
+            "accrued_fine": 0
+        }
+        # Only kept in step if the history was already loaded
+        if self._rentals is not None:
+            self._rentals.append(rental)
+        return rental
     
+    @track("Customer.return_car")
     def return_car(self, car_id, return_date):
         """Return a rented car and calculate any late fees"""
         from models.rental import RentalManager
         
+        committed = RentalManager._return([(self.username, car_id, return_date)])
+        if committed is None:
+            return False
+        
+        customers, _, rental_updates = committed
+        self._adopt(customers[self.username])
+        fine = rental_updates[0][3].get("fine_amount", 0)
+        print(f"Car returned successfully. Thank you!")
+        if fine > 0:
+            print(f"Late fee of ${fine:.2f} has been charged to your account.")
+        return True
+    
+    def _settle(self, car_id, return_date):
+        """Close this customer's active rental of car_id in memory.
+
+        Charges any late fee to the balance and returns the updated rental
+        record, or None after printing why the return was refused.
+        """
         # Find the active rental for this car
         active_rental = None
-        rental_index = -1
-        
-        for i, rental in enumerate(self.rentals):
+        for rental in self.rentals:
             if rental.get("car_id") == car_id and rental.get("status") == "active":
                 active_rental = rental
-                rental_index = i
                 break
                 
         if not active_rental:
             print(f"You don't have an active rental for car ID {car_id}.")
-            return False
+            return None
             
         try:
             # Parse dates
             end_date = datetime.strptime(active_rental["end_date"], "%Y-%m-%d")
             actual_return = datetime.strptime(return_date, "%Y-%m-%d")
-            
-            # Calculate any fine for late return
-            fine = 0
-            if actual_return > end_date:
-                days_late = (actual_return - end_date).days
-                car = Car.get_car_by_id(car_id)
-                fine = days_late * (car.rental_price * 1.5)  # 150% of regular price as fine
-                print(f"Late return by {days_late} days. Fine: ${fine:.2f}")
-                
-                # Update customer balance
-                self.balance -= fine
-                
-            # Update rental record
-            self.rentals[rental_index]["status"] = "completed"
-            self.rentals[rental_index]["return_date"] = return_date
-            self.rentals[rental_index]["fine_amount"] = fine
-            
-            # Update car availability
-            Car.update_car_availability(car_id, True)
-            
-            # Update global rental records
-            RentalManager.update_rental_status(self.username, car_id, "completed", return_date, fine)
-            
-            # Save customer data
-            self._update_customer_data()
-            
-            print(f"Car returned successfully. Thank you!")
-            if fine > 0:
-                print(f"Late fee of ${fine:.2f} has been charged to your account.")
-            return True
-            
         except ValueError as e:
             print(f"Error processing return date: {e}")
-            return False
+            return None
+            
+        # Calculate any fine for late return
+        fine = 0
+        if actual_return > end_date:
+            days_late = (actual_return - end_date).days
+            car = Car.get_car_by_id(car_id)
+            fine = days_late * (car.rental_price * 1.5)  # 150% of regular price as fine
+            print(f"Late return by {days_late} days. Fine: ${fine:.2f}")
+            
+            # Update customer balance
+            self.balance -= fine
+            
+        # Update rental record
+        active_rental["status"] = "completed"
+        active_rental["return_date"] = return_date
+        active_rental["fine_amount"] = fine
+        return active_rental
     
-    def view_rental_history(self):
-        """Display the rental history for this customer"""
-        if not self.rentals:
-            print("You don't have any rental history.")
-            return
-            
-        print("\n=== YOUR RENTAL HISTORY ===")
-        for rental in self.rentals:
-            car = Car.get_car_by_id(rental["car_id"])
-            car_info = f"{car.brand} {car.model}" if car else "Unknown Car"
-            
-            print(f"\nCar: {car_info} (ID: {rental['car_id']})")
-            print(f"Period: {rental['start_date']} to {rental['end_date']} ({rental['days']} days)")
-            print(f"Cost: ${rental['total_cost']:.2f}")
-            print(f"Status: {rental['status'].capitalize()}")
-            
-            if rental['status'] == "completed":
-                print(f"Return Date: {rental['return_date']}")
-                if rental['fine_amount'] > 0:
-                    print(f"Late Return Fine: ${rental['fine_amount']:.2f}")
+    @track("Customer.view_rental_history")
+    def view_rental_history(self, page_size=None):
+        """Display the rental history for this customer, page by page if page_size is given"""
+        from models.rental import RentalManager
+        RentalManager.show_rental_history(self.username, "\n=== YOUR RENTAL HISTORY ===",
+                                          "You don't have any rental history.", page_size)
     
+    @track("Customer.view_profile")
     def view_profile(self):
         """Display customer profile information"""
         print("\n=== YOUR PROFILE ===")
@@ -172,34 +202,52 @@ class Customer:
         print(f"Username: {self.username}")
         print(f"Current Balance: ${self.balance:.2f}")
         
-        # Count active rentals
-        active_rentals = sum(1 for rental in self.rentals if rental.get("status") == "active")
-        if active_rentals > 0:
-            print(f"Active Rentals: {active_rentals}")
+        totals = self.totals
+        if totals["active"] > 0:
+            print(f"Active Rentals: {totals['active']}")
         else:
             print("You have no active rentals.")
+        if totals["rentals"] > 0:
+            print(f"Lifetime Rentals: {totals['rentals']} (${totals['revenue']:.2f} spent, "
+                  f"${totals['fines']:.2f} in late fines)")
     
-    def _update_customer_data(self):
-        """Update customer data in the users.json file"""
-        if not os.path.exists("data"):
-            os.makedirs("data")
-        
+    def _adopt(self, committed):
+        """Take on the balance, version and rentals of a committed copy of this customer"""
+        self.balance = committed.balance
+        self.version = committed.version
+        self._rentals = committed._rentals
+    
+    @track("Customer.top_up")
+    def top_up(self, amount):
+        """Add amount to the stored balance, even if it changed since this copy was read"""
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
+        for _ in range(COMMIT_ATTEMPTS):
+            if self._update_customer_data(self.balance + amount):
+                print(f"Balance updated. New balance: ${self.balance:.2f}")
+                return True
+            # Another session changed the account: top up the stored balance instead
+            stats.record_conflict()
+            user = get_storage().get_user(self.username)
+            if user is None:
+                print(f"Customer '{self.username}' not found.")
+                return False
+            self.balance = float(user["balance"])
+            self.version = user.get("version", 0)
+        print("The account kept changing while saving. Please try again.")
+        return False
+    
+    @track("Customer._update_customer_data")
+    def _update_customer_data(self, balance=None):
+        """Store balance (default this copy's) if the stored record is still the one this copy was read from"""
+        balance = self.balance if balance is None else balance
         try:
-            if os.path.exists("data/users.json"):
-                with open("data/users.json", "r") as f:
-                    users = json.load(f)
-            else:
-                users = []
-                
-            # Find and update user
-            for user in users:
-                if user["username"] == self.username:
-                    user["balance"] = self.balance
-                    user["rentals"] = self.rentals
-                    break
-            
-            with open("data/users.json", "w") as f:
-                json.dump(users, f, indent=4)
-                
+            if not get_storage().commit_batch(users={self.username: {"balance": balance}},
+                                              versions={"users": {self.username: self.version}}):
+                return False
         except Exception as e:
             print(f"Error updating customer data: {e}")
+            return False
+        self.balance = balance
+        self.version += 1
+        return True
@@ -0,0 +1,93 @@
+"""Instrumented file helpers shared by the storage code.
+
+Every data file read or written by the models layer goes through these
+helpers so models.stats sees each open, the bytes moved and the time
+spent parsing and serializing.
+"""
+import os
+import threading
+import time
+from models import stats
+from models.serializers import SERIALIZERS, JsonSerializer
+
+
+def read_document(path, serializer):
+    """Load a store file written by serializer; raises OSError/ValueError on bad files"""
+    with open(path, "rb") as f:
+        payload = f.read()
+    start = time.perf_counter()
+    data = serializer.loads(payload)
+    stats.record_read(len(payload), time.perf_counter() - start)
+    return data
+
+
+def write_document(path, data, serializer):
+    """Atomically replace path with data encoded by serializer"""
+    start = time.perf_counter()
+    payload = serializer.dumps(data)
+    serialize_seconds = time.perf_counter() - start
+    _replace(path, payload)
+    stats.record_write(len(payload), serialize_seconds)
+
+
+def read_json(path):
+    """Parse a JSON file; raises OSError/ValueError like json.load"""
+    return read_document(path, SERIALIZERS["json"])
+
+
+def write_json(path, data, indent=4):
+    """Atomically replace path with data serialized as JSON"""
+    write_document(path, data, JsonSerializer(indent))
+
+
+def _replace(path, payload, durable=False):
+    """Write payload to a temporary file and rename it over path.
+
+    Readers never see a half-written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_bytes(path, offset=0):
+    """Return the contents of path from offset onwards"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    stats.record_read(len(data))
+    return data
+
+
+def write_bytes(path, data, serialize_seconds=0.0):
+    """Atomically replace path with data"""
+    _replace(path, data)
+    stats.record_write(len(data), serialize_seconds)
+
+
+def append_bytes(path, data):
+    with open(path, "ab") as f:
+        f.write(data)
+    stats.record_write(len(data))
+
+
+def read_text(path):
+    with open(path, "r") as f:
+        text = f.read()
+    stats.record_read(len(text))
+    return text
+
+
+def write_text(path, text, durable=False):
+    """Atomically replace path with text, fsyncing first if durable"""
+    _replace(path, text.encode("utf-8"), durable)
+    stats.record_write(len(text))
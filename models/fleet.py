@@ -0,0 +1,319 @@
+import threading
+from bisect import bisect_left, bisect_right
+from models.snapshot import FleetSnapshot
+from models.storage import get_storage
+
+# Fields the secondary indexes are built from
+INDEXED_FIELDS = ("brand", "model", "seating_capacity", "rental_price")
+
+
+def car_id_order(car_id):
+    """Sort key for car_ids: numeric IDs by value, before any others"""
+    return (0, int(car_id), "") if car_id.isdigit() else (1, 0, car_id)
+
+
+class FleetIndexes:
+    """Secondary indexes over the fleet for filtered searches.
+
+    Brands and models are hashed (case-insensitively) to lists of car_ids,
+    prices are kept as a sorted array searched with bisect, and cars are
+    bucketed by seat count. A search starts from the narrowest index it can
+    use and only looks at the records that index returns. The storage
+    order of the car_ids is kept too, with each car's position in it, so
+    listings can resume after any car without rescanning the fleet.
+    """
+
+    # Saved in fleet snapshots; the rest is derived from them
+    STATE = ("by_brand", "by_model", "by_seats", "prices", "price_ids")
+
+    def __init__(self, records):
+        self.car_ids = list(records)
+        self._positions = None
+        self.by_brand = {}
+        self.by_model = {}
+        self.by_seats = {}
+        for car_id, car in records.items():
+            self.by_brand.setdefault(car["brand"].lower(), []).append(car_id)
+            self.by_model.setdefault(car["model"].lower(), []).append(car_id)
+            self.by_seats.setdefault(car["seating_capacity"], []).append(car_id)
+        self.seat_counts = sorted(self.by_seats)
+
+        by_price = sorted((car["rental_price"], car_id) for car_id, car in records.items())
+        self.prices = [price for price, _ in by_price]
+        self.price_ids = [car_id for _, car_id in by_price]
+
+    @classmethod
+    def from_state(cls, car_ids, state):
+        """Rebuild the indexes of the cars car_ids from what state() returned"""
+        indexes = cls.__new__(cls)
+        indexes.car_ids = car_ids
+        indexes._positions = None
+        for name in cls.STATE:
+            setattr(indexes, name, state[name])
+        indexes.seat_counts = sorted(indexes.by_seats)
+        return indexes
+
+    def state(self):
+        return {name: getattr(self, name) for name in self.STATE}
+
+    @property
+    def positions(self):
+        """car_id -> position in storage order, built on first use"""
+        if self._positions is None:
+            self._positions = {car_id: i for i, car_id in enumerate(self.car_ids)}
+        return self._positions
+
+    def candidates(self, brand=None, model=None, min_seats=None, min_price=None, max_price=None):
+        """Return the car_ids matching the most selective filter given, or None"""
+        options = []
+        if brand:
+            options.append(self.by_brand.get(brand.lower(), []))
+        if model:
+            options.append(self.by_model.get(model.lower(), []))
+        if min_price is not None or max_price is not None:
+            lo = 0 if min_price is None else bisect_left(self.prices, min_price)
+            hi = len(self.prices) if max_price is None else bisect_right(self.prices, max_price)
+            options.append(self.price_ids[lo:hi])
+        if min_seats is not None:
+            start = bisect_left(self.seat_counts, min_seats)
+            options.append([car_id for seats in self.seat_counts[start:] for car_id in self.by_seats[seats]])
+        if not options:
+            return None
+        return min(options, key=len)
+
+
+class FleetRepository:
+    """Shared in-memory copy of the fleet, keyed by car_id.
+
+    The fleet is loaded from the storage engine once and kept in memory.
+    Every access compares the engine's signature for the cars store (a single
+    os.stat() for JSON files) and only reloads when it changed, so lookups by
+    car_id are O(1) dict hits without disk I/O. A load starts from the fleet
+    snapshot (see models.snapshot) when one was saved of the store as it is.
+    """
+
+    _records = {}
+    _indexes = None
+    _signature = None
+    _storage = None
+    # Durable signature of the snapshot matching the records, if any
+    _snapshot_key = None
+    _lock = threading.RLock()
+
+    @classmethod
+    def _refresh(cls):
+        """Reload the fleet if the cars store changed since the last read"""
+        storage = get_storage()
+        signature = storage.signature("cars")
+        if storage is cls._storage and signature is not None and signature == cls._signature:
+            return
+
+        key = storage.durable_signature("cars")
+        snapshot = FleetSnapshot.of(storage).load(key) if key is not None else None
+        if snapshot is not None:
+            records, index_state = snapshot
+            cls._records = records
+            cls._indexes = FleetIndexes.from_state(list(records), index_state)
+            cls._snapshot_key = key
+        else:
+            records = {}
+            try:
+                for car in storage.load_cars():
+                    records[car["car_id"]] = car
+            except Exception as e:
+                print(f"Error loading cars: {e}")
+                records = {}
+            cls._records = records
+            cls._indexes = None
+            cls._snapshot_key = None
+        cls._signature = signature
+        cls._storage = storage
+
+    @classmethod
+    def get(cls, car_id):
+        """Return the stored record for car_id, or None"""
+        with cls._lock:
+            cls._refresh()
+            return cls._records.get(car_id)
+
+    @classmethod
+    def get_many(cls, car_ids):
+        """Return {car_id: record} for those of car_ids that exist"""
+        with cls._lock:
+            cls._refresh()
+            records = cls._records
+            return {car_id: records[car_id] for car_id in car_ids if car_id in records}
+
+    @classmethod
+    def all(cls):
+        """Return every stored car record in storage order"""
+        with cls._lock:
+            cls._refresh()
+            return list(cls._records.values())
+
+    @classmethod
+    def iter_records(cls, after=None):
+        """Yield the stored car records in storage order, starting after the car_id after.
+
+        If the car after was removed, the listing goes on from the car with
+        the next car_id in sort order (see car_id_order).
+        """
+        with cls._lock:
+            cls._refresh()
+            if cls._indexes is None:
+                cls._indexes = FleetIndexes(cls._records)
+            records, car_ids = cls._records, cls._indexes.car_ids
+            if after is None:
+                start = 0
+            elif after in cls._indexes.positions:
+                start = cls._indexes.positions[after] + 1
+            else:
+                key = car_id_order(after)
+                later = [(car_id_order(car_id), i) for i, car_id in enumerate(car_ids) if car_id_order(car_id) > key]
+                start = min(later)[1] if later else len(car_ids)
+
+        # Cars removed since the iteration started are skipped
+        for i in range(start, len(car_ids)):
+            car = records.get(car_ids[i])
+            if car is not None:
+                yield car
+
+    @classmethod
+    def search(cls, brand=None, model=None, min_seats=None, min_price=None, max_price=None):
+        """Return the records matching every given filter, cheapest first"""
+        with cls._lock:
+            cls._refresh()
+            if cls._indexes is None:
+                cls._indexes = FleetIndexes(cls._records)
+            candidates = cls._indexes.candidates(brand, model, min_seats, min_price, max_price)
+            records = cls._records
+            if candidates is None:
+                candidates = list(records)
+
+            matches = []
+            for car_id in candidates:
+                car = records[car_id]
+                if brand and car["brand"].lower() != brand.lower():
+                    continue
+                if model and car["model"].lower() != model.lower():
+                    continue
+                if min_seats is not None and car["seating_capacity"] < min_seats:
+                    continue
+                if min_price is not None and car["rental_price"] < min_price:
+                    continue
+                if max_price is not None and car["rental_price"] > max_price:
+                    continue
+                matches.append(car)
+
+        matches.sort(key=lambda car: car["rental_price"])
+        return matches
+
+    @classmethod
+    def prime(cls, records):
+        """Adopt records that were just written to the cars store"""
+        with cls._lock:
+            storage = get_storage()
+            cls._records = {car["car_id"]: car for car in records}
+            cls._indexes = None
+            cls._signature = storage.signature("cars")
+            cls._storage = storage
+            cls._snapshot_key = None
+
+    @classmethod
+    def apply(cls, write, car_id, record):
+        """Run a single-car storage write and mirror it into the cache.
+
+        write receives the storage engine and returns True on success; record
+        is the car's new state, or None when the write removed it. The cache
+        is only patched in place if it was current before the write,
+        otherwise it is dropped and reloaded on the next access.
+        """
+        with cls._lock:
+            storage = get_storage()
+            # Other writers are kept out from the currency check to the new
+            # signature, so it covers this write and nothing else
+            with storage.locked("cars"):
+                current = storage is cls._storage and storage.signature("cars") == cls._signature
+                if not write(storage):
+                    return False
+                signature = storage.signature("cars")
+
+            if not current:
+                cls.invalidate()
+                return True
+
+            previous = cls._records.get(car_id)
+            if record is None:
+                cls._records.pop(car_id, None)
+            else:
+                cls._records[car_id] = record
+            if (previous is None or record is None
+                    or any(previous[f] != record[f] for f in INDEXED_FIELDS)):
+                cls._indexes = None
+            cls._signature = signature
+            return True
+
+    @classmethod
+    def apply_changes(cls, write, changes):
+        """Like apply, for a write that sets fields on several cars.
+
+        changes maps car_id -> fields; the storage engine bumps the version
+        of every car it changes, and so does the cached copy.
+        """
+        with cls._lock:
+            storage = get_storage()
+            with storage.locked("cars"):
+                current = storage is cls._storage and storage.signature("cars") == cls._signature
+                if not write(storage):
+                    return False
+                signature = storage.signature("cars")
+
+            if not current or any(car_id not in cls._records for car_id in changes):
+                cls.invalidate()
+                return True
+
+            for car_id, fields in changes.items():
+                previous = cls._records[car_id]
+                cls._records[car_id] = dict(previous, **fields, version=previous.get("version", 0) + 1)
+                if any(f in INDEXED_FIELDS for f in fields):
+                    cls._indexes = None
+            cls._signature = signature
+            return True
+
+    @classmethod
+    def save_snapshot(cls):
+        """Save the loaded fleet and its indexes as the fleet snapshot.
+
+        Only a fleet that is loaded and still current is saved, and only if
+        the snapshot on disk is older. Returns True if the snapshot matches
+        the cars store afterwards.
+        """
+        with cls._lock:
+            storage = get_storage()
+            # Taken before the check, so a write in between leaves the
+            # snapshot looking stale rather than the reverse
+            key = storage.durable_signature("cars")
+            if key is None or storage is not cls._storage or storage.signature("cars") != cls._signature:
+                return False
+            if key == cls._snapshot_key:
+                return True
+            if cls._indexes is None:
+                cls._indexes = FleetIndexes(cls._records)
+            try:
+                saved = FleetSnapshot.of(storage).save(key, cls._records, cls._indexes.state())
+            except OSError as e:
+                print(f"Error saving the fleet snapshot: {e}")
+                return False
+            if saved:
+                cls._snapshot_key = key
+            return saved
+
+    @classmethod
+    def invalidate(cls):
+        """Force the next access to reload the fleet"""
+        with cls._lock:
+            cls._records = {}
+            cls._indexes = None
+            cls._signature = None
+            cls._storage = None
+            cls._snapshot_key = None
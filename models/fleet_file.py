@@ -0,0 +1,327 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from models import stats
+from models.locking import FileLock
+
+MAGIC = b"CARF"
+LAYOUT_VERSION = 2
+
+# magic, layout version, record size, change counter, slots in use
+HEADER = struct.Struct("<4sHHQI")
+# car_id, brand, model, rental_price, seating_capacity, available, live, version
+RECORD = struct.Struct("<16s32s32sdHBBI")
+# Layout 1 records had no version; such files are upgraded when opened
+RECORD_V1 = struct.Struct("<16s32s32sdHBB")
+TEXT_WIDTHS = {"car_id": 16, "brand": 32, "model": 32}
+
+
+def check_widths(car):
+    """Raise ValueError if a text field of car does not fit its fixed-width slot"""
+    for field, width in TEXT_WIDTHS.items():
+        if len(car[field].encode("utf-8")) > width:
+            raise ValueError(f"{field} '{car[field]}' is longer than {width} bytes")
+
+
+def _encode(car):
+    check_widths(car)
+    return (car["car_id"].encode("utf-8"), car["brand"].encode("utf-8"), car["model"].encode("utf-8"),
+            float(car["rental_price"]), int(car["seating_capacity"]), int(bool(car["available"])), 1,
+            int(car.get("version", 0)))
+
+
+def _decode(values):
+    car_id, brand, model, rental_price, seating_capacity, available, _, version = values
+    return {
+        "car_id": car_id.rstrip(b"\0").decode("utf-8"),
+        "brand": brand.rstrip(b"\0").decode("utf-8"),
+        "model": model.rstrip(b"\0").decode("utf-8"),
+        "seating_capacity": seating_capacity,
+        "rental_price": rental_price,
+        "available": bool(available),
+        "version": version,
+    }
+
+
+class FleetFile:
+    """The fleet as fixed-width binary records in a memory-mapped file.
+
+    Each car fills one RECORD-sized slot after a small header, and a
+    car_id -> slot index is kept in memory. Changing a car's availability
+    or price rewrites its slot in place, removing a car clears the slot's
+    live flag, and new cars are added after the last slot. Full scans
+    unpack the records straight out of the mapping. Every change to a car
+    increments its version.
+
+    The header's change counter is odd while a write is in progress and
+    grows with every write. Readers in other processes use it to spot a
+    stale index or a scan that overlapped a write. Writers hold a file
+    lock. The file never shrinks, so no process's mapping is ever cut short.
+    """
+
+    GROW_BY = 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(path + ".lock")
+        self._mm = None
+        self._index = {}
+        self._indexed_changes = None
+
+        with self._file_lock:
+            if not os.path.exists(path) or os.stat(path).st_size < HEADER.size:
+                with open(path, "wb") as f:
+                    f.write(HEADER.pack(MAGIC, LAYOUT_VERSION, RECORD.size, 0, 0))
+                    f.write(b"\0" * RECORD.size * self.GROW_BY)
+            self._map()
+
+            magic, version, record_size, _, slots = HEADER.unpack_from(self._mm, 0)
+            if (magic, version, record_size) == (MAGIC, 1, RECORD_V1.size):
+                self._upgrade(slots)
+            elif (magic, version, record_size) != (MAGIC, LAYOUT_VERSION, RECORD.size):
+                raise ValueError(f"{path} is not a version {LAYOUT_VERSION} fleet file")
+
+    def _upgrade(self, slots):
+        """Rewrite a layout 1 file (no versions) in the current layout"""
+        rows = [values + (0,) for values in RECORD_V1.iter_unpack(
+            self._mm[HEADER.size:HEADER.size + slots * RECORD_V1.size])]
+        self._mm.close()
+        self._mm = None
+        capacity = (slots // self.GROW_BY + 1) * self.GROW_BY
+        with open(self.path + ".tmp", "wb") as f:
+            # The change counter starts past anything readers have seen
+            f.write(HEADER.pack(MAGIC, LAYOUT_VERSION, RECORD.size, 2, slots))
+            f.write(b"".join(RECORD.pack(*values) for values in rows))
+            f.write(b"\0" * RECORD.size * (capacity - slots))
+        os.replace(self.path + ".tmp", self.path)
+        self._map()
+
+    def _map(self):
+        """Map the whole file, remapping if another writer grew it"""
+        size = os.stat(self.path).st_size
+        if self._mm is not None and len(self._mm) == size:
+            return
+        if self._mm is not None:
+            self._mm.close()
+        with open(self.path, "r+b") as f:
+            self._mm = mmap.mmap(f.fileno(), size)
+
+    def _header(self):
+        _, _, _, changes, slots = HEADER.unpack_from(self._mm, 0)
+        return changes, slots
+
+    def _set_header(self, changes, slots):
+        HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, RECORD.size, changes, slots)
+
+    @staticmethod
+    def _offset(slot):
+        return HEADER.size + slot * RECORD.size
+
+    @property
+    def slots(self):
+        with self._lock:
+            self._map()
+            return self._header()[1]
+
+    def signature(self):
+        """Token that changes with every write, from any process"""
+        with self._lock:
+            self._map()
+            return self._header()[0]
+
+    def is_empty(self):
+        """True if no slot holds a live car; stops at the first one found"""
+        with self._lock:
+            self._map()
+            end = self._offset(self._header()[1])
+            with memoryview(self._mm)[HEADER.size:end] as view:
+                return not any(values[6] for values in RECORD.iter_unpack(view))
+
+    @staticmethod
+    def _unpack_all(buffer):
+        """Decode every live record in buffer; returns (records, car_id -> slot)"""
+        records = []
+        index = {}
+        names = {}
+        for slot, (car_id, brand, model, rental_price, seats, available, live, version) in enumerate(
+                RECORD.iter_unpack(buffer)):
+            if not live:
+                continue
+            # Brands and models repeat across the fleet; decode each once
+            brand_name = names.get(brand)
+            if brand_name is None:
+                brand_name = names[brand] = brand.rstrip(b"\0").decode("utf-8")
+            model_name = names.get(model)
+            if model_name is None:
+                model_name = names[model] = model.rstrip(b"\0").decode("utf-8")
+            car_id = car_id.rstrip(b"\0").decode("utf-8")
+            index[car_id] = slot
+            records.append({
+                "car_id": car_id,
+                "brand": brand_name,
+                "model": model_name,
+                "seating_capacity": seats,
+                "rental_price": rental_price,
+                "available": available == 1,
+                "version": version,
+            })
+        return records, index
+
+    def _scan(self):
+        """Decode every live car and rebuild the index, retrying if a write overlapped"""
+        while True:
+            self._map()
+            changes, slots = self._header()
+            if changes % 2:
+                self._settle()
+                continue
+            # Grown by another process since we mapped it
+            if self._offset(slots) > len(self._mm):
+                continue
+
+            start = time.perf_counter()
+            end = self._offset(slots)
+            with memoryview(self._mm)[HEADER.size:end] as view:
+                records, index = self._unpack_all(view)
+            if self._header()[0] == changes:
+                stats.record_read(end - HEADER.size, time.perf_counter() - start)
+                self._index = index
+                self._indexed_changes = changes
+                return records
+
+    def _settle(self):
+        """Wait for a write in progress; close out one left open by a crashed writer"""
+        with self._file_lock:
+            self._map()
+            changes, slots = self._header()
+            if changes % 2:
+                self._set_header(changes + 1, slots)
+
+    def _slot(self, car_id):
+        self._map()
+        if self._header()[0] != self._indexed_changes:
+            self._scan()
+        return self._index.get(car_id)
+
+    def records(self):
+        """Every live car record, in slot order"""
+        with self._lock:
+            return self._scan()
+
+    def get(self, car_id):
+        with self._lock:
+            slot = self._slot(car_id)
+            return None if slot is None else _decode(RECORD.unpack_from(self._mm, self._offset(slot)))
+
+    def _write(self, apply):
+        """Run apply(slots) between the two change counter bumps.
+
+        apply returns the new slot count. Callers hold both locks.
+        """
+        self._map()
+        changes, slots = self._header()
+        self._set_header(changes + 1, slots)
+        try:
+            slots = apply(slots)
+        finally:
+            self._set_header(changes + 2, slots)
+        # Our own write does not make the index stale
+        if self._indexed_changes == changes:
+            self._indexed_changes = changes + 2
+        return changes + 2
+
+    def _reserve(self, slots):
+        """Grow the file so that it holds at least slots records"""
+        if self._offset(slots) <= len(self._mm):
+            return
+        capacity = (slots // self.GROW_BY + 1) * self.GROW_BY
+        with open(self.path, "r+b") as f:
+            f.truncate(self._offset(capacity))
+        self._map()
+
+    @contextmanager
+    def locked(self):
+        """Keep other writers, in this process or any other, out of the fleet"""
+        with self._lock, self._file_lock:
+            yield
+
+    def update(self, car_id, **fields):
+        """Rewrite one car's slot in place"""
+        with self._lock, self._file_lock:
+            slot = self._slot(car_id)
+            if slot is None:
+                return False
+            car = _decode(RECORD.unpack_from(self._mm, self._offset(slot)))
+            car.update(fields, version=fields.get("version", car["version"] + 1))
+            values = _encode(car)
+
+            def apply(slots):
+                RECORD.pack_into(self._mm, self._offset(slot), *values)
+                return slots
+
+            self._write(apply)
+            stats.record_write(RECORD.size)
+            return True
+
+    def remove(self, car_id):
+        with self._lock, self._file_lock:
+            slot = self._slot(car_id)
+            if slot is None:
+                return False
+
+            def apply(slots):
+                RECORD.pack_into(self._mm, self._offset(slot), *([b""] * 3 + [0.0, 0, 0, 0, 0]))
+                return slots
+
+            self._write(apply)
+            self._index.pop(car_id, None)
+            stats.record_write(RECORD.size)
+            return True
+
+    def append(self, cars):
+        """Add new cars after the last slot; False if any car_id is taken"""
+        rows = [_encode(car) for car in cars]
+        with self._lock, self._file_lock:
+            self._scan()
+            if any(car["car_id"] in self._index for car in cars) or len({r[0] for r in rows}) < len(rows):
+                return False
+
+            def apply(slots):
+                self._reserve(slots + len(rows))
+                for i, values in enumerate(rows):
+                    RECORD.pack_into(self._mm, self._offset(slots + i), *values)
+                    self._index[cars[i]["car_id"]] = slots + i
+                return slots + len(rows)
+
+            self._write(apply)
+            stats.record_write(RECORD.size * len(rows))
+            return True
+
+    def rewrite(self, cars):
+        """Replace the whole fleet, packing it into the first slots"""
+        rows = [_encode(car) for car in cars]
+        with self._lock, self._file_lock:
+            self._map()
+
+            def apply(slots):
+                self._reserve(len(rows))
+                with memoryview(self._mm) as view:
+                    view[self._offset(0):self._offset(slots)] = bytes(self._offset(slots) - self._offset(0))
+                for i, values in enumerate(rows):
+                    RECORD.pack_into(self._mm, self._offset(i), *values)
+                return len(rows)
+
+            self._index = {car["car_id"]: i for i, car in enumerate(cars)}
+            self._indexed_changes = self._write(apply)
+            stats.record_write(RECORD.size * len(rows))
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
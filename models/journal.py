@@ -0,0 +1,332 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from models import stats
+from models.aggregates import RentalTotals
+from models.fileio import append_bytes, read_bytes, read_document, write_document
+from models.locking import FileLock
+from models.serializers import SERIALIZERS
+
+
+class RentalJournal:
+    """Rental store kept as a snapshot plus an append-only event journal.
+
+    The snapshot is the familiar username -> list of rentals document. Every
+    change is appended to the journal as one JSON line (created, returned,
+    fined or updated), so a write costs O(1) I/O instead of a rewrite of the
+    whole history. State is rebuilt from the snapshot plus the journal tail,
+    and the journal is folded back into the snapshot every compact_every
+    events. Replaying an event twice is harmless: created events are keyed by
+    rental_id and the others only set fields, so a crash between writing the
+    snapshot and truncating the journal loses nothing.
+
+    Running per-customer and per-car totals (see RentalTotals) are updated
+    as each event is applied and saved to totals_path with every snapshot.
+    baseline returns the totals of rentals kept outside this store (the
+    archive); it is only needed when the saved totals do not match the
+    snapshot and have to be recounted.
+
+    Writers hold a file lock (see locked), so processes sharing the data
+    directory never append to a journal another one is compacting.
+    """
+
+    COMPACT_EVERY = 1000
+
+    def __init__(self, snapshot_path, journal_path, compact_every=COMPACT_EVERY, serializer=None,
+                 totals_path=None, baseline=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.serializer = serializer or SERIALIZERS["json"]
+        self.compact_every = compact_every
+        self.totals_path = totals_path
+        self.baseline = baseline
+        self.totals = RentalTotals()
+        self._state = {}
+        self._ids = set()
+        self._snapshot_signature = None
+        self._offset = 0
+        self._pending = 0
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(journal_path + ".lock")
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def signature(self):
+        """Token that changes whenever the snapshot or the journal changes"""
+        return (self._signature(self.snapshot_path), self._signature(self.journal_path))
+
+    def _journal_size(self):
+        try:
+            return os.stat(self.journal_path).st_size
+        except OSError:
+            return 0
+
+    def _rebuild(self):
+        """Reload the snapshot and replay the whole journal on top of it"""
+        state = {}
+        if os.path.exists(self.snapshot_path) and os.stat(self.snapshot_path).st_size > 0:
+            try:
+                state = read_document(self.snapshot_path, self.serializer)
+            except Exception as e:
+                print(f"Error loading rentals: {e}")
+                state = {}
+
+        self._state = self._with_ids(state)
+        self._ids = {r["rental_id"] for rentals in state.values() for r in rentals}
+        self._snapshot_signature = self._signature(self.snapshot_path)
+        self.totals = self._load_totals()
+        self._offset = 0
+        self._pending = 0
+        self._read_tail()
+
+    @staticmethod
+    def _with_ids(state):
+        """Give rentals from before rental ids one, derived from their place in state.
+
+        Every process loading the same snapshot derives the same ids, and
+        the next snapshot written stores them.
+        """
+        taken = {r["rental_id"] for rentals in state.values() for r in rentals if r.get("rental_id")}
+        for username, rentals in state.items():
+            for i, rental in enumerate(rentals):
+                if not rental.get("rental_id"):
+                    rental_id = f"legacy-{username}-{i}"
+                    while rental_id in taken:
+                        rental_id += "+"
+                    rental["rental_id"] = rental_id
+                    taken.add(rental_id)
+        return state
+
+    def _load_totals(self):
+        """Saved totals if they were written with this snapshot, otherwise a recount"""
+        if self.totals_path and self._snapshot_signature and os.path.exists(self.totals_path):
+            try:
+                document = read_document(self.totals_path, self.serializer)
+                if document["snapshot"] == list(self._snapshot_signature):
+                    return RentalTotals.from_document(document)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Recounting rental totals: {e}")
+
+        totals = RentalTotals.from_rentals(self._state)
+        if self.baseline:
+            totals.merge(self.baseline())
+        return totals
+
+    def _read_tail(self):
+        """Apply journal lines written since the last read"""
+        if not os.path.exists(self.journal_path):
+            return
+
+        data = read_bytes(self.journal_path, self._offset)
+
+        # A line without its newline is still being written; leave it for later
+        end = data.rfind(b"\n") + 1
+        start = time.perf_counter()
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError) as e:
+                print(f"Skipping corrupt rental journal entry: {e}")
+            self._pending += 1
+        stats.record_parse(time.perf_counter() - start)
+        self._offset += end
+
+    def _refresh(self):
+        if self._signature(self.snapshot_path) != self._snapshot_signature:
+            self._rebuild()
+            return
+
+        size = self._journal_size()
+        if size < self._offset:
+            self._rebuild()
+        elif size > self._offset:
+            self._read_tail()
+
+    @staticmethod
+    def _find(rentals, rental_id, car_id):
+        for rental in rentals:
+            if rental_id and rental.get("rental_id") == rental_id:
+                return rental
+        for rental in rentals:
+            if not rental_id and rental["car_id"] == car_id and rental["status"] == "active":
+                return rental
+        return None
+
+    def _apply(self, event):
+        username = event["username"]
+        if event["event"] == "created":
+            rental = event["rental"]
+            rental_id = rental.get("rental_id")
+            if rental_id:
+                if rental_id in self._ids:
+                    return
+                self._ids.add(rental_id)
+            self._state.setdefault(username, []).append(rental)
+            self.totals.count(username, rental)
+            return
+
+        target = self._find(self._state.get(username, []), event.get("rental_id"), event.get("car_id"))
+        if target is not None:
+            self.totals.count(username, target, -1)
+            target.update(event["fields"])
+            self.totals.count(username, target)
+
+    def _append(self, *events):
+        data = "".join(json.dumps(event) + "\n" for event in events).encode("utf-8")
+        append_bytes(self.journal_path, data)
+        self._read_tail()
+
+        if self._pending >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        """Fold the journal into the snapshot and start an empty journal"""
+        write_document(self.snapshot_path, self._state, self.serializer)
+        self._snapshot_signature = self._signature(self.snapshot_path)
+        if self.totals_path:
+            document = self.totals.to_document()
+            document["snapshot"] = list(self._snapshot_signature)
+            write_document(self.totals_path, document, self.serializer)
+        open(self.journal_path, "wb").close()
+        self._offset = 0
+        self._pending = 0
+
+    @contextmanager
+    def locked(self):
+        """Keep other writers, in this process or any other, out of the journal"""
+        with self._lock, self._file_lock:
+            yield
+
+    def load(self):
+        """Return a copy of every rental, keyed by username"""
+        with self._lock:
+            self._refresh()
+            return {username: [dict(r) for r in rentals] for username, rentals in self._state.items()}
+
+    def load_user(self, username):
+        """Return a copy of one user's rentals"""
+        with self._lock:
+            self._refresh()
+            return [dict(r) for r in self._state.get(username, [])]
+
+    def move_out(self, predicate, sink):
+        """Pass the rentals matching predicate to sink, then drop them from the store.
+
+        sink returns the rental_ids it has stored; any other rental stays.
+        Returns how many rentals were moved.
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            moving = {}
+            remaining = {}
+            for username, rentals in self._state.items():
+                for rental in rentals:
+                    (moving if predicate(rental) else remaining).setdefault(username, []).append(rental)
+            if not moving:
+                return 0
+
+            stored = sink(moving) or set()
+            count = 0
+            for username, rentals in moving.items():
+                for rental in rentals:
+                    if rental.get("rental_id") in stored:
+                        count += 1
+                    else:
+                        remaining.setdefault(username, []).append(rental)
+            if count:
+                # Moved rentals still count towards the totals
+                self.replace(remaining, self.totals)
+            return count
+
+    def replace(self, rentals, totals=None):
+        """Replace the whole store, writing it straight to a fresh snapshot.
+
+        The totals are recounted from rentals unless given.
+        """
+        with self._lock, self._file_lock:
+            self._state = self._with_ids({username: [dict(r) for r in rs] for username, rs in rentals.items()})
+            self._ids = {r["rental_id"] for rs in self._state.values() for r in rs}
+            self.totals = totals or RentalTotals.from_rentals(self._state)
+            self._compact()
+            return True
+
+    def add(self, username, rental):
+        with self._lock, self._file_lock:
+            self._refresh()
+            self._append({"event": "created", "username": username, "rental": rental})
+            return True
+
+    @staticmethod
+    def _kind(fields):
+        if fields.get("status", "active") != "active":
+            return "returned"
+        if set(fields) == {"accrued_fine"}:
+            return "fined"
+        return "updated"
+
+    def is_active(self, username, rental_id, car_id):
+        """True if username holds the given rental (or, without an id, an active one for car_id)"""
+        with self._lock:
+            self._refresh()
+            target = self._find(self._state.get(username, []), rental_id, car_id)
+            return target is not None and target["status"] == "active"
+
+    def add_batch(self, created, updates):
+        """Journal new rentals and (username, rental_id, car_id, fields) changes in one append"""
+        with self._lock, self._file_lock:
+            self._refresh()
+            events = [{"event": "created", "username": username, "rental": rental}
+                      for username, rental in created]
+            events += [{"event": self._kind(fields), "username": username, "rental_id": rental_id,
+                        "car_id": car_id, "fields": fields}
+                       for username, rental_id, car_id, fields in updates]
+            self._append(*events)
+            return True
+
+    def update(self, username, car_id, fields):
+        """Journal a change to the active rental of car_id held by username"""
+        with self._lock, self._file_lock:
+            self._refresh()
+            target = self._find(self._state.get(username, []), None, car_id)
+            if target is None:
+                return False
+
+            self._append({
+                "event": self._kind(fields),
+                "username": username,
+                "rental_id": target.get("rental_id"),
+                "car_id": car_id,
+                "fields": fields,
+            })
+            return True
+
+    def customer_totals(self, username):
+        with self._lock:
+            self._refresh()
+            return self.totals.customer(username)
+
+    def car_totals(self, car_id):
+        with self._lock:
+            self._refresh()
+            return self.totals.car(car_id)
+
+    def all_totals(self):
+        """A copy of every customer's and car's totals"""
+        with self._lock:
+            self._refresh()
+            return self.totals.copy()
+
+    def compact(self):
+        with self._lock, self._file_lock:
+            self._refresh()
+            self._compact()
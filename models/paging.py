@@ -0,0 +1,84 @@
+"""Page-at-a-time listings.
+
+Listing APIs walk the stores lazily and hand out one Page at a time.
+A page can be requested by cursor (the key of the last item already
+seen: a car_id or a rental_id) or by offset. Cursors stay put when
+items are added or removed in front of them; offsets do not. A car
+listing whose cursor car was removed goes on from the next car_id.
+"""
+from itertools import islice
+
+PAGE_SIZE = 20
+
+
+class Page:
+    """One page of a listing and the cursor to fetch the next (None on the last page)"""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return f"Page({len(self.items)} items, next_cursor={self.next_cursor!r})"
+
+
+def paginate(items, key, page_size=PAGE_SIZE, offset=0):
+    """Take one page from an iterable, reading only as far as the page needs"""
+    if page_size < 1:
+        raise ValueError("Page size must be at least 1")
+    # One extra item tells us whether there is a next page
+    taken = list(islice(items, offset, offset + page_size + 1))
+    if len(taken) > page_size:
+        return Page(taken[:page_size], key(taken[page_size - 1]))
+    return Page(taken)
+
+
+def resume_after(items, after, key):
+    """Yield the items following the one whose key is after (all of them if after is None)"""
+    items = iter(items)
+    if after is not None:
+        for item in items:
+            if key(item) == after:
+                break
+        else:
+            raise ValueError(f"Unknown cursor '{after}'")
+    yield from items
+
+
+def iter_pages(fetch):
+    """Yield fetch(cursor) pages, following each page's cursor to the next"""
+    cursor = None
+    while True:
+        page = fetch(cursor)
+        yield page
+        if page.next_cursor is None:
+            return
+        cursor = page.next_cursor
+
+
+def show_pages(pages, show, header, empty_message, prompt=True):
+    """Print a listing page by page, asking before each further page if prompt.
+
+    show prints one item. Returns how many items were shown.
+    """
+    shown = 0
+    for page in pages:
+        if not shown:
+            if not page.items:
+                break
+            print(header)
+        for item in page:
+            show(item)
+        shown += len(page)
+        if prompt and page.next_cursor is not None:
+            if input(f"\n-- {shown} shown. Press Enter for more or q to stop: ").strip().lower() == "q":
+                break
+    if not shown:
+        print(empty_message)
+    return shown
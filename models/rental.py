@@ -1,73 +1,276 @@
-import json
-import os
 from models.car import Car
+from models.paging import PAGE_SIZE, Page, iter_pages, paginate, show_pages
+from models import stats
+from models.stats import track
+from models.storage import COMMIT_ATTEMPTS, get_storage, new_rental_id
 from datetime import datetime
 
 class RentalManager:
     """Class to manage all rentals in the system"""
     
     @classmethod
-    def load_rentals(cls):
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        if not os.path.exists("data/rentals.json") or os.stat("data/rentals.json").st_size == 0:
-            return {}
-        
+    @track("RentalManager.load_rentals")
+    def load_rentals(cls, status=None, start_date=None, end_date=None):
         try:
-            with open("data/rentals.json", "r") as f:
-                return json.load(f)
+            return get_storage().load_rentals(status, start_date, end_date)
         except Exception as e:
             print(f"Error loading rentals: {e}")
             return {}
     
     @classmethod
+    @track("RentalManager.load_user_rentals")
+    def load_user_rentals(cls, username):
+        try:
+            return get_storage().load_user_rentals(username)
+        except Exception as e:
+            print(f"Error loading rentals: {e}")
+            return []
+    
+    @classmethod
+    def iter_user_rentals(cls, username, after=None):
+        """Yield one user's rentals oldest first, starting after the rental_id after"""
+        return get_storage().iter_user_rentals(username, after)
+    
+    @classmethod
+    @track("RentalManager.page_user_rentals")
+    def page_user_rentals(cls, username, page_size=PAGE_SIZE, after=None, offset=0):
+        """One page of a user's rental history; pass next_cursor as after for the next one"""
+        return paginate(cls.iter_user_rentals(username, after), lambda r: r.get("rental_id"), page_size, offset)
+    
+    @classmethod
+    @track("RentalManager.save_rentals")
     def save_rentals(cls, rentals):
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
         try:
-            with open("data/rentals.json", "w") as f:
-                json.dump(rentals, f, indent=4)
+            get_storage().save_rentals(rentals)
         except Exception as e:
             print(f"Error saving rentals: {e}")
     
     @classmethod
+    @track("RentalManager.add_rental")
     def add_rental(cls, username, rental):
         """Add a rental record to the global rental database"""
-        rentals = cls.load_rentals()
-        
-        if username not in rentals:
-            rentals[username] = []
-            
-        rentals[username].append(rental)
-        cls.save_rentals(rentals)
+        rental.setdefault("rental_id", new_rental_id())
+        try:
+            get_storage().add_rental(username, dict(rental))
+        except Exception as e:
+            print(f"Error saving rentals: {e}")
     
     @classmethod
+    @track("RentalManager.update_rental_status")
     def update_rental_status(cls, username, car_id, status, return_date=None, fine_amount=0):
         """Update rental status in the global rental database"""
-        rentals = cls.load_rentals()
+        fields = {"status": status}
+        if return_date:
+            fields["return_date"] = return_date
+        if fine_amount > 0 or status == "completed":
+            fields["fine_amount"] = fine_amount
+        if status == "completed":
+            fields["accrued_fine"] = 0
         
-        if username not in rentals:
-            print(f"No rentals found for user {username}")
-            return False
-            
-        for rental in rentals[username]:
-            if rental["car_id"] == car_id and rental["status"] == "active":
-                rental["status"] = status
-                if return_date:
-                    rental["return_date"] = return_date
-                if fine_amount > 0:
-                    rental["fine_amount"] = fine_amount
-                cls.save_rentals(rentals)
+        try:
+            if get_storage().update_rental(username, car_id, **fields):
                 return True
-                
+        except Exception as e:
+            print(f"Error saving rentals: {e}")
+            return False
+        
+        print(f"No rentals found for user {username}")
         return False
     
     @classmethod
+    @track("RentalManager.archive_rentals")
+    def archive_rentals(cls, before):
+        """Move completed rentals that started before the date into the monthly archive"""
+        try:
+            return get_storage().archive_rentals(before)
+        except Exception as e:
+            print(f"Error archiving rentals: {e}")
+            return 0
+    
+    @classmethod
+    @track("RentalManager.rental_totals")
+    def rental_totals(cls, username):
+        """Active and lifetime rentals, revenue and fines of one customer"""
+        try:
+            return get_storage().rental_totals(username)
+        except Exception as e:
+            print(f"Error loading rental totals: {e}")
+            return {}
+    
+    @classmethod
+    @track("RentalManager.load_rental_totals")
+    def load_rental_totals(cls):
+        try:
+            return get_storage().load_rental_totals()
+        except Exception as e:
+            print(f"Error loading rental totals: {e}")
+            return {}
+    
+    @classmethod
+    @track("RentalManager.load_car_totals")
+    def load_car_totals(cls):
+        try:
+            return get_storage().load_car_totals()
+        except Exception as e:
+            print(f"Error loading rental totals: {e}")
+            return {}
+    
+    @classmethod
+    @track("RentalManager.rent_cars")
+    def rent_cars(cls, bookings):
+        """Rent many cars in one transaction; bookings are (username, car_id, start_date, end_date).
+
+        Every booking is checked against the stores and the rest of the batch
+        first. If any is refused nothing is written; otherwise cars, rentals
+        and users are each committed once. These are fleet bookings: one
+        (corporate) customer may hold any number of the cars, so the
+        one-car-at-a-time limit of rent_car does not apply.
+        """
+        committed = cls._rent(bookings, fleet=True)
+        if committed is None:
+            return False
+        
+        new_rentals = committed[1]
+        total = sum(rental["total_cost"] for _, rental in new_rentals)
+        print(f"{len(new_rentals)} cars rented successfully for ${total:.2f}.")
+        return True
+    
+    @classmethod
+    @track("RentalManager.return_cars")
+    def return_cars(cls, returns):
+        """Return many cars in one transaction; returns are (username, car_id, return_date)"""
+        committed = cls._return(returns)
+        if committed is None:
+            return False
+        
+        rental_updates = committed[2]
+        fines = sum(fields.get("fine_amount", 0) for _, _, _, fields in rental_updates)
+        print(f"{len(rental_updates)} cars returned successfully.")
+        if fines > 0:
+            print(f"Late fees of ${fines:.2f} have been charged.")
+        return True
+    
+    @classmethod
+    def _rent(cls, bookings, fleet=False):
+        """Check and commit bookings; returns (customers, new_rentals, []) as committed, or None.
+
+        fleet lifts the one-car-at-a-time limit (see Customer._book).
+        """
+        bookings = list(bookings)
+        
+        def build(customers):
+            claimed = {}
+            new_rentals = []
+            for username, car_id, start_date, end_date in bookings:
+                rental = customers[username]._book(car_id, start_date, end_date, claimed.get(car_id, ()), fleet)
+                if rental is None:
+                    if len(bookings) > 1:
+                        print(f"Batch rejected at {username} / car {car_id}. Nothing was rented.")
+                    return None
+                claimed.setdefault(car_id, []).append((rental["start_date"], rental["end_date"]))
+                new_rentals.append((username, dict(rental)))
+            return {car_id: {"available": False} for car_id in claimed}, new_rentals, []
+        
+        return cls._transact([b[0] for b in bookings], [b[1] for b in bookings], build)
+    
+    @classmethod
+    def _return(cls, returns):
+        """Check and commit returns; returns (customers, [], rental_updates) as committed, or None"""
+        from models.reservation import ReservationIndex
+        
+        returns = list(returns)
+        
+        def build(customers):
+            returned = {}
+            rental_updates = []
+            for username, car_id, return_date in returns:
+                rental = customers[username]._settle(car_id, return_date)
+                if rental is None:
+                    if len(returns) > 1:
+                        print(f"Batch rejected at {username} / car {car_id}. Nothing was returned.")
+                    return None
+                returned[car_id] = returned.get(car_id, 0) + 1
+                # The fine charged replaces whatever accrued while overdue
+                fields = {"status": "completed", "return_date": return_date, "fine_amount": rental["fine_amount"],
+                          "accrued_fine": 0}
+                rental_updates.append((username, rental.get("rental_id"), car_id, fields))
+            # A car stays booked if it has reservations besides the ones returned here
+            cars = {car_id: {"available": len(ReservationIndex.bookings(car_id)) <= count}
+                    for car_id, count in returned.items()}
+            return cars, [], rental_updates
+        
+        return cls._transact([r[0] for r in returns], [r[1] for r in returns], build)
+    
+    @classmethod
+    def _transact(cls, usernames, car_ids, build):
+        """Commit the changes build(customers) returns, with optimistic concurrency.
+
+        The versions of the cars and customers involved are read before
+        build checks anything, and the commit is refused if any of them has
+        changed since (another process or thread got there first). Then
+        everything is read again and checked again, up to COMMIT_ATTEMPTS
+        times. build returns (cars, new_rentals, rental_updates), or None
+        to give up. Returns (customers, new_rentals, rental_updates) as
+        committed, or None.
+        """
+        from models.fleet import FleetRepository
+        
+        for _ in range(COMMIT_ATTEMPTS):
+            car_versions = {}
+            for car_id in set(car_ids):
+                car = FleetRepository.get(car_id)
+                if car is not None:
+                    car_versions[car_id] = car.get("version", 0)
+            customers = cls._load_customers(usernames)
+            if customers is None:
+                return None
+            
+            change = build(customers)
+            if change is None:
+                return None
+            cars, new_rentals, rental_updates = change
+            users = {username: {"balance": c.balance} for username, c in customers.items()}
+            versions = {"cars": car_versions, "users": {username: c.version for username, c in customers.items()}}
+            try:
+                if FleetRepository.apply_changes(
+                        lambda storage: storage.commit_batch(cars, users, new_rentals, rental_updates, versions),
+                        cars):
+                    for customer in customers.values():
+                        customer.version += 1
+                    return customers, new_rentals, rental_updates
+            except Exception as e:
+                print(f"Error saving batch: {e}")
+                FleetRepository.invalidate()
+                return None
+            # Someone else changed one of these cars or customers: start over from fresh copies
+            stats.record_conflict()
+            FleetRepository.invalidate()
+        
+        print("The records kept changing while saving. Nothing was changed; please try again.")
+        return None
+    
+    @classmethod
+    def _load_customers(cls, usernames):
+        """Load each named customer once; None if any is unknown"""
+        from models.customer import Customer
+        
+        customers = {}
+        for username in usernames:
+            if username in customers:
+                continue
+            user = get_storage().get_user(username)
+            if user is None:
+                print(f"Customer '{username}' not found. Nothing was changed.")
+                return None
+            customers[username] = Customer(**user)
+        return customers
+    
+    @classmethod
+    @track("RentalManager.view_active_rentals")
     def view_active_rentals(cls):
         """Admin function to view all active rentals"""
-        rentals = cls.load_rentals()
+        rentals = cls.load_rentals(status="active")
+        car_map = Car.load_car_map()
         
         active_count = 0
         print("\n=== ACTIVE RENTALS ===")
@@ -76,7 +279,7 @@ class RentalManager:
             for rental in user_rentals:
                 if rental["status"] == "active":
                     active_count += 1
-                    car = Car.get_car_by_id(rental["car_id"])
+                    car = car_map.get(rental["car_id"])
                     car_info = f"{car.brand} {car.model}" if car else "Unknown Car"
                     
                     print(f"\nCustomer: {username}")
@@ -88,55 +291,73 @@ class RentalManager:
             print("No active rentals found.")
     
     @classmethod
+    @track("RentalManager.view_customer_rentals")
     def view_customer_rentals(cls):
         """Admin function to view all customers with their current rentals"""
-        rentals = cls.load_rentals()
+        totals = cls.load_rental_totals()
         
-        if not rentals:
+        if not any(t["rentals"] for t in totals.values()):
             print("No rental records found in the system.")
             return
         
+        # Counts come from the running totals; only active rentals are loaded
+        rentals = cls.load_rentals(status="active")
+        car_map = Car.load_car_map()
         print("\n=== CUSTOMERS WITH RENTALS ===")
-        for username, user_rentals in rentals.items():
-            active_rentals = [r for r in user_rentals if r["status"] == "active"]
-            completed_rentals = [r for r in user_rentals if r["status"] == "completed"]
+        for username, user_totals in totals.items():
+            if not user_totals["rentals"]:
+                continue
+            active_rentals = rentals.get(username, [])
             
             print(f"\nCustomer: {username}")
-            print(f"Active Rentals: {len(active_rentals)}")
-            print(f"Completed Rentals: {len(completed_rentals)}")
+            print(f"Active Rentals: {user_totals['active']}")
+            print(f"Completed Rentals: {user_totals['rentals'] - user_totals['active']}")
             
             if active_rentals:
                 print("Current Rentals:")
                 for rental in active_rentals:
-                    car = Car.get_car_by_id(rental["car_id"])
+                    car = car_map.get(rental["car_id"])
                     car_info = f"{car.brand} {car.model}" if car else "Unknown Car"
                     print(f"  - {car_info} (ID: {rental['car_id']}) until {rental['end_date']}")
     
     @classmethod
-    def view_customer_rental_history(cls, username):
+    @track("RentalManager.view_customer_rental_history")
+    def view_customer_rental_history(cls, username, page_size=None):
         """Admin function to view rental history for a specific customer"""
-        rentals = cls.load_rentals()
+        cls.show_rental_history(username, f"\n=== RENTAL HISTORY FOR {username.upper()} ===",
+                                f"No rental records found for customer '{username}'.", page_size)
+    
+    @classmethod
+    def show_rental_history(cls, username, header, empty_message, page_size=None):
+        """Print a user's rentals; with a page_size, one page at a time asking before each next page"""
+        try:
+            pages = iter_pages(lambda cursor: cls.page_user_rentals(username, page_size or PAGE_SIZE, cursor))
+            show_pages(cls._with_cars(pages), lambda item: cls._show_rental(*item), header, empty_message,
+                       prompt=page_size is not None)
+        except Exception as e:
+            print(f"Error loading rentals: {e}")
+    
+    @staticmethod
+    def _with_cars(pages):
+        """Pair every rental with a car map of its page, looked up once per page"""
+        for page in pages:
+            car_map = Car.load_car_map({rental["car_id"] for rental in page})
+            yield Page([(rental, car_map) for rental in page], page.next_cursor)
+    
+    @staticmethod
+    def _show_rental(rental, car_map):
+        car = car_map.get(rental["car_id"])
+        car_info = f"{car.brand} {car.model}" if car else "Unknown Car"
         
-        if username not in rentals:
-            print(f"No rental records found for customer '{username}'.")
-            return
-            
-        user_rentals = rentals[username]
+        print(f"\nCar: {car_info} (ID: {rental['car_id']})")
+        print(f"Period: {rental['start_date']} to {rental['end_date']} ({rental['days']} days)")
+        print(f"Cost: ${rental['total_cost']:.2f}")
+        print(f"Status: {rental['status'].capitalize()}")
         
-        print(f"\n=== RENTAL HISTORY FOR {username.upper()} ===")
-        for rental in user_rentals:
-            car = Car.get_car_by_id(rental["car_id"])
-            car_info = f"{car.brand} {car.model}" if car else "Unknown Car"
-            
-            print(f"\nCar: {car_info} (ID: {rental['car_id']})")
-            print(f"Period: {rental['start_date']} to {rental['end_date']} ({rental['days']} days)")
-            print(f"Cost: ${rental['total_cost']:.2f}")
-            print(f"Status: {rental['status'].capitalize()}")
-            
-            if rental['status'] == "completed":
-                print(f"Return Date: {rental['return_date']}")
-                if rental.get('fine_amount', 0) > 0:
-                    print(f"Late Return Fine: ${rental['fine_amount']:.2f}")
+        if rental['status'] == "completed":
+            print(f"Return Date: {rental['return_date']}")
+            if rental.get('fine_amount', 0) > 0:
+                print(f"Late Return Fine: ${rental['fine_amount']:.2f}")
     
     @classmethod
     def display_fine_policy(cls):
@@ -0,0 +1,123 @@
+import threading
+from bisect import bisect_right
+from datetime import date
+from models.storage import get_storage
+
+
+class ReservationIndex:
+    """Interval index over the date ranges cars are booked for.
+
+    Built from the active rentals in the rental store and rebuilt whenever
+    that store changes (or the day rolls over). Each car keeps its bookings
+    as a sorted interval list, so checking one car is a bisect. All bookings
+    together are kept sorted by start date with a max-end segment tree on
+    top, so finding every car that is busy in a window costs
+    O(log n + k log n) for k overlapping bookings instead of a full scan.
+
+    Dates are ISO strings (YYYY-MM-DD), which sort the same way as the dates
+    they represent. An active rental that is past its end date still holds
+    the car until it is returned, so its interval is stretched to today.
+    """
+
+    _key = None
+    _by_car = {}
+    _starts = []
+    _ends = []
+    _car_ids = []
+    _tree = []
+    _size = 0
+    _lock = threading.RLock()
+
+    @classmethod
+    def _refresh(cls):
+        from models.rental import RentalManager
+
+        storage = get_storage()
+        today = date.today().isoformat()
+        key = (id(storage), storage.signature("rentals"), today)
+        if key == cls._key and key[1] is not None:
+            return
+
+        bookings = []
+        for user_rentals in RentalManager.load_rentals(status="active").values():
+            for rental in user_rentals:
+                if rental.get("status") == "active":
+                    end = max(rental["end_date"], today)
+                    bookings.append((rental["start_date"], end, rental["car_id"]))
+        bookings.sort()
+
+        # Per car: starts, ends, and the running maximum of ends ("reach")
+        by_car = {}
+        for start, end, car_id in bookings:
+            starts, ends, reach = by_car.setdefault(car_id, ([], [], []))
+            starts.append(start)
+            ends.append(end)
+            reach.append(max(end, reach[-1]) if reach else end)
+
+        cls._by_car = by_car
+        cls._starts = [b[0] for b in bookings]
+        cls._ends = [b[1] for b in bookings]
+        cls._car_ids = [b[2] for b in bookings]
+        cls._build_tree()
+        cls._key = key
+
+    @classmethod
+    def _build_tree(cls):
+        """Segment tree holding the latest end date of each subtree"""
+        size = 1
+        while size < len(cls._ends):
+            size *= 2
+        tree = [""] * (2 * size)
+        tree[size:size + len(cls._ends)] = cls._ends
+        for i in range(size - 1, 0, -1):
+            tree[i] = max(tree[2 * i], tree[2 * i + 1])
+        cls._tree = tree
+        cls._size = size
+
+    @classmethod
+    def _collect(cls, node, lo, hi, limit, start, found):
+        """Gather bookings among the first `limit` that end on or after start"""
+        if lo >= limit or cls._tree[node] < start:
+            return
+        if hi - lo == 1:
+            found.add(cls._car_ids[lo])
+            return
+        mid = (lo + hi) // 2
+        cls._collect(2 * node, lo, mid, limit, start, found)
+        cls._collect(2 * node + 1, mid, hi, limit, start, found)
+
+    @classmethod
+    def busy_car_ids(cls, start_date, end_date):
+        """Return the ids of cars booked at any point from start_date to end_date"""
+        with cls._lock:
+            cls._refresh()
+            found = set()
+            limit = bisect_right(cls._starts, end_date)
+            if limit:
+                cls._collect(1, 0, cls._size, limit, start_date, found)
+            return found
+
+    @classmethod
+    def is_free(cls, car_id, start_date, end_date):
+        """Check whether car_id has no booking overlapping the window"""
+        with cls._lock:
+            cls._refresh()
+            if car_id not in cls._by_car:
+                return True
+            starts, _, reach = cls._by_car[car_id]
+            i = bisect_right(starts, end_date) - 1
+            return i < 0 or reach[i] < start_date
+
+    @classmethod
+    def bookings(cls, car_id):
+        """Return the (start_date, end_date) intervals booked for car_id"""
+        with cls._lock:
+            cls._refresh()
+            starts, ends, _ = cls._by_car.get(car_id, ([], [], []))
+            return list(zip(starts, ends))
+
+    @classmethod
+    def has_bookings(cls, car_id):
+        with cls._lock:
+            cls._refresh()
+            return car_id in cls._by_car
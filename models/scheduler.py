@@ -0,0 +1,183 @@
+"""Due dates of active rentals and overdue fine assessment.
+
+    python -m models.scheduler                    # report and accrue fines as of today
+    python -m models.scheduler --date 2025-06-30 --report-only
+
+Fines are only charged to a customer's balance when the car comes back
+(see Customer.return_car). The assessment job records the fine each
+overdue rental has run up so far in the rental's accrued_fine, apart
+from fine_amount: fine totals and analytics only count fines once the
+return has settled them. Assessing the fines needs numpy.
+"""
+import heapq
+import threading
+from datetime import date
+from models.fleet import FleetRepository
+from models.stats import track
+from models.storage import get_storage
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Late returns are charged 150% of the daily rate per day late
+FINE_RATE = 1.5
+
+
+class DueDateScheduler:
+    """Active rentals in a min-heap ordered by end date.
+
+    Rebuilt (heapify, O(n)) from the active rentals whenever the rental
+    store changes. Queries never pop: they walk the heap array from the
+    root and only descend into children ending on or before the bound, so
+    finding the k rentals due by a date costs O(k log k) however many
+    rentals are active.
+    """
+
+    _key = None
+    _heap = []
+    _lock = threading.RLock()
+
+    @classmethod
+    def _refresh(cls):
+        from models.rental import RentalManager
+
+        storage = get_storage()
+        key = (id(storage), storage.signature("rentals"))
+        if key == cls._key and key[1] is not None:
+            return
+
+        heap = []
+        for username, user_rentals in RentalManager.load_rentals(status="active").items():
+            for rental in user_rentals:
+                if rental.get("status") == "active":
+                    # len(heap) breaks ties so the rental dicts are never compared
+                    heap.append((rental["end_date"], len(heap), username, rental))
+        heapq.heapify(heap)
+        cls._heap = heap
+        cls._key = key
+
+    @classmethod
+    def _ending_by(cls, last_day):
+        """(username, rental) for every active rental ending on or before last_day, earliest first"""
+        with cls._lock:
+            cls._refresh()
+            heap = cls._heap
+            found = []
+            pending = [0] if heap and heap[0][0] <= last_day else []
+            while pending:
+                i = pending.pop()
+                found.append(heap[i])
+                for child in (2 * i + 1, 2 * i + 2):
+                    if child < len(heap) and heap[child][0] <= last_day:
+                        pending.append(child)
+        found.sort(key=lambda entry: entry[:2])
+        return [(username, dict(rental)) for _, _, username, rental in found]
+
+    @classmethod
+    @track("DueDateScheduler.due_on")
+    def due_on(cls, day=None):
+        """Active rentals due back on day (default today)"""
+        day = day or date.today().isoformat()
+        return [(username, rental) for username, rental in cls._ending_by(day) if rental["end_date"] == day]
+
+    @classmethod
+    @track("DueDateScheduler.overdue")
+    def overdue(cls, as_of=None):
+        """Active rentals whose end date is before as_of (default today)"""
+        as_of = as_of or date.today().isoformat()
+        return [(username, rental) for username, rental in cls._ending_by(as_of) if rental["end_date"] < as_of]
+
+    @classmethod
+    def assess_fines(cls, overdue, as_of):
+        """Fines run up by the overdue rentals by as_of, in one vectorised pass.
+
+        Uses the return_car formula: days late * daily rate * FINE_RATE.
+        """
+        if np is None:
+            raise ImportError("Fine assessment needs numpy. Install it with: pip install numpy")
+        if not overdue:
+            return []
+
+        ends = np.array([rental["end_date"] for _, rental in overdue], dtype="datetime64[D]")
+        prices = np.array([(FleetRepository.get(rental["car_id"]) or {}).get("rental_price", 0.0)
+                           for _, rental in overdue], dtype=np.float64)
+        days_late = (np.datetime64(as_of, "D") - ends).astype(np.int64)
+        return (np.clip(days_late, 0, None) * prices * FINE_RATE).tolist()
+
+    @classmethod
+    @track("DueDateScheduler.accrue_fines")
+    def accrue_fines(cls, as_of=None):
+        """Record the fine each overdue rental has run up by as_of as its accrued_fine.
+
+        Only rentals whose fine changed are written, all in one batch (one
+        "fined" journal event each on the file engine). Returns the list
+        of (username, rental, fine) written, or None if the batch failed.
+        """
+        as_of = as_of or date.today().isoformat()
+        overdue = cls.overdue(as_of)
+        fines = cls.assess_fines(overdue, as_of)
+
+        changed = [(username, rental, fine) for (username, rental), fine in zip(overdue, fines)
+                   if fine != (rental.get("accrued_fine") or 0)]
+        if not changed:
+            return []
+
+        updates = [(username, rental.get("rental_id"), rental["car_id"], {"accrued_fine": fine})
+                   for username, rental, fine in changed]
+        if not get_storage().commit_batch(rental_updates=updates):
+            return None
+        return changed
+
+
+def print_report(as_of=None):
+    """Print the cars due back on as_of and the overdue rentals with their fines"""
+    as_of = as_of or date.today().isoformat()
+
+    due = DueDateScheduler.due_on(as_of)
+    print(f"\n=== DUE BACK ON {as_of} ===")
+    if not due:
+        print("No cars are due back.")
+    for username, rental in due:
+        print(f"  Car {rental['car_id']} from {username} (rented {rental['start_date']})")
+
+    overdue = DueDateScheduler.overdue(as_of)
+    print(f"\n=== OVERDUE ON {as_of} ===")
+    if not overdue:
+        print("No rentals are overdue.")
+        return
+    try:
+        fines = DueDateScheduler.assess_fines(overdue, as_of)
+    except ImportError as e:
+        print(e)
+        fines = [rental.get("accrued_fine") or 0 for _, rental in overdue]
+    for (username, rental), fine in zip(overdue, fines):
+        print(f"  Car {rental['car_id']} from {username}: due {rental['end_date']}, fine so far ${fine:.2f}")
+    print(f"Overdue exposure: ${sum(fines):.2f} across {len(overdue)} rentals")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Report due and overdue rentals and accrue late fines")
+    parser.add_argument("--date", default=date.today().isoformat(), help="assess as of this date (default: today)")
+    parser.add_argument("--report-only", action="store_true", help="do not record the accrued fines")
+    args = parser.parse_args(argv)
+
+    print_report(args.date)
+    if args.report_only:
+        return
+    try:
+        changed = DueDateScheduler.accrue_fines(args.date)
+    except ImportError as e:
+        print(e)
+        return
+    if changed is None:
+        print("Could not record the fines: rentals changed while assessing. Run the job again.")
+    else:
+        print(f"Recorded fines on {len(changed)} overdue rentals.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import threading
+from models.fileio import read_text, write_text
+from models.locking import FileLock
+
+
+class IdSequence:
+    """Persistent, atomically incremented integer sequence.
+
+    The next free value lives in <data_dir>/<name>.seq. Allocation takes an
+    exclusive file lock, so concurrent processes never hand out the same
+    value, and costs O(1) regardless of how many IDs exist. Blocks of IDs
+    can be reserved in one call for bulk inserts.
+    """
+
+    def __init__(self, name, data_dir):
+        self.path = os.path.join(data_dir, f"{name}.seq")
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.path + ".lock")
+
+    def _read(self):
+        try:
+            return int(read_text(self.path).strip())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, value):
+        write_text(self.path, str(value), durable=True)
+
+    def allocate(self, count=1, floor=None, seed=None):
+        """Reserve count consecutive values and return them as a range.
+
+        floor makes sure the block starts at or above a value (e.g. past
+        IDs that were assigned by hand). seed is called once, under the
+        lock, to find the first value when the sequence file does not exist.
+        """
+        with self._lock, self._file_lock:
+            start = self._read()
+            if start is None:
+                start = seed() if seed else 1
+            if floor is not None:
+                start = max(start, floor)
+            self._write(start + count)
+            return range(start, start + count)
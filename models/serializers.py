@@ -0,0 +1,150 @@
+"""On-disk formats for the file-based stores.
+
+    python -m models.serializers convert data --from json --to marshal
+
+The file engine writes each store (cars, users, admins, the rentals
+snapshot, its totals and the rental archive) as one document through a
+Serializer:
+
+    json     indented JSON, the original human-readable format
+    compact  JSON without indentation or spaces; read by either JSON format
+    pickle   pickle protocol 5, binary and stable across Python versions
+    marshal  marshal, the fastest to load but tied to the Python version
+
+Pick one with the CAR_RENTAL_FORMAT environment variable and use the
+convert command to rewrite an existing data directory. pickle and marshal
+files must only be loaded from a data directory you trust.
+"""
+import json
+import marshal
+import os
+
+
+class Serializer:
+    """Turns a store's document into bytes and back"""
+
+    name = None
+    extension = None
+
+    def dumps(self, data):
+        raise NotImplementedError
+
+    def loads(self, payload):
+        raise NotImplementedError
+
+
+class JsonSerializer(Serializer):
+    name = "json"
+    extension = ".json"
+
+    def __init__(self, indent=4):
+        self.indent = indent
+
+    def dumps(self, data):
+        return json.dumps(data, indent=self.indent).encode("utf-8")
+
+    def loads(self, payload):
+        return json.loads(payload)
+
+
+class CompactJsonSerializer(JsonSerializer):
+    name = "compact"
+
+    def __init__(self):
+        super().__init__(indent=None)
+
+    def dumps(self, data):
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+class PickleSerializer(Serializer):
+    name = "pickle"
+    extension = ".pickle"
+
+    def dumps(self, data):
+        import pickle
+
+        return pickle.dumps(data, protocol=5)
+
+    def loads(self, payload):
+        import pickle
+
+        return pickle.loads(payload)
+
+
+class MarshalSerializer(Serializer):
+    name = "marshal"
+    extension = ".marshal"
+
+    def dumps(self, data):
+        return marshal.dumps(data)
+
+    def loads(self, payload):
+        return marshal.loads(payload)
+
+
+SERIALIZERS = {s.name: s for s in (JsonSerializer(), CompactJsonSerializer(),
+                                   PickleSerializer(), MarshalSerializer())}
+
+
+def get_serializer(name):
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unknown data format '{name}'. Choose one of: {', '.join(SERIALIZERS)}")
+    return SERIALIZERS[name]
+
+
+def convert(data_dir, source, target):
+    """Rewrite every store in data_dir from one format to another.
+
+    Pending rental journal entries are folded into the snapshot first.
+    Besides the stores this covers the rental totals and the rental
+    archive (its monthly partitions and their index). Returns
+    (store, old size, new size) for each converted file.
+    """
+    from models.fileio import read_document, write_document
+    from models.journal import RentalJournal
+    from models.storage import JsonStorage
+
+    source, target = get_serializer(source), get_serializer(target)
+    storage = JsonStorage(data_dir, serializer=source)
+    storage.rental_journal.compact()
+
+    archive = storage.rental_archive
+    names = ["cars", "users", "admins", "rentals", "rental_totals"]
+    names += [os.path.join(os.path.basename(archive.directory), name) for name in archive.months() + ["index"]]
+
+    converted = []
+    for store in names:
+        source_path = os.path.join(data_dir, store + source.extension)
+        if not os.path.exists(source_path) or os.stat(source_path).st_size == 0:
+            continue
+        old_size = os.stat(source_path).st_size
+        target_path = os.path.join(data_dir, store + target.extension)
+        document = read_document(source_path, source)
+        if store == "rental_totals":
+            # The totals name the rentals snapshot they were saved with, which was just rewritten
+            document["snapshot"] = list(RentalJournal._signature(os.path.join(data_dir, "rentals" + target.extension)))
+        write_document(target_path, document, target)
+        if target_path != source_path:
+            os.remove(source_path)
+        converted.append((store, old_size, os.stat(target_path).st_size))
+    return converted
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a data directory between storage formats")
+    parser.add_argument("action", choices=["convert"])
+    parser.add_argument("data_dir")
+    parser.add_argument("--from", dest="source", choices=sorted(SERIALIZERS), default="json")
+    parser.add_argument("--to", dest="target", choices=sorted(SERIALIZERS), required=True)
+    args = parser.parse_args(argv)
+
+    for store, old_size, new_size in convert(args.data_dir, args.source, args.target):
+        print(f"{store}: {old_size / 1024:.1f} KB -> {new_size / 1024:.1f} KB")
+    print(f"Set CAR_RENTAL_FORMAT={args.target} to use the converted files.")
+
+
+if __name__ == "__main__":
+    main()
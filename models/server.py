@@ -0,0 +1,379 @@
+"""HTTP/JSON front-end over RentalService.
+
+    python -m models.server --port 8080
+    curl 'localhost:8080/cars/search?brand=Toyota&max_price=60'
+    curl -X POST localhost:8080/rentals \\
+         -d '{"username": "jdoe", "car_id": "1001", "start_date": "2026-11-02", "end_date": "2026-11-04"}'
+
+Endpoints (query parameters for GET, a JSON object body for POST):
+
+    GET  /cars                           page_size, cursor, start_date, end_date (free cars only)
+    GET  /cars/search                    brand, model, min_seats, min_price, max_price,
+                                         start_date, end_date, limit
+    POST /login                          username, password
+    POST /customers                      username, password, first_name, last_name, balance
+    POST /rentals                        username, car_id, start_date, end_date
+    POST /returns                        username, car_id, return_date
+    POST /customers/<username>/top-up    amount
+    GET  /customers/<username>/rentals   page_size, cursor
+    GET  /reports/active-rentals
+    GET  /reports/customers
+    GET  /reports/cars
+
+Every response is {"ok": ..., "message": ..., "data": ...}. A refused
+operation (car taken, balance too low, unknown customer) answers 409
+with ok false and the reason in message; malformed requests answer 400.
+
+The server runs on asyncio streams from the standard library. The event
+loop only reads requests and writes responses: the service calls, which
+block on storage, and the JSON encoding of their results run on a thread
+pool through run_in_executor, so a slow request never holds up the
+others. Connections are kept alive between requests (HTTP/1.1). There is
+no authentication, so the server listens on localhost unless told
+otherwise.
+"""
+import asyncio
+import json
+import math
+import re
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+from models.fleet import FleetRepository
+from models.paging import PAGE_SIZE
+from models.service import RentalService
+
+WORKERS = 8
+MAX_BODY = 1024 * 1024
+MAX_HEADERS = 100
+SEARCH_LIMIT = 100
+
+
+class HttpError(Exception):
+    """Ends a request with an error status and message"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _car(car):
+    return dict(vars(car))
+
+
+def _customer(customer):
+    # Everything but the password
+    return {"username": customer.username, "first_name": customer.first_name,
+            "last_name": customer.last_name, "balance": customer.balance}
+
+
+def _page(page, item=lambda x: x):
+    return {"items": [item(x) for x in page], "next_cursor": page.next_cursor}
+
+
+def _number(query, name, kind=float, default=None):
+    if name not in query:
+        return default
+    value = query[name]
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        number = kind(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"'{name}' must be a number")
+    # No Infinity or NaN: they would poison balances and are not valid JSON
+    if not math.isfinite(number):
+        raise HttpError(400, f"'{name}' must be a finite number")
+    return number
+
+
+def _date(query, name):
+    """An ISO date (YYYY-MM-DD) from query, or None if absent"""
+    value = query.get(name)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise HttpError(400, f"'{name}' must be a date (YYYY-MM-DD)")
+
+
+def _fields(body, *names):
+    """The named fields of a request body, all strings"""
+    missing = [name for name in names if name not in body]
+    if missing:
+        raise HttpError(400, f"Missing field(s): {', '.join(missing)}")
+    wrong = [name for name in names if not isinstance(body[name], str)]
+    if wrong:
+        raise HttpError(400, f"Field(s) must be strings: {', '.join(wrong)}")
+    return [body[name] for name in names]
+
+
+class RentalServer:
+    """Routes HTTP requests to a RentalService, one thread pool call per request"""
+
+    ROUTES = [
+        ("GET", r"/cars", "list_cars"),
+        ("GET", r"/cars/search", "search_cars"),
+        ("POST", r"/login", "login"),
+        ("POST", r"/customers", "register"),
+        ("POST", r"/rentals", "rent_car"),
+        ("POST", r"/returns", "return_car"),
+        ("POST", r"/customers/(?P<username>[^/]+)/top-up", "top_up"),
+        ("GET", r"/customers/(?P<username>[^/]+)/rentals", "rental_history"),
+        ("GET", r"/reports/active-rentals", "active_rentals"),
+        ("GET", r"/reports/customers", "customer_totals"),
+        ("GET", r"/reports/cars", "car_totals"),
+    ]
+
+    def __init__(self, service=None, workers=WORKERS):
+        self.service = service or RentalService()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rental-server")
+        self.routes = [(method, re.compile(pattern + "$"), getattr(self, "_" + name))
+                       for method, pattern, name in self.ROUTES]
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start listening; returns the asyncio server"""
+        return await asyncio.start_server(self._serve_connection, host, port)
+
+    def close(self):
+        """Finish the requests in progress and persist what they changed"""
+        self.executor.shutdown(wait=True)
+        result = self.service.flush(timeout=30)
+        if not result.ok:
+            print(result.message)
+        FleetRepository.save_snapshot()
+
+    # Connections
+    async def _serve_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    writer.write(self._response(e.status, self._error(e.message), keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, body, keep_alive = request
+                status, payload = await loop.run_in_executor(self.executor, self.handle, method, target, body)
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _read_request(reader):
+        """Read one request; returns (method, target, body, keep_alive), or None once the client is done"""
+        try:
+            line = await reader.readline()
+            if not line:
+                return None
+            parts = line.decode("latin-1").split()
+            if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+                raise HttpError(400, "Malformed request line")
+            method, target, version = parts
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                if len(headers) >= MAX_HEADERS:
+                    raise HttpError(431, "Too many headers")
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except ValueError:
+            # A line longer than the stream's buffer limit
+            raise HttpError(431, "Request line or header too long")
+
+        if "transfer-encoding" in headers:
+            raise HttpError(411, "Send the body with a Content-Length")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length < 0 or length > MAX_BODY:
+            raise HttpError(413, f"Bodies are limited to {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+        return method, target, body, keep_alive
+
+    @staticmethod
+    def _error(message):
+        return json.dumps({"ok": False, "message": message, "data": None}, allow_nan=False).encode("utf-8")
+
+    @staticmethod
+    def _response(status, payload, keep_alive):
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode("latin-1") + payload
+
+    # Requests (run on the thread pool)
+    def handle(self, method, target, body):
+        """Answer one request; returns (status, JSON payload bytes)"""
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        try:
+            handler, params = self._route(method, path)
+            query = dict(parse_qsl(url.query))
+            if body:
+                try:
+                    body = json.loads(body)
+                except ValueError:
+                    raise HttpError(400, "The body is not valid JSON")
+                if not isinstance(body, dict):
+                    raise HttpError(400, "The body must be a JSON object")
+            result = handler(query, body or {}, **params)
+            status = 200 if result.ok else 409
+            return status, json.dumps({"ok": result.ok, "message": result.message,
+                                       "data": result.data}, allow_nan=False).encode("utf-8")
+        except HttpError as e:
+            return e.status, self._error(e.message)
+        except Exception as e:
+            print(f"Error handling {method} {path}: {e}")
+            return 500, self._error("Internal server error")
+
+    def _route(self, method, path):
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match:
+                if route_method == method:
+                    return handler, {name: unquote(value) for name, value in match.groupdict().items()}
+                allowed = True
+        if allowed:
+            raise HttpError(405, f"{method} is not supported on {path}")
+        raise HttpError(404, f"No endpoint at {path}")
+
+    # Cars
+    def _list_cars(self, query, body):
+        page_size = _number(query, "page_size", int, PAGE_SIZE)
+        start_date, end_date = _date(query, "start_date"), _date(query, "end_date")
+        if start_date:
+            result = self.service.available_cars_page(start_date, end_date, page_size, query.get("cursor"))
+        else:
+            result = self.service.cars_page(page_size, query.get("cursor"))
+        if result.ok:
+            result.data = _page(result.data, _car)
+        return result
+
+    def _search_cars(self, query, body):
+        limit = _number(query, "limit", int, SEARCH_LIMIT)
+        result = self.service.search_cars(
+            brand=query.get("brand"), model=query.get("model"),
+            min_seats=_number(query, "min_seats", int), min_price=_number(query, "min_price"),
+            max_price=_number(query, "max_price"),
+            start_date=_date(query, "start_date"), end_date=_date(query, "end_date"))
+        result.data = {"total": len(result.data), "items": [_car(car) for car in result.data[:max(limit, 0)]]}
+        return result
+
+    # Accounts
+    def _login(self, query, body):
+        username, password = _fields(body, "username", "password")
+        result = self.service.login(username, password)
+        if result.ok:
+            role, account = result.data
+            result.data = {"role": role, "username": account.username}
+        return result
+
+    def _register(self, query, body):
+        username, password, first_name, last_name = _fields(body, "username", "password", "first_name", "last_name")
+        balance = _number(body, "balance", float, 0.0)
+        result = self.service.register(username, password, first_name, last_name, balance)
+        if result.ok:
+            result.data = _customer(result.data)
+        return result
+
+    # Rentals
+    def _customer_result(self, result):
+        result.data = _customer(result.data) if result.data is not None else None
+        return result
+
+    def _rent_car(self, query, body):
+        username, car_id = _fields(body, "username", "car_id")
+        _fields(body, "start_date", "end_date")
+        return self._customer_result(self.service.rent_car(username, car_id, _date(body, "start_date"),
+                                                           _date(body, "end_date")))
+
+    def _return_car(self, query, body):
+        username, car_id = _fields(body, "username", "car_id")
+        _fields(body, "return_date")
+        return self._customer_result(self.service.return_car(username, car_id, _date(body, "return_date")))
+
+    def _top_up(self, query, body, username):
+        amount = _number(body, "amount")
+        if amount is None:
+            raise HttpError(400, "Missing field(s): amount")
+        return self._customer_result(self.service.top_up(username, amount))
+
+    def _rental_history(self, query, body, username):
+        result = self.service.rental_history_page(username, _number(query, "page_size", int, PAGE_SIZE),
+                                                  query.get("cursor"))
+        if result.ok:
+            result.data = _page(result.data)
+        return result
+
+    # Reports
+    def _active_rentals(self, query, body):
+        return self.service.active_rentals()
+
+    def _customer_totals(self, query, body):
+        return self.service.customer_totals()
+
+    def _car_totals(self, query, body):
+        return self.service.car_totals()
+
+
+async def serve(host, port, workers=WORKERS):
+    server = RentalServer(workers=workers)
+    listener = await server.start(host, port)
+    try:
+        # Stop as on Ctrl+C, so the changes are flushed
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass
+    port = listener.sockets[0].getsockname()[1]
+    print(f"Serving on http://{host}:{port} with {workers} worker threads", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the car rental system as an HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="0 picks a free port")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="threads running requests")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    print("Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
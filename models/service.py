@@ -0,0 +1,227 @@
+"""Non-interactive API over the rental flows.
+
+The menus in main_script.py drive everything through input(); this module
+exposes the same flows (registration, login, renting, returning, balance
+top-ups and the admin reports) as plain method calls so they can be
+scripted, load-tested or served over the network (see models.server).
+Each call returns an OperationResult; anything the domain code prints is
+captured per thread into the result's message instead of going to the
+terminal.
+"""
+import io
+import sys
+import threading
+from contextlib import contextmanager
+from models.admin import Admin
+from models.car import Car
+from models.customer import Customer
+from models.paging import PAGE_SIZE
+from models.rental import RentalManager
+from models.storage import get_storage
+
+
+class OperationResult:
+    """Outcome of one service call: success flag, captured output and data"""
+
+    def __init__(self, ok, message="", data=None):
+        self.ok = ok
+        self.message = message
+        self.data = data
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return f"OperationResult(ok={self.ok}, message={self.message!r})"
+
+
+class _ThreadOutput(io.TextIOBase):
+    """sys.stdout stand-in that sends a capturing thread's prints to its own buffer"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is None:
+            return self.stream.write(text)
+        return buffer.write(text)
+
+    def flush(self):
+        if getattr(self.local, "buffer", None) is None:
+            self.stream.flush()
+
+
+_output = None
+_output_lock = threading.Lock()
+
+
+@contextmanager
+def captured_output():
+    """Collect everything the current thread prints; yields the buffer"""
+    global _output
+    with _output_lock:
+        if _output is None or sys.stdout is not _output:
+            _output = _ThreadOutput(sys.stdout)
+            sys.stdout = _output
+    buffer = io.StringIO()
+    _output.local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        _output.local.buffer = None
+
+
+class RentalService:
+    """Scriptable entry point for the customer and admin flows.
+
+    Calls are stateless: customers are loaded from storage by username on
+    every call, so any number of clients can share one service, and any
+    number of services can share the data directory. Writes need no lock
+    here: they commit against the versions they read and start over if
+    another writer got there first.
+    """
+
+    @staticmethod
+    def _run(func, *args):
+        with captured_output() as out:
+            ok = func(*args)
+        return OperationResult(bool(ok), out.getvalue().strip())
+
+    def _load_customer(self, username):
+        user = get_storage().get_user(username)
+        return Customer(**user) if user else None
+
+    # Accounts
+    def register(self, username, password, first_name, last_name, balance=0.0):
+        if balance < 0:
+            return OperationResult(False, "Balance cannot be negative.")
+        customer = Customer(username, password, first_name, last_name, balance)
+        if not get_storage().add_user(customer.to_dict()):
+            return OperationResult(False, "Username already exists.")
+        return OperationResult(True, "Customer registered successfully.", customer)
+
+    def login(self, username, password):
+        """Authenticate an admin or customer; data is ("admin", Admin) or ("customer", Customer)"""
+        admin = get_storage().get_admin(username)
+        if admin and admin["password"] == password:
+            return OperationResult(True, "Admin login successful.", ("admin", Admin(**admin)))
+
+        user = get_storage().get_user(username)
+        if user and user["password"] == password:
+            return OperationResult(True, "Customer login successful.", ("customer", Customer(**user)))
+
+        return OperationResult(False, "Login failed. Incorrect username or password.")
+
+    # Customer flows
+    def available_cars(self, start_date=None, end_date=None):
+        with captured_output():
+            cars = Car.find_available(start_date, end_date or start_date) if start_date else Car.load_cars()
+        return OperationResult(True, data=cars)
+
+    def cars_page(self, page_size=PAGE_SIZE, cursor=None, offset=0):
+        """One page of the fleet; data is a Page whose next_cursor fetches the next one"""
+        return self._page(Car.page_cars, page_size, cursor, offset)
+
+    def available_cars_page(self, start_date, end_date=None, page_size=PAGE_SIZE, cursor=None, offset=0):
+        return self._page(Car.page_available, start_date, end_date or start_date, page_size, cursor, offset)
+
+    @staticmethod
+    def _page(fetch, *args):
+        with captured_output() as out:
+            try:
+                page = fetch(*args)
+            except ValueError as e:
+                return OperationResult(False, str(e))
+        return OperationResult(True, out.getvalue().strip(), page)
+
+    def search_cars(self, **filters):
+        return OperationResult(True, data=Car.search(**filters))
+
+    def rent_car(self, username, car_id, start_date, end_date):
+        customer = self._load_customer(username)
+        if customer is None:
+            return OperationResult(False, f"Unknown customer '{username}'.")
+        result = self._run(customer.rent_car, car_id, start_date, end_date)
+        result.data = customer
+        return result
+
+    def return_car(self, username, car_id, return_date):
+        customer = self._load_customer(username)
+        if customer is None:
+            return OperationResult(False, f"Unknown customer '{username}'.")
+        result = self._run(customer.return_car, car_id, return_date)
+        result.data = customer
+        return result
+
+    def rent_cars(self, bookings):
+        """Batch rent; bookings are (username, car_id, start_date, end_date) tuples.
+
+        A fleet booking: one customer may rent many cars in the same batch.
+        """
+        return self._run(RentalManager.rent_cars, list(bookings))
+
+    def return_cars(self, returns):
+        """Batch return; returns are (username, car_id, return_date) tuples"""
+        return self._run(RentalManager.return_cars, list(returns))
+
+    def top_up(self, username, amount):
+        if amount <= 0:
+            return OperationResult(False, "Amount must be positive.")
+        customer = self._load_customer(username)
+        if customer is None:
+            return OperationResult(False, f"Unknown customer '{username}'.")
+        result = self._run(customer.top_up, amount)
+        result.data = customer
+        return result
+
+    def rental_history(self, username):
+        customer = self._load_customer(username)
+        if customer is None:
+            return OperationResult(False, f"Unknown customer '{username}'.")
+        result = self._run(lambda: customer.view_rental_history() or True)
+        result.data = customer.rentals
+        return result
+
+    def rental_history_page(self, username, page_size=PAGE_SIZE, cursor=None, offset=0):
+        """One page of a customer's rentals, oldest first"""
+        return self._page(RentalManager.page_user_rentals, username, page_size, cursor, offset)
+
+    def flush(self, timeout=None):
+        """Wait for changes still being written in the background (write-behind mode)"""
+        storage = get_storage()
+        if storage.flush(timeout):
+            return OperationResult(True, "All changes are saved.")
+        dropped = storage.dropped_changes()
+        if dropped:
+            return OperationResult(False, f"{dropped} changes could not be saved and were lost.")
+        return OperationResult(False, "Some changes are still being saved.")
+
+    # Admin reports
+    def active_rentals(self):
+        """Active rentals keyed by username"""
+        return self._fetch(RentalManager.load_rentals, "active")
+
+    def customer_totals(self):
+        """Active and lifetime rentals, revenue and fines of every customer, keyed by username"""
+        return self._fetch(RentalManager.load_rental_totals)
+
+    def car_totals(self):
+        """Rentals, revenue and fines of every car, keyed by car_id"""
+        return self._fetch(RentalManager.load_car_totals)
+
+    @staticmethod
+    def _fetch(load, *args):
+        with captured_output() as out:
+            data = load(*args)
+        return OperationResult(True, out.getvalue().strip(), data)
+
+    def active_rentals_report(self):
+        return self._run(lambda: RentalManager.view_active_rentals() or True)
+
+    def customer_rentals_report(self):
+        return self._run(lambda: RentalManager.view_customer_rentals() or True)
+
+    def customer_history_report(self, username):
+        return self._run(lambda: RentalManager.view_customer_rental_history(username) or True)
@@ -0,0 +1,99 @@
+"""Binary snapshot of the in-memory fleet and its search indexes.
+
+    python -m models.snapshot
+
+Loading the fleet means parsing the whole cars store and then building
+the secondary indexes (see FleetIndexes), which takes seconds at a
+million cars. FleetRepository can instead load fleet.snapshot from the
+data directory: the records and the indexes in marshal format, tagged
+with the durable signature the cars store had when they were taken
+(see Storage.durable_signature). A snapshot whose signature no longer matches the store is
+ignored (and replaced the next time one is saved), so a stale snapshot
+only costs reading its small header.
+
+Snapshots are saved on logout and exit and by the command above. Engines
+without a durable signature (sqlite, write-behind) never use one. Like
+the marshal data format, snapshots are tied to the Python version and
+must only be loaded from a data directory you trust.
+"""
+import gc
+import marshal
+import os
+import sys
+import time
+from models import stats
+from models.fileio import write_bytes
+
+FORMAT = 1
+FILENAME = "fleet.snapshot"
+
+
+class FleetSnapshot:
+    """The fleet snapshot file of one data directory"""
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def of(cls, storage):
+        """The snapshot file in storage's data directory"""
+        return cls(os.path.join(storage.data_dir, FILENAME))
+
+    @staticmethod
+    def _header(key):
+        return (FORMAT, tuple(sys.version_info[:2]), key)
+
+    def load(self, key):
+        """Return (records, index state) saved at key, or None"""
+        if key is None:
+            return None
+        start = time.perf_counter()
+        try:
+            with open(self.path, "rb") as f:
+                # Only the header is unmarshalled from the file object; the
+                # body is read in one go, which is far faster
+                if marshal.load(f) != self._header(key):
+                    return None
+                payload = f.read()
+            # Nothing to collect among a million fresh records
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                records, index_state = marshal.loads(payload)
+            finally:
+                if enabled:
+                    gc.enable()
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        stats.record_read(len(payload), time.perf_counter() - start)
+        return records, index_state
+
+    def save(self, key, records, index_state):
+        """Write the records (car_id -> car) and index state as the snapshot taken at key"""
+        if key is None:
+            return False
+        start = time.perf_counter()
+        try:
+            payload = marshal.dumps(self._header(key)) + marshal.dumps((records, index_state))
+        except ValueError:
+            return False
+        write_bytes(self.path, payload, time.perf_counter() - start)
+        return True
+
+
+def main(argv=None):
+    import argparse
+    from models.fleet import FleetRepository
+
+    parser = argparse.ArgumentParser(description="Save a snapshot of the fleet and its indexes for fast startup")
+    parser.parse_args(argv)
+
+    cars = FleetRepository.all()
+    if FleetRepository.save_snapshot():
+        print(f"Saved a snapshot of {len(cars)} cars.")
+    else:
+        print("This storage engine does not support fleet snapshots.")
+
+
+if __name__ == "__main__":
+    main()
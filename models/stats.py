@@ -0,0 +1,129 @@
+"""Hot-path I/O instrumentation.
+
+Public operations are wrapped with @track and the storage layer reports
+every file read/write and database query it makes. Each operation
+accumulates, inclusively of anything it calls:
+
+    calls, wall time, file opens, bytes read, bytes written,
+    parse time, serialize time, database queries and commit conflicts
+
+Use snapshot() / reset() / report() to read the counters from code, or run
+main_script.py --stats to print them as you use the menus.
+"""
+import threading
+import time
+from functools import wraps
+
+COUNTERS = ("calls", "wall_s", "file_opens", "bytes_read", "bytes_written",
+            "parse_s", "serialize_s", "db_queries", "conflicts")
+
+_lock = threading.Lock()
+_local = threading.local()
+_totals = {}
+
+# Called with (name, counters) whenever a top-level operation finishes
+on_complete = None
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _add(name, **amounts):
+    entry = _totals.setdefault(name, dict.fromkeys(COUNTERS, 0))
+    for key, value in amounts.items():
+        entry[key] += value
+
+
+def _record(**amounts):
+    """Charge I/O to every operation running on this thread, and to the total"""
+    names = {"(total)"}
+    names.update(frame["name"] for frame in _stack())
+    with _lock:
+        for name in names:
+            _add(name, **amounts)
+    for frame in _stack():
+        for key, value in amounts.items():
+            frame["counters"][key] += value
+
+
+def record_read(nbytes, parse_seconds=0.0):
+    _record(file_opens=1, bytes_read=nbytes, parse_s=parse_seconds)
+
+
+def record_write(nbytes, serialize_seconds=0.0):
+    _record(file_opens=1, bytes_written=nbytes, serialize_s=serialize_seconds)
+
+
+def record_parse(seconds):
+    _record(parse_s=seconds)
+
+
+def record_query(count=1):
+    _record(db_queries=count)
+
+
+def record_conflict():
+    """A commit lost to a concurrent writer and has to be retried"""
+    _record(conflicts=1)
+
+
+def track(name):
+    """Decorator that times a public operation and collects the I/O it causes"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = _stack()
+            frame = {"name": name, "counters": dict.fromkeys(COUNTERS, 0)}
+            stack.append(frame)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                with _lock:
+                    _add(name, calls=1, wall_s=elapsed)
+                frame["counters"]["calls"] = 1
+                frame["counters"]["wall_s"] = elapsed
+                if not stack and on_complete is not None:
+                    on_complete(name, frame["counters"])
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Return a copy of the counters, keyed by operation name"""
+    with _lock:
+        return {name: dict(counters) for name, counters in _totals.items()}
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+
+
+def format_counters(counters):
+    return (f"{counters['file_opens']} file opens, "
+            f"{counters['bytes_read'] / 1024:.1f} KB read, "
+            f"{counters['bytes_written'] / 1024:.1f} KB written, "
+            f"{counters['db_queries']} queries, "
+            f"parse {counters['parse_s'] * 1000:.2f} ms, "
+            f"serialize {counters['serialize_s'] * 1000:.2f} ms, "
+            f"wall {counters['wall_s'] * 1000:.2f} ms")
+
+
+def report():
+    """Per-operation summary table of everything recorded so far"""
+    rows = snapshot()
+    header = (f"{'operation':<40}{'calls':>7}{'opens':>7}{'KB read':>10}{'KB written':>12}"
+              f"{'queries':>9}{'parse ms':>10}{'ser. ms':>9}{'wall ms':>10}")
+    lines = [header, "-" * len(header)]
+    for name in sorted(rows, key=lambda n: (n == "(total)", n)):
+        c = rows[name]
+        lines.append(f"{name:<40}{c['calls']:>7}{c['file_opens']:>7}{c['bytes_read'] / 1024:>10.1f}"
+                     f"{c['bytes_written'] / 1024:>12.1f}{c['db_queries']:>9}{c['parse_s'] * 1000:>10.2f}"
+                     f"{c['serialize_s'] * 1000:>9.2f}{c['wall_s'] * 1000:>10.2f}")
+    return "\n".join(lines)
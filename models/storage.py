@@ -0,0 +1,1303 @@
+import glob
+import itertools
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager, nullcontext
+from models import stats
+from models.aggregates import CAR_TOTALS, CUSTOMER_TOTALS
+from models.archive import RentalArchive
+from models.fileio import read_document, read_json, write_document, write_json
+from models.fleet_file import FleetFile, check_widths
+from models.journal import RentalJournal
+from models.locking import FileLock
+from models.paging import PAGE_SIZE, resume_after
+from models.serializers import get_serializer
+from models.user_index import UserIndex
+
+DATA_DIR = os.environ.get("CAR_RENTAL_DATA_DIR", "data")
+STORAGE_ENGINE = os.environ.get("CAR_RENTAL_STORAGE", "json")
+DATA_FORMAT = os.environ.get("CAR_RENTAL_FORMAT", "json")
+# Persist changes on a background thread (see models.write_behind)
+WRITE_BEHIND = os.environ.get("CAR_RENTAL_WRITE_BEHIND", "") not in ("", "0")
+
+CAR_FIELDS = ("car_id", "brand", "model", "seating_capacity", "rental_price", "available")
+USER_FIELDS = ("username", "password", "first_name", "last_name", "balance")
+ADMIN_FIELDS = ("username", "password", "first_name", "last_name")
+# How many times callers re-read and retry a commit refused for a version conflict
+COMMIT_ATTEMPTS = 5
+
+# fine_amount is the fine charged on return; accrued_fine what an active rental has run up while overdue
+RENTAL_FIELDS = ("rental_id", "car_id", "start_date", "end_date", "days", "total_cost",
+                 "status", "return_date", "fine_amount", "accrued_fine")
+
+
+def new_rental_id():
+    return uuid.uuid4().hex
+
+
+def filter_rentals(rentals, status=None, start_date=None, end_date=None):
+    """Keep the rentals with the given status that start between the two dates"""
+    filtered = {}
+    for username, user_rentals in rentals.items():
+        matches = [r for r in user_rentals
+                   if (status is None or r["status"] == status)
+                   and (start_date is None or r["start_date"] >= start_date)
+                   and (end_date is None or r["start_date"] <= end_date)]
+        if matches:
+            filtered[username] = matches
+    return filtered
+
+
+class Storage:
+    """Interface every persistence engine implements.
+
+    Records cross this boundary as plain dicts: cars, users and admins as
+    lists of records, rentals as a username -> list of rentals mapping.
+    Rentals are only kept in the rental store; user records hold account
+    details and the balance.
+    """
+
+    # Cars
+    def load_cars(self):
+        raise NotImplementedError
+
+    def save_cars(self, cars):
+        raise NotImplementedError
+
+    def add_car(self, car):
+        raise NotImplementedError
+
+    def add_cars(self, cars):
+        """Add many new cars in one write; fails if any car_id is taken"""
+        raise NotImplementedError
+
+    def remove_car(self, car_id):
+        raise NotImplementedError
+
+    def update_car(self, car_id, **fields):
+        raise NotImplementedError
+
+    def car_versions(self, car_ids):
+        """Return {car_id: version} for those of car_ids that exist"""
+        raise NotImplementedError
+
+    # Users
+    def load_users(self):
+        raise NotImplementedError
+
+    def save_users(self, users):
+        raise NotImplementedError
+
+    def add_user(self, user):
+        raise NotImplementedError
+
+    def update_user(self, username, **fields):
+        raise NotImplementedError
+
+    def get_user(self, username):
+        """Return the user record for username, or None"""
+        raise NotImplementedError
+
+    # Admins
+    def load_admins(self):
+        raise NotImplementedError
+
+    def get_admin(self, username):
+        """Return the admin record for username, or None"""
+        raise NotImplementedError
+
+    def add_admin(self, admin):
+        raise NotImplementedError
+
+    # Rentals
+    def load_rentals(self, status=None, start_date=None, end_date=None):
+        """Return rentals keyed by username, optionally only those with the
+        given status or starting between start_date and end_date"""
+        raise NotImplementedError
+
+    def save_rentals(self, rentals):
+        raise NotImplementedError
+
+    def add_rental(self, username, rental):
+        raise NotImplementedError
+
+    def load_user_rentals(self, username):
+        """Return the rentals of one user, oldest first"""
+        raise NotImplementedError
+
+    def iter_user_rentals(self, username, after=None):
+        """Yield the rentals of one user, oldest first, starting after the
+        rental with rental_id after; reads the store a little at a time"""
+        raise NotImplementedError
+
+    def archive_rentals(self, before):
+        """Move completed rentals that started before the date out of the
+        hot rental store; returns how many were moved"""
+        raise NotImplementedError
+
+    def update_rental(self, username, car_id, **fields):
+        """Update the active rental of car_id held by username"""
+        raise NotImplementedError
+
+    # Totals
+    def rental_totals(self, username):
+        """Active and lifetime rentals, revenue and fines of one customer"""
+        raise NotImplementedError
+
+    def load_rental_totals(self):
+        """Totals of every customer, keyed by username"""
+        raise NotImplementedError
+
+    def car_totals(self, car_id):
+        """Rentals, revenue and fines of one car"""
+        raise NotImplementedError
+
+    def load_car_totals(self):
+        """Totals of every car, keyed by car_id"""
+        raise NotImplementedError
+
+    # Batches
+    def commit_batch(self, cars=None, users=None, new_rentals=None, rental_updates=None, versions=None):
+        """Apply many changes across the stores as one commit, all or nothing.
+
+        cars maps car_id -> fields and users maps username -> fields to set,
+        new_rentals is a list of (username, rental) and rental_updates a list
+        of (username, rental_id, car_id, fields) for active rentals. versions
+        maps "cars" and "users" to {key: version} as read by the caller.
+        Returns False, changing nothing, if any car, user or active rental is
+        missing or any listed record's version has moved on (someone else
+        changed it since it was read: re-read and try again).
+
+        Every write to a car or user record, here or through update_car and
+        update_user, increments the record's version, unless the fields set
+        version themselves (to store versions assigned elsewhere, as the
+        write-behind writer does).
+        """
+        raise NotImplementedError
+
+    def signature(self, store):
+        """Return a token that changes whenever the given store changes"""
+        raise NotImplementedError
+
+    def durable_signature(self, store):
+        """Like signature, but the same in every process and across restarts,
+        so it can be saved with data derived from the store. None if the
+        engine has no such token."""
+        return None
+
+    def check_car(self, car):
+        """Return why this engine cannot store car (a car record), or None if it can"""
+        return None
+
+    def is_empty(self, store):
+        """True if the cars, users or admins store holds no records"""
+        return not getattr(self, "load_" + store)()
+
+    def locked(self, store):
+        """Context manager keeping other writers out of store.
+
+        Writes made inside it (by the same thread) and signature(store) read
+        inside it see no change from anyone else, so a cache can record the
+        signature as covering exactly its own writes.
+        """
+        return nullcontext()
+
+    def flush(self, timeout=None):
+        """Wait until every accepted change is persisted; False if timeout ran
+        out first or accepted changes were lost (see dropped_changes).
+
+        Engines that write synchronously have nothing to wait for.
+        """
+        return True
+
+    def dropped_changes(self):
+        """How many accepted changes could not be persisted since the last
+        call; only engines that write in the background ever lose any"""
+        return 0
+
+
+class JsonStorage(Storage):
+    """The original engine: one document per store, rewritten on save.
+
+    Documents are JSON unless another format is chosen (see
+    models.serializers); the file extension follows the format.
+
+    Rentals are the exception: rentals.json is a snapshot and changes are
+    appended to rentals.journal (see RentalJournal). Completed rentals are
+    moved from there into monthly partitions by archive_rentals (see
+    RentalArchive). Per-customer and per-car totals are kept up to date by
+    the journal and saved next to the snapshot. Users and admins are looked
+    up through a persistent username index (see UserIndex).
+
+    Each store has its own lock file, held by any process changing that
+    store, so writers to different stores never wait for each other.
+
+    A batch is first written whole to a batch-*.pending intent file, then
+    applied with one write per store. The intent records every car's and
+    user's version before the batch and the version the batch gives it,
+    and rentals are added by rental_id, so an intent file left behind by a
+    crash is finished the next time the storage is opened without undoing
+    anything written since (see _unapplied). Rentals are written before
+    cars, so a process that sees a car's new version also sees the
+    bookings that came with it.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, serializer=None):
+        self.data_dir = data_dir
+        self.serializer = serializer or get_serializer(DATA_FORMAT)
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+        self.rental_archive = RentalArchive(os.path.join(self.data_dir, "rentals_archive"), self.serializer)
+        self.rental_journal = RentalJournal(self.path("rentals"),
+                                            os.path.join(self.data_dir, "rentals.journal"),
+                                            serializer=self.serializer,
+                                            totals_path=self.path("rental_totals"),
+                                            baseline=self.rental_archive.totals)
+        self._locks = {store: FileLock(os.path.join(self.data_dir, store + ".lock"))
+                       for store in ("cars", "users", "admins")}
+        self.user_index = UserIndex(self.path("users"), os.path.join(self.data_dir, "users.idx"),
+                                    self.serializer, self._locks["users"])
+        self.admin_index = UserIndex(self.path("admins"), os.path.join(self.data_dir, "admins.idx"),
+                                     self.serializer, self._locks["admins"])
+        self._recover_batches()
+
+    def path(self, store):
+        return os.path.join(self.data_dir, store + self.serializer.extension)
+
+    def locked(self, store):
+        return self._store_lock(store)
+
+    def _store_lock(self, store):
+        """Context manager keeping other writers out of one store"""
+        if store == "rentals":
+            return self.rental_journal.locked()
+        return self._locks[store]
+
+    def _read(self, store, default):
+        path = self.path(store)
+        if not os.path.exists(path) or os.stat(path).st_size == 0:
+            return default
+
+        try:
+            return read_document(path, self.serializer)
+        except Exception as e:
+            print(f"Error loading {store}: {e}")
+            return default
+
+    def _write(self, store, data):
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+
+        try:
+            write_document(self.path(store), data, self.serializer)
+            return True
+        except Exception as e:
+            print(f"Error saving {store}: {e}")
+            return False
+
+    def _write_accounts(self, store, records, index, changed):
+        """Write an account file and keep its username index in step"""
+        in_sync = index.in_sync()
+        if not self._write(store, records):
+            return False
+        if in_sync:
+            index.put(*changed)
+        else:
+            index.rebuild(records)
+        return True
+
+    def signature(self, store):
+        if store == "rentals":
+            return (self.rental_journal.signature(), self.rental_archive.signature())
+        try:
+            st = os.stat(self.path(store))
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def durable_signature(self, store):
+        # A file's stat looks the same from every process
+        return None if store == "rentals" else self.signature(store)
+
+    # A document holding even one record is larger than this
+    EMPTY_DOCUMENT_SIZE = 64
+
+    def is_empty(self, store):
+        try:
+            size = os.stat(self.path(store)).st_size
+        except OSError:
+            return True
+        if size > self.EMPTY_DOCUMENT_SIZE:
+            return False
+        return not self._read(store, [])
+
+    # Cars
+    def load_cars(self):
+        return self._read("cars", [])
+
+    def save_cars(self, cars):
+        with self._store_lock("cars"):
+            return self._write("cars", cars)
+
+    def add_car(self, car):
+        with self._store_lock("cars"):
+            cars = self.load_cars()
+            if any(c["car_id"] == car["car_id"] for c in cars):
+                return False
+            cars.append(car)
+            return self.save_cars(cars)
+
+    def add_cars(self, cars):
+        with self._store_lock("cars"):
+            existing = self.load_cars()
+            taken = {c["car_id"] for c in existing}
+            if any(car["car_id"] in taken for car in cars):
+                return False
+            return self.save_cars(existing + list(cars))
+
+    def remove_car(self, car_id):
+        with self._store_lock("cars"):
+            cars = self.load_cars()
+            remaining = [c for c in cars if c["car_id"] != car_id]
+            if len(remaining) == len(cars):
+                return False
+            return self.save_cars(remaining)
+
+    def update_car(self, car_id, **fields):
+        return self._update_cars({car_id: fields})
+
+    # Users
+    @staticmethod
+    def _account(user):
+        # Older files also kept a copy of every rental in the user record
+        if user is not None:
+            user.pop("rentals", None)
+        return user
+
+    def load_users(self):
+        return [self._account(user) for user in self._read("users", [])]
+
+    def save_users(self, users):
+        with self._store_lock("users"):
+            if not self._write("users", users):
+                return False
+            self.user_index.rebuild(users)
+            return True
+
+    def add_user(self, user):
+        with self._store_lock("users"):
+            if self.user_index.get(user["username"]) is not None:
+                return False
+            users = self.load_users()
+            users.append(user)
+            return self._write_accounts("users", users, self.user_index, [user])
+
+    def update_user(self, username, **fields):
+        with self._store_lock("users"):
+            if self.user_index.get(username) is None:
+                return False
+            return self._update_users({username: fields})
+
+    def _update_users(self, changes):
+        """Apply a username -> fields mapping with a single write"""
+        users = self.load_users()
+        changed = [user for user in users if user["username"] in changes]
+        if len(changed) < len(changes):
+            return False
+        for user in changed:
+            fields = changes[user["username"]]
+            user.update(fields, version=fields.get("version", user.get("version", 0) + 1))
+        return self._write_accounts("users", users, self.user_index, changed)
+
+    def get_user(self, username):
+        return self._account(self.user_index.get(username))
+
+    # Admins
+    def load_admins(self):
+        return self._read("admins", [])
+
+    def add_admin(self, admin):
+        with self._store_lock("admins"):
+            if self.admin_index.get(admin["username"]) is not None:
+                return False
+            admins = self.load_admins()
+            admins.append(admin)
+            return self._write_accounts("admins", admins, self.admin_index, [admin])
+
+    def get_admin(self, username):
+        return self.admin_index.get(username)
+
+    # Rentals
+    @staticmethod
+    def _merge_archived(archived, hot):
+        """Archived rentals first, then the hot ones; skips copies left by an interrupted archive run"""
+        hot_ids = {r["rental_id"] for rs in hot.values() for r in rs if r.get("rental_id")}
+        merged = {}
+        for username, rentals in archived.items():
+            kept = [r for r in rentals if r.get("rental_id") not in hot_ids]
+            if kept:
+                merged[username] = kept
+        for username, rentals in hot.items():
+            merged.setdefault(username, []).extend(rentals)
+        return merged
+
+    def load_rentals(self, status=None, start_date=None, end_date=None):
+        rentals = self.rental_journal.load()
+        if status or start_date or end_date:
+            rentals = filter_rentals(rentals, status, start_date, end_date)
+        # Only completed rentals are ever archived
+        if status == "active":
+            return rentals
+        archived = self.rental_archive.query(start_date, end_date)
+        if status:
+            archived = filter_rentals(archived, status)
+        return self._merge_archived(archived, rentals) if archived else rentals
+
+    def save_rentals(self, rentals):
+        if not self.rental_journal.replace(rentals):
+            return False
+        self.rental_archive.clear()
+        return True
+
+    def archive_rentals(self, before):
+        return self.rental_journal.move_out(
+            lambda r: r["status"] != "active" and r["start_date"] < before,
+            self.rental_archive.add,
+        )
+
+    def add_rental(self, username, rental):
+        rental.setdefault("rental_id", new_rental_id())
+        return self.rental_journal.add(username, rental)
+
+    def load_user_rentals(self, username):
+        hot = {username: self.rental_journal.load_user(username)}
+        archived = {username: self.rental_archive.user_rentals(username)}
+        return self._merge_archived(archived, hot)[username]
+
+    def iter_user_rentals(self, username, after=None):
+        hot = self.rental_journal.load_user(username)
+        hot_ids = {r["rental_id"] for r in hot if r.get("rental_id")}
+        archived = (r for r in self.rental_archive.iter_user_rentals(username)
+                    if r.get("rental_id") not in hot_ids)
+        rentals = itertools.chain(archived, hot)
+        return resume_after(rentals, after, lambda r: r.get("rental_id"))
+
+    def update_rental(self, username, car_id, **fields):
+        return self.rental_journal.update(username, car_id, fields)
+
+    # Totals
+    def rental_totals(self, username):
+        return self.rental_journal.customer_totals(username)
+
+    def load_rental_totals(self):
+        return self.rental_journal.all_totals().customers
+
+    def car_totals(self, car_id):
+        return self.rental_journal.car_totals(car_id)
+
+    def load_car_totals(self):
+        return self.rental_journal.all_totals().cars
+
+    # Batches
+    def commit_batch(self, cars=None, users=None, new_rentals=None, rental_updates=None, versions=None):
+        cars = cars or {}
+        users = users or {}
+        new_rentals = new_rentals or []
+        rental_updates = rental_updates or []
+        versions = versions or {}
+        for _, rental in new_rentals:
+            rental.setdefault("rental_id", new_rental_id())
+
+        # Lock every store the batch touches, always in the same order
+        stores = [store for store, changes in (("cars", cars or versions.get("cars")),
+                                               ("users", users or versions.get("users")),
+                                               ("rentals", new_rentals or rental_updates)) if changes]
+        with ExitStack() as locks:
+            for store in stores:
+                locks.enter_context(self._store_lock(store))
+
+            car_versions = self._check_versions("cars", cars, versions.get("cars") or {})
+            if car_versions is None:
+                return False
+            user_versions = self._check_versions("users", users, versions.get("users") or {})
+            if user_versions is None:
+                return False
+            if not all(self.rental_journal.is_active(username, rental_id, car_id)
+                       for username, rental_id, car_id, _ in rental_updates):
+                return False
+
+            # Each record's new version is fixed here, and its version before
+            # the batch is kept, so recovery can tell what is still to apply
+            batch = {"cars": {car_id: {"version": car_versions[car_id] + 1, **fields}
+                              for car_id, fields in cars.items()},
+                     "users": {username: {"version": user_versions[username] + 1, **fields}
+                               for username, fields in users.items()},
+                     "new_rentals": new_rentals, "rental_updates": rental_updates,
+                     "versions": {"cars": {car_id: car_versions[car_id] for car_id in cars},
+                                  "users": {username: user_versions[username] for username in users}}}
+            intent_path = os.path.join(self.data_dir, f"batch-{uuid.uuid4().hex}.pending")
+            try:
+                write_json(intent_path, batch, indent=None)
+            except Exception as e:
+                print(f"Error saving batch: {e}")
+                return False
+
+            # If this fails part way the intent file stays and is replayed on next open
+            if not self._apply_batch(batch):
+                return False
+            os.remove(intent_path)
+            return True
+
+    def _check_versions(self, store, changes, expected):
+        """The current versions of the records to change or check, or None if
+        any record to change is missing or any expected version is not current"""
+        current = self._versions(store, set(changes) | set(expected))
+        if any(key not in current for key in changes):
+            return None
+        if any(current.get(key) != version for key, version in expected.items()):
+            return None
+        return current
+
+    def _versions(self, store, keys):
+        """Return {key: version} for those of keys that exist in the cars or users store"""
+        if not keys:
+            return {}
+        if store == "cars":
+            return self.car_versions(keys)
+        current = {}
+        for username in keys:
+            user = self.user_index.get(username)
+            if user is not None:
+                current[username] = user.get("version", 0)
+        return current
+
+    def car_versions(self, car_ids):
+        return {car["car_id"]: car.get("version", 0) for car in self.load_cars() if car["car_id"] in car_ids}
+
+    def _apply_batch(self, batch):
+        """Write every store a batch touches once"""
+        if batch["new_rentals"] or batch["rental_updates"]:
+            if not self.rental_journal.add_batch(batch["new_rentals"], batch["rental_updates"]):
+                return False
+
+        if batch["users"] and not self._update_users(batch["users"]):
+            return False
+
+        if batch["cars"]:
+            return self._update_cars(batch["cars"])
+        return True
+
+    def _update_cars(self, changes):
+        """Apply a car_id -> fields mapping with a single write"""
+        with self._store_lock("cars"):
+            cars = self.load_cars()
+            changed = [car for car in cars if car["car_id"] in changes]
+            if len(changed) < len(changes):
+                return False
+            for car in changed:
+                fields = changes[car["car_id"]]
+                car.update(fields, version=fields.get("version", car.get("version", 0) + 1))
+            return self.save_cars(cars)
+
+    def _recover_batches(self):
+        """Finish any batch a crashed process left half applied"""
+        for intent_path in sorted(glob.glob(os.path.join(self.data_dir, "batch-*.pending"))):
+            with self._store_lock("cars"), self._store_lock("users"), self._store_lock("rentals"):
+                # Another process may have finished it while we waited
+                if not os.path.exists(intent_path):
+                    continue
+                try:
+                    batch = read_json(intent_path)
+                except Exception as e:
+                    print(f"Error loading batch {intent_path}: {e}")
+                    continue
+                if self._apply_batch(self._unapplied(batch)):
+                    os.remove(intent_path)
+
+    def _unapplied(self, batch):
+        """The part of a recovered batch that is neither applied yet nor overtaken.
+
+        Cars and users still at their version from before the batch get its
+        changes; any other version means the batch reached them already or
+        a later write did, which must not be undone. Rental updates only
+        apply to rentals that are still active. New rentals are keyed by
+        rental_id, so adding them again is harmless.
+        """
+        before = batch.get("versions")
+        if before is None:
+            # Written before versions were recorded: apply as it is
+            return batch
+        unapplied = dict(batch)
+        for store in ("cars", "users"):
+            current = self._versions(store, set(before[store]))
+            unapplied[store] = {key: fields for key, fields in batch[store].items()
+                                if current.get(key) == before[store][key]}
+        unapplied["rental_updates"] = [update for update in batch["rental_updates"]
+                                       if self.rental_journal.is_active(*update[:3])]
+        return unapplied
+
+
+class MappedStorage(JsonStorage):
+    """File engine with the fleet in a memory-mapped fixed-width file.
+
+    Cars live in cars.fleet (see FleetFile), so availability and price
+    changes rewrite one record in place instead of the whole fleet. Users,
+    admins and rentals are stored as in JsonStorage. An existing cars
+    document is imported the first time the fleet file is created.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, serializer=None):
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        # Opened first: JsonStorage.__init__ replays pending batches into it
+        self.fleet = FleetFile(os.path.join(data_dir, "cars.fleet"))
+        super().__init__(data_dir, serializer)
+        if not self.fleet.slots:
+            cars = super().load_cars()
+            if cars:
+                self.fleet.rewrite(cars)
+
+    def signature(self, store):
+        if store == "cars":
+            return self.fleet.signature()
+        return super().signature(store)
+
+    def durable_signature(self, store):
+        if store == "cars":
+            return (os.stat(self.fleet.path).st_ino, self.fleet.signature())
+        return super().durable_signature(store)
+
+    def is_empty(self, store):
+        if store == "cars":
+            return self.fleet.is_empty()
+        return super().is_empty(store)
+
+    def _store_lock(self, store):
+        if store == "cars":
+            return self.fleet.locked()
+        return super()._store_lock(store)
+
+    def check_car(self, car):
+        try:
+            check_widths(car)
+        except ValueError as e:
+            return str(e)
+        return None
+
+    def _fleet_write(self, write, *args):
+        try:
+            return write(*args)
+        except ValueError as e:
+            print(f"Error saving cars: {e}")
+            return False
+
+    # Cars
+    def load_cars(self):
+        return self.fleet.records()
+
+    def save_cars(self, cars):
+        return self._fleet_write(self.fleet.rewrite, cars)
+
+    def add_car(self, car):
+        return self._fleet_write(self.fleet.append, [car])
+
+    def add_cars(self, cars):
+        return self._fleet_write(self.fleet.append, cars)
+
+    def remove_car(self, car_id):
+        return self.fleet.remove(car_id)
+
+    def update_car(self, car_id, **fields):
+        return self._fleet_write(lambda: self.fleet.update(car_id, **fields))
+
+    def car_versions(self, car_ids):
+        cars = (self.fleet.get(car_id) for car_id in car_ids)
+        return {car["car_id"]: car["version"] for car in cars if car is not None}
+
+    def _update_cars(self, changes):
+        with self.fleet.locked():
+            if any(self.fleet.get(car_id) is None for car_id in changes):
+                return False
+            return all(self.update_car(car_id, **fields) for car_id, fields in changes.items())
+
+
+class SQLiteStorage(Storage):
+    """sqlite3 engine with indexed point lookups and in-place updates.
+
+    Per-customer and per-car totals live in their own tables, kept up to
+    date by triggers on rentals in the same transaction as each change.
+    The database runs in WAL mode so readers in other processes never wait
+    for a writer, and writers wait up to BUSY_TIMEOUT seconds for each other.
+    """
+
+    BUSY_TIMEOUT = 30
+    # Columns added after the first release, with their definitions
+    ADDED_COLUMNS = {
+        "cars": {"version": "INTEGER NOT NULL DEFAULT 0"},
+        "users": {"version": "INTEGER NOT NULL DEFAULT 0"},
+        "rentals": {"accrued_fine": "REAL NOT NULL DEFAULT 0"},
+    }
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cars (
+            car_id TEXT PRIMARY KEY,
+            brand TEXT NOT NULL,
+            model TEXT NOT NULL,
+            seating_capacity INTEGER NOT NULL,
+            rental_price REAL NOT NULL,
+            available INTEGER NOT NULL DEFAULT 1,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            first_name TEXT,
+            last_name TEXT,
+            balance REAL NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS admins (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            first_name TEXT,
+            last_name TEXT
+        );
+        CREATE TABLE IF NOT EXISTS rentals (
+            rental_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            car_id TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            days INTEGER NOT NULL,
+            total_cost REAL NOT NULL,
+            status TEXT NOT NULL,
+            return_date TEXT,
+            fine_amount REAL NOT NULL DEFAULT 0,
+            accrued_fine REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_rentals_username ON rentals (username);
+        CREATE INDEX IF NOT EXISTS idx_rentals_car_id ON rentals (car_id, status);
+        CREATE INDEX IF NOT EXISTS idx_rentals_status ON rentals (status);
+        CREATE INDEX IF NOT EXISTS idx_rentals_end_date ON rentals (end_date);
+        CREATE INDEX IF NOT EXISTS idx_rentals_start_date ON rentals (start_date);
+        CREATE TABLE IF NOT EXISTS customer_totals (
+            username TEXT PRIMARY KEY,
+            active INTEGER NOT NULL DEFAULT 0,
+            rentals INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            fines REAL NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS car_totals (
+            car_id TEXT PRIMARY KEY,
+            rentals INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            fines REAL NOT NULL DEFAULT 0
+        );
+        CREATE TRIGGER IF NOT EXISTS rentals_totals_insert AFTER INSERT ON rentals BEGIN
+            INSERT INTO customer_totals (username, active, rentals, revenue, fines)
+            VALUES (NEW.username, 1 * (NEW.status = 'active'), 1, 1 * NEW.total_cost, 1 * NEW.fine_amount)
+            ON CONFLICT (username) DO UPDATE SET active = active + excluded.active, rentals = rentals + excluded.rentals,
+                revenue = revenue + excluded.revenue, fines = fines + excluded.fines;
+            INSERT INTO car_totals (car_id, rentals, revenue, fines)
+            VALUES (NEW.car_id, 1, 1 * NEW.total_cost, 1 * NEW.fine_amount)
+            ON CONFLICT (car_id) DO UPDATE SET rentals = rentals + excluded.rentals,
+                revenue = revenue + excluded.revenue, fines = fines + excluded.fines;
+        END;
+        CREATE TRIGGER IF NOT EXISTS rentals_totals_update
+        AFTER UPDATE OF username, car_id, status, total_cost, fine_amount ON rentals BEGIN
+            INSERT INTO customer_totals (username, active, rentals, revenue, fines)
+            VALUES (OLD.username, -1 * (OLD.status = 'active'), -1, -1 * OLD.total_cost, -1 * OLD.fine_amount)
+            ON CONFLICT (username) DO UPDATE SET active = active + excluded.active, rentals = rentals + excluded.rentals,
+                revenue = revenue + excluded.revenue, fines = fines + excluded.fines;
+            INSERT INTO car_totals (car_id, rentals, revenue, fines)
+            VALUES (OLD.car_id, -1, -1 * OLD.total_cost, -1 * OLD.fine_amount)
+            ON CONFLICT (car_id) DO UPDATE SET rentals = rentals + excluded.rentals,
+                revenue = revenue + excluded.revenue, fines = fines + excluded.fines;
+            INSERT INTO customer_totals (username, active, rentals, revenue, fines)
+            VALUES (NEW.username, 1 * (NEW.status = 'active'), 1, 1 * NEW.total_cost, 1 * NEW.fine_amount)
+            ON CONFLICT (username) DO UPDATE SET active = active + excluded.active, rentals = rentals + excluded.rentals,
+                revenue = revenue + excluded.revenue, fines = fines + excluded.fines;
+            INSERT INTO car_totals (car_id, rentals, revenue, fines)
+            VALUES (NEW.car_id, 1, 1 * NEW.total_cost, 1 * NEW.fine_amount)
+            ON CONFLICT (car_id) DO UPDATE SET rentals = rentals + excluded.rentals,
+                revenue = revenue + excluded.revenue, fines = fines + excluded.fines;
+        END;
+        CREATE TRIGGER IF NOT EXISTS rentals_totals_delete AFTER DELETE ON rentals BEGIN
+            INSERT INTO customer_totals (username, active, rentals, revenue, fines)
+            VALUES (OLD.username, -1 * (OLD.status = 'active'), -1, -1 * OLD.total_cost, -1 * OLD.fine_amount)
+            ON CONFLICT (username) DO UPDATE SET active = active + excluded.active, rentals = rentals + excluded.rentals,
+                revenue = revenue + excluded.revenue, fines = fines + excluded.fines;
+            INSERT INTO car_totals (car_id, rentals, revenue, fines)
+            VALUES (OLD.car_id, -1, -1 * OLD.total_cost, -1 * OLD.fine_amount)
+            ON CONFLICT (car_id) DO UPDATE SET rentals = rentals + excluded.rentals,
+                revenue = revenue + excluded.revenue, fines = fines + excluded.fines;
+        END;
+    """
+
+    # Fills the totals of a database created before they were kept
+    BACKFILL_TOTALS = """
+        INSERT INTO customer_totals (username, active, rentals, revenue, fines)
+        SELECT username, SUM(status = 'active'), COUNT(*), SUM(total_cost), SUM(fine_amount)
+        FROM rentals GROUP BY username;
+        INSERT INTO car_totals (car_id, rentals, revenue, fines)
+        SELECT car_id, COUNT(*), SUM(total_cost), SUM(fine_amount)
+        FROM rentals GROUP BY car_id;
+    """
+
+    def __init__(self, data_dir=DATA_DIR, filename="car_rental.db"):
+        self.data_dir = data_dir
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+
+        self.path = os.path.join(self.data_dir, filename)
+        self._conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._held = 0
+        self._writes = {"cars": 0, "users": 0, "admins": 0, "rentals": 0}
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.executescript(self.SCHEMA)
+            for table, columns in self.ADDED_COLUMNS.items():
+                existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for column, definition in columns.items():
+                    if column not in existing:
+                        self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            backfill = self._conn.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM customer_totals) AND EXISTS (SELECT 1 FROM rentals)"
+            ).fetchone()[0]
+            if backfill:
+                self._conn.executescript(self.BACKFILL_TOTALS)
+
+    @contextmanager
+    def _transaction(self):
+        """A transaction of its own, or a savepoint inside the one locked() holds open"""
+        with self._lock:
+            if not self._held:
+                with self._conn:
+                    yield
+                return
+            self._conn.execute("SAVEPOINT nested")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK TO nested")
+                raise
+            finally:
+                self._conn.execute("RELEASE nested")
+
+    @contextmanager
+    def locked(self, store):
+        """Hold the database's write lock (a whole-database lock in SQLite) until the block ends"""
+        with self._lock:
+            if self._held:
+                self._held += 1
+                try:
+                    yield
+                finally:
+                    self._held -= 1
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._held = 1
+            try:
+                yield
+            except BaseException:
+                self._conn.rollback()
+                raise
+            else:
+                self._conn.commit()
+            finally:
+                self._held = 0
+
+    def _execute(self, store, sql, params=()):
+        """Run one write statement in its own transaction"""
+        stats.record_query()
+        with self._transaction():
+            cursor = self._conn.execute(sql, params)
+            self._writes[store] += 1
+            return cursor.rowcount
+
+    def _query(self, sql, params=()):
+        stats.record_query()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def signature(self, store):
+        stats.record_query()
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            return (data_version, self._writes[store])
+
+    def is_empty(self, store):
+        if store not in ("cars", "users", "admins"):
+            raise ValueError(f"Unknown store '{store}'")
+        return not self._query(f"SELECT EXISTS (SELECT 1 FROM {store})")[0][0]
+
+    # Cars
+    @staticmethod
+    def _car_from_row(row):
+        car = dict(row)
+        car["available"] = bool(car["available"])
+        return car
+
+    def load_cars(self):
+        rows = self._query("SELECT * FROM cars ORDER BY rowid")
+        return [self._car_from_row(row) for row in rows]
+
+    CAR_COLUMNS = CAR_FIELDS + ("version",)
+    INSERT_CAR = f"INSERT INTO cars ({', '.join(CAR_COLUMNS)}) VALUES ({', '.join('?' * len(CAR_COLUMNS))})"
+
+    @staticmethod
+    def _car_params(car):
+        return tuple(car[f] for f in CAR_FIELDS) + (car.get("version") or 0,)
+
+    def save_cars(self, cars):
+        stats.record_query(2)
+        with self._transaction():
+            self._conn.execute("DELETE FROM cars")
+            self._conn.executemany(self.INSERT_CAR, [self._car_params(car) for car in cars])
+            self._writes["cars"] += 1
+        return True
+
+    def add_car(self, car):
+        try:
+            self._execute("cars", self.INSERT_CAR, self._car_params(car))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def add_cars(self, cars):
+        stats.record_query()
+        try:
+            with self._transaction():
+                self._conn.executemany(self.INSERT_CAR, [self._car_params(car) for car in cars])
+                self._writes["cars"] += 1
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def remove_car(self, car_id):
+        return self._execute("cars", "DELETE FROM cars WHERE car_id = ?", (car_id,)) > 0
+
+    def update_car(self, car_id, **fields):
+        columns = [f for f in fields if f in CAR_FIELDS and f != "car_id"]
+        if not columns:
+            return False
+        sql, params = self._update_statement("cars", "car_id", columns, fields, car_id)
+        return self._execute("cars", sql, params) > 0
+
+    def car_versions(self, car_ids):
+        car_ids = list(car_ids)
+        if not car_ids:
+            return {}
+        rows = self._query(f"SELECT car_id, version FROM cars WHERE car_id IN ({', '.join('?' * len(car_ids))})",
+                           car_ids)
+        return {row["car_id"]: row["version"] for row in rows}
+
+    @staticmethod
+    def _update_statement(table, key, columns, fields, record_key):
+        """UPDATE setting columns from fields and bumping the version (or setting the one given)"""
+        assignments = "".join(f"{c} = ?, " for c in columns)
+        params = [fields[c] for c in columns]
+        if "version" in fields:
+            params.append(fields["version"])
+            bump = "?"
+        else:
+            bump = "version + 1"
+        return f"UPDATE {table} SET {assignments}version = {bump} WHERE {key} = ?", params + [record_key]
+
+    # Users
+    # Databases created before rentals moved out of the user record still
+    # have a users.rentals column; naming the columns skips it.
+    USER_COLUMNS = ", ".join(USER_FIELDS + ("version",))
+    INSERT_USER = f"INSERT INTO users ({USER_COLUMNS}) VALUES ({', '.join('?' * (len(USER_FIELDS) + 1))})"
+
+    @staticmethod
+    def _user_params(user):
+        return [user.get(f) for f in USER_FIELDS] + [user.get("version") or 0]
+
+    def load_users(self):
+        rows = self._query(f"SELECT {self.USER_COLUMNS} FROM users ORDER BY rowid")
+        return [dict(row) for row in rows]
+
+    def save_users(self, users):
+        stats.record_query(2)
+        with self._transaction():
+            self._conn.execute("DELETE FROM users")
+            self._conn.executemany(self.INSERT_USER, [self._user_params(u) for u in users])
+            self._writes["users"] += 1
+        return True
+
+    def add_user(self, user):
+        try:
+            self._execute("users", self.INSERT_USER, self._user_params(user))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def update_user(self, username, **fields):
+        columns = [f for f in fields if f in USER_FIELDS and f != "username"]
+        if not columns:
+            return False
+        sql, params = self._update_statement("users", "username", columns, fields, username)
+        return self._execute("users", sql, params) > 0
+
+    def get_user(self, username):
+        rows = self._query(f"SELECT {self.USER_COLUMNS} FROM users WHERE username = ?", (username,))
+        return dict(rows[0]) if rows else None
+
+    # Admins
+    def load_admins(self):
+        return [dict(row) for row in self._query("SELECT * FROM admins ORDER BY rowid")]
+
+    def get_admin(self, username):
+        rows = self._query("SELECT * FROM admins WHERE username = ?", (username,))
+        return dict(rows[0]) if rows else None
+
+    def add_admin(self, admin):
+        try:
+            self._execute("admins", "INSERT INTO admins VALUES (?, ?, ?, ?)",
+                          tuple(admin.get(f) for f in ADMIN_FIELDS))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    # Rentals
+    @staticmethod
+    def _rental_params(username, rental):
+        rental.setdefault("rental_id", new_rental_id())
+        rental.setdefault("accrued_fine", 0)
+        return [username] + [rental.get(f) for f in RENTAL_FIELDS]
+
+    def load_rentals(self, status=None, start_date=None, end_date=None):
+        conditions, params = [], []
+        for sql, value in (("status = ?", status), ("start_date >= ?", start_date), ("start_date <= ?", end_date)):
+            if value is not None:
+                conditions.append(sql)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+
+        rentals = {}
+        rows = self._query(f"SELECT username, {', '.join(RENTAL_FIELDS)} FROM rentals {where}ORDER BY rowid", params)
+        for row in rows:
+            rental = dict(row)
+            rentals.setdefault(rental.pop("username"), []).append(rental)
+        return rentals
+
+    def save_rentals(self, rentals):
+        rows = [self._rental_params(username, rental)
+                for username, user_rentals in rentals.items()
+                for rental in user_rentals]
+        stats.record_query(2)
+        with self._transaction():
+            self._conn.execute("DELETE FROM rentals")
+            self._conn.executemany(
+                f"INSERT INTO rentals (username, {', '.join(RENTAL_FIELDS)}) "
+                f"VALUES ({', '.join('?' * (len(RENTAL_FIELDS) + 1))})",
+                rows,
+            )
+            self._writes["rentals"] += 1
+        return True
+
+    def load_user_rentals(self, username):
+        rows = self._query(f"SELECT {', '.join(RENTAL_FIELDS)} FROM rentals WHERE username = ? ORDER BY rowid",
+                           (username,))
+        return [dict(row) for row in rows]
+
+    # Totals
+    def rental_totals(self, username):
+        rows = self._query(f"SELECT {', '.join(CUSTOMER_TOTALS)} FROM customer_totals WHERE username = ?",
+                           (username,))
+        return dict(rows[0]) if rows else dict.fromkeys(CUSTOMER_TOTALS, 0)
+
+    def load_rental_totals(self):
+        rows = self._query(f"SELECT username, {', '.join(CUSTOMER_TOTALS)} FROM customer_totals")
+        return {row["username"]: {f: row[f] for f in CUSTOMER_TOTALS} for row in rows}
+
+    def car_totals(self, car_id):
+        rows = self._query(f"SELECT {', '.join(CAR_TOTALS)} FROM car_totals WHERE car_id = ?", (car_id,))
+        return dict(rows[0]) if rows else dict.fromkeys(CAR_TOTALS, 0)
+
+    def load_car_totals(self):
+        rows = self._query(f"SELECT car_id, {', '.join(CAR_TOTALS)} FROM car_totals")
+        return {row["car_id"]: {f: row[f] for f in CAR_TOTALS} for row in rows}
+
+    def iter_user_rentals(self, username, after=None):
+        """Keyset pagination over rowid, PAGE_SIZE rows per query"""
+        last = 0
+        if after is not None:
+            rows = self._query("SELECT rowid FROM rentals WHERE rental_id = ? AND username = ?", (after, username))
+            if not rows:
+                raise ValueError(f"Unknown cursor '{after}'")
+            last = rows[0][0]
+        while True:
+            rows = self._query(f"SELECT rowid, {', '.join(RENTAL_FIELDS)} FROM rentals "
+                               "WHERE username = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                               (username, last, PAGE_SIZE))
+            for row in rows:
+                rental = dict(row)
+                last = rental.pop("rowid")
+                yield rental
+            if len(rows) < PAGE_SIZE:
+                return
+
+    def archive_rentals(self, before):
+        """Nothing to move: the status and start_date indexes already keep
+        queries away from old history"""
+        return 0
+
+    def add_rental(self, username, rental):
+        self._execute(
+            "rentals",
+            f"INSERT INTO rentals (username, {', '.join(RENTAL_FIELDS)}) "
+            f"VALUES ({', '.join('?' * (len(RENTAL_FIELDS) + 1))})",
+            self._rental_params(username, rental),
+        )
+        return True
+
+    def update_rental(self, username, car_id, **fields):
+        columns = [f for f in fields if f in RENTAL_FIELDS]
+        if not columns:
+            return False
+        assignments = ", ".join(f"{c} = ?" for c in columns)
+        sql = (f"UPDATE rentals SET {assignments} WHERE rowid = ("
+               "SELECT rowid FROM rentals WHERE username = ? AND car_id = ? "
+               "AND status = 'active' ORDER BY rowid LIMIT 1)")
+        return self._execute("rentals", sql, [fields[c] for c in columns] + [username, car_id]) > 0
+
+    # Batches
+    def commit_batch(self, cars=None, users=None, new_rentals=None, rental_updates=None, versions=None):
+        """Run the whole batch in a single transaction, rolled back if any row is
+        missing or has moved past the expected version"""
+        statements = []
+        for store, table, key, allowed, changes in (("cars", "cars", "car_id", CAR_FIELDS, cars or {}),
+                                                    ("users", "users", "username", USER_FIELDS, users or {})):
+            expected = (versions or {}).get(store) or {}
+            for record_key in set(changes) | set(expected):
+                if record_key in changes:
+                    fields = changes[record_key]
+                    columns = [f for f in fields if f in allowed and f != key]
+                    sql, params = self._update_statement(table, key, columns, fields, record_key)
+                else:
+                    # A record that is only version-checked keeps its version
+                    sql, params = f"UPDATE {table} SET version = version WHERE {key} = ?", [record_key]
+                if record_key in expected:
+                    sql += " AND version = ?"
+                    params.append(expected[record_key])
+                statements.append((store, sql, params))
+        for username, rental_id, car_id, fields in rental_updates or []:
+            columns = [f for f in fields if f in RENTAL_FIELDS]
+            assignments = ", ".join(f"{c} = ?" for c in columns)
+            if rental_id:
+                sql = f"UPDATE rentals SET {assignments} WHERE rental_id = ? AND status = 'active'"
+                params = [fields[c] for c in columns] + [rental_id]
+            else:
+                sql = (f"UPDATE rentals SET {assignments} WHERE rowid = ("
+                       "SELECT rowid FROM rentals WHERE username = ? AND car_id = ? "
+                       "AND status = 'active' ORDER BY rowid LIMIT 1)")
+                params = [fields[c] for c in columns] + [username, car_id]
+            statements.append(("rentals", sql, params))
+        inserts = [self._rental_params(username, rental) for username, rental in new_rentals or []]
+
+        stats.record_query(len(statements) + (1 if inserts else 0))
+        try:
+            with self._transaction():
+                for _, sql, params in statements:
+                    if self._conn.execute(sql, params).rowcount == 0:
+                        raise LookupError(params[-1])
+                if inserts:
+                    self._conn.executemany(
+                        f"INSERT INTO rentals (username, {', '.join(RENTAL_FIELDS)}) "
+                        f"VALUES ({', '.join('?' * (len(RENTAL_FIELDS) + 1))})",
+                        inserts,
+                    )
+                for store in {store for store, _, _ in statements} | ({"rentals"} if inserts else set()):
+                    self._writes[store] += 1
+        except (LookupError, sqlite3.IntegrityError):
+            return False
+        return True
+
+
+def copy_storage(source, target):
+    """Copy every store from one engine into another, e.g. JSON -> SQLite.
+
+    Returns the number of records copied per store.
+    """
+    cars, users, admins, rentals = (source.load_cars(), source.load_users(), source.load_admins(),
+                                    source.load_rentals())
+    target.save_cars(cars)
+    target.save_users(users)
+    for admin in admins:
+        target.add_admin(admin)
+    target.save_rentals(rentals)
+    return {"cars": len(cars), "users": len(users), "admins": len(admins),
+            "rentals": sum(len(r) for r in rentals.values())}
+
+
+def file_data_present(data_dir=DATA_DIR):
+    """True if data_dir holds cars or users saved by the file engines (json, mmap)"""
+    extension = get_serializer(DATA_FORMAT).extension
+    paths = [os.path.join(data_dir, store + extension) for store in ("cars", "users")]
+    paths.append(os.path.join(data_dir, "cars.fleet"))
+    return any(os.path.exists(path) and os.stat(path).st_size > 0 for path in paths)
+
+
+ENGINES = {
+    "json": JsonStorage,
+    "mmap": MappedStorage,
+    "sqlite": SQLiteStorage,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Return the process-wide storage engine, creating it on first use"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_ENGINE not in ENGINES:
+                raise ValueError(f"Unknown storage engine '{STORAGE_ENGINE}'. "
+                                 f"Choose one of: {', '.join(ENGINES)}")
+            _storage = ENGINES[STORAGE_ENGINE]()
+            if WRITE_BEHIND:
+                from models.write_behind import WriteBehindStorage
+                _storage = WriteBehindStorage(_storage)
+        return _storage
+
+
+def set_storage(storage):
+    """Swap the process-wide storage engine, e.g. for tools and benchmarks"""
+    global _storage
+    with _storage_lock:
+        _storage = storage
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Copy a data directory from one storage engine to another")
+    parser.add_argument("action", choices=["copy"])
+    parser.add_argument("--from", dest="source", choices=sorted(ENGINES), default="json")
+    parser.add_argument("--to", dest="target", choices=sorted(ENGINES), required=True)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args(argv)
+
+    if args.source == args.target:
+        print("Error: the source and target engines are the same.")
+        return
+    target = ENGINES[args.target](args.data_dir)
+    # json and mmap share the users, admins and rentals files, so one is never copied onto the other
+    if not all(target.is_empty(store) for store in ("cars", "users", "admins")):
+        print(f"Error: the {args.target} engine already holds data in {args.data_dir}; nothing was copied.")
+        return
+    counts = copy_storage(ENGINES[args.source](args.data_dir), target)
+    print(", ".join(f"{count} {store}" for store, count in counts.items()) + " copied.")
+    print(f"Set CAR_RENTAL_STORAGE={args.target} to use the copied data.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import nullcontext
+from models import stats
+from models.fileio import read_document
+from models.serializers import SERIALIZERS
+
+
+class UserIndex:
+    """Persistent username -> record index kept beside an account file.
+
+    The index lives in its own small sqlite3 file and remembers the
+    signature (mtime, size, inode) of the account file it was built from. As
+    long as the account file has not been changed behind its back, a login or
+    duplicate check is a single keyed lookup instead of a parse of every
+    account. If the file was edited elsewhere the index is rebuilt once.
+
+    lock is the account file's store lock. Writers hold it while they write
+    the file and index what they wrote; the rebuild takes it too, so it can
+    never index a copy of the file that a writer has just replaced.
+    """
+
+    def __init__(self, source_path, index_path, serializer=None, lock=None):
+        self.source_path = source_path
+        self.source_lock = lock or nullcontext()
+        self.serializer = serializer or SERIALIZERS["json"]
+        self.index_path = index_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS records (username TEXT PRIMARY KEY, record TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _source_signature(self):
+        try:
+            st = os.stat(self.source_path)
+        except OSError:
+            return None
+        return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+    def _stored_signature(self):
+        stats.record_query()
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _mark_synced(self, signature=None):
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)",
+                           (json.dumps(signature or self._source_signature()),))
+
+    def _load_source(self):
+        if not os.path.exists(self.source_path) or os.stat(self.source_path).st_size == 0:
+            return []
+        return read_document(self.source_path, self.serializer)
+
+    def in_sync(self):
+        """True if the index reflects the account file as it is on disk now"""
+        with self._lock:
+            return self._stored_signature() == self._source_signature()
+
+    def _ensure_synced(self):
+        if self.in_sync():
+            return
+        with self.source_lock:
+            # A writer may have brought the index up to date while we waited
+            if not self.in_sync():
+                self.rebuild(self._load_source())
+
+    def rebuild(self, records, signature=None):
+        """Re-index every record; records must be what the account file held at signature (default now)"""
+        stats.record_query(2)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM records")
+            self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?)",
+                                   [(r["username"], json.dumps(r)) for r in records])
+            self._mark_synced(signature)
+
+    def get(self, username):
+        """Return the record stored for username, or None"""
+        # Not under self._lock: writers take the store lock first, then self._lock
+        self._ensure_synced()
+        with self._lock:
+            stats.record_query()
+            row = self._conn.execute("SELECT record FROM records WHERE username = ?", (username,)).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def put(self, *records):
+        """Index records that were just written to the account file"""
+        stats.record_query(2)
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?)",
+                                   [(r["username"], json.dumps(r)) for r in records])
+            self._mark_synced()
@@ -0,0 +1,499 @@
+"""Write-behind persistence.
+
+    CAR_RENTAL_WRITE_BEHIND=1 python main_script.py
+
+WriteBehindStorage wraps any storage engine. Rents, returns, top-ups and
+other record changes are checked and accepted in memory, then queued
+for a background writer thread. Whenever it wakes, the writer folds
+everything queued so far into one commit of the wrapped engine (a group
+commit), so a burst of changes costs one rewrite of each store rather
+than one per change, and the caller never waits for the disk.
+
+Until the writer has committed them, pending changes are laid over what
+the wrapped engine returns, so every read sees them. flush() waits for
+the writer to catch up; the menus call it on logout and exit, and it
+runs when the process exits. At most MAX_PENDING changes can be queued;
+beyond that writers wait for the writer thread, which also bounds what
+a crash can lose. A group that fails WRITE_ATTEMPTS times is dropped;
+flush() then returns False and dropped_changes() says how many changes
+were lost.
+
+Versions are checked against this process's view, so only one process
+should write to a data directory in this mode.
+"""
+import atexit
+import threading
+import time
+from models.aggregates import RentalTotals
+from models.paging import resume_after
+from models.storage import Storage, filter_rentals, new_rental_id
+
+MAX_PENDING = 1000
+WRITE_ATTEMPTS = 3
+RETRY_DELAY = 1.0
+CLOSE_TIMEOUT = 30
+
+
+def _replay(rentals, ops):
+    """Lay pending rental changes over a user's stored rentals.
+
+    ops are (rental_id, car_id, new rental or None, fields or None) in the
+    order they were accepted. Replaying changes the store already has
+    makes no difference, so this is safe while the writer is committing.
+    """
+    rentals = [dict(r) for r in rentals]
+    ids = {r.get("rental_id") for r in rentals}
+    for rental_id, car_id, new, fields in ops:
+        if new is not None:
+            if rental_id not in ids:
+                rentals.append(dict(new))
+                ids.add(rental_id)
+            continue
+        for rental in rentals:
+            if rental_id:
+                if rental.get("rental_id") == rental_id:
+                    rental.update(fields)
+                    break
+            # Only rentals from before rental ids are updated by car
+            elif not rental.get("rental_id") and rental["car_id"] == car_id and rental["status"] == "active":
+                rental.update(fields)
+                break
+    return rentals
+
+
+def _merge(batches):
+    """Fold queued batches into one commit, in the order they were accepted"""
+    cars, users, new_rentals, rental_updates = {}, {}, [], []
+    created = {}
+    for batch in batches:
+        for car_id, fields in batch["cars"].items():
+            cars.setdefault(car_id, {}).update(fields)
+        for username, fields in batch["users"].items():
+            users.setdefault(username, {}).update(fields)
+        for username, rental in batch["new_rentals"]:
+            rental = dict(rental)
+            created[rental["rental_id"]] = rental
+            new_rentals.append((username, rental))
+        for username, rental_id, car_id, fields in batch["rental_updates"]:
+            if rental_id in created:
+                # Rented and already changed again: store it as it is now
+                created[rental_id].update(fields)
+            else:
+                rental_updates.append((username, rental_id, car_id, fields))
+    return {"cars": cars, "users": users, "new_rentals": new_rentals, "rental_updates": rental_updates}
+
+
+class WriteBehindStorage(Storage):
+    """Storage engine wrapper that accepts changes in memory and persists them on a writer thread.
+
+    The fleet is held in memory, and so are the users and their rentals
+    once read. Changes to existing records (commit_batch, update_car,
+    update_user, add_rental, update_rental) are applied there and written
+    behind. New cars, users and admins go straight to the wrapped engine.
+    Removals, bulk saves and archiving are rare: they wait for the queue
+    to drain first.
+    """
+
+    def __init__(self, inner, max_pending=MAX_PENDING):
+        self.inner = inner
+        self.data_dir = getattr(inner, "data_dir", None)
+        self.max_pending = max_pending
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._queue = []
+        self._inflight = []
+        # Accepted changes the writer gave up on, not reported yet (see dropped_changes)
+        self._dropped = 0
+        self._cars = None
+        self._users = {}
+        self._user_rentals = {}
+        # username -> rental changes not committed yet, for reads that go to the wrapped engine
+        self._rental_ops = {}
+        # Reads are served from memory, so the signatures count accepted changes
+        self._generations = dict.fromkeys(("cars", "users", "admins", "rentals"), 0)
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="write-behind", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # Writer
+    def _write_loop(self):
+        attempts = 0
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._changed.wait()
+                if not self._queue:
+                    return
+                self._inflight, self._queue = self._queue, []
+                group = _merge(self._inflight)
+
+            try:
+                saved = self.inner.commit_batch(**group)
+                error = "a car, customer or active rental it changes no longer exists"
+            except Exception as e:
+                saved, error = False, e
+
+            with self._lock:
+                attempts = 0 if saved else attempts + 1
+                if saved or attempts >= WRITE_ATTEMPTS:
+                    if not saved:
+                        print(f"Error saving {len(self._inflight)} changes: {error}. They were dropped.")
+                        self._dropped += len(self._inflight)
+                        # Serve what the store holds from now on
+                        self._forget("cars", "users", "rentals")
+                        attempts = 0
+                    self._inflight = []
+                    self._rental_ops = {}
+                    for batch in self._queue:
+                        self._record_rental_ops(batch)
+                else:
+                    # Try again, ahead of anything queued since
+                    self._queue = self._inflight + self._queue
+                    self._inflight = []
+                self._changed.notify_all()
+            if not saved and attempts:
+                print(f"Error saving changes: {error}. Retrying.")
+                time.sleep(RETRY_DELAY)
+
+    def _record_rental_ops(self, batch):
+        for username, rental in batch["new_rentals"]:
+            self._rental_ops.setdefault(username, []).append((rental["rental_id"], rental["car_id"], rental, None))
+        for username, rental_id, car_id, fields in batch["rental_updates"]:
+            self._rental_ops.setdefault(username, []).append((rental_id, car_id, None, fields))
+
+    def _apply(self, batch):
+        """Apply an accepted batch to the records held in memory"""
+        for car_id, fields in batch["cars"].items():
+            self._cars[car_id].update(fields)
+        for username, fields in batch["users"].items():
+            self._users[username].update(fields)
+        self._record_rental_ops(batch)
+        for username in {username for username, _ in batch["new_rentals"]} | \
+                {username for username, _, _, _ in batch["rental_updates"]}:
+            if username in self._user_rentals:
+                self._user_rentals[username] = _replay(self._user_rentals[username], self._rental_ops[username])
+
+    def _forget(self, *stores):
+        """Drop what is held in memory for stores, to be read again from the wrapped engine"""
+        if "cars" in stores:
+            self._cars = None
+        if "users" in stores:
+            self._users = {}
+        if "rentals" in stores:
+            self._user_rentals = {}
+        for store in stores:
+            self._generations[store] += 1
+
+    def flush(self, timeout=None):
+        """Wait until every accepted change is committed.
+
+        False if timeout ran out first, or if the writer had to drop changes
+        that were not reported yet (see dropped_changes).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._queue or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            return not self._dropped
+
+    def dropped_changes(self):
+        """How many accepted changes were dropped since the last call, after failing WRITE_ATTEMPTS times"""
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+            return dropped
+
+    def close(self):
+        """Flush and stop the writer thread"""
+        if not self.flush(CLOSE_TIMEOUT):
+            dropped = self.dropped_changes()
+            if dropped:
+                print(f"{dropped} changes could not be saved and were lost.")
+            if self._queue or self._inflight:
+                print(f"Gave up waiting for {len(self._queue) + len(self._inflight)} changes to be saved.")
+        with self._lock:
+            self._closed = True
+            self._changed.notify_all()
+
+    def _synchronous(self, stores, write, *args):
+        """Run a write on the wrapped engine once the queue has drained.
+
+        Other threads can still queue changes while flush() waits (the wait
+        releases the lock); those are drained too. Once the queue is empty
+        the lock is kept until the write is done, so nothing queued can be
+        written around it.
+        """
+        with self._lock:
+            self.flush()
+            try:
+                return write(*args)
+            finally:
+                self._forget(*stores)
+
+    def _added(self, store, cars=()):
+        """Note records just added to the wrapped engine; new records have no changes pending"""
+        with self._lock:
+            if self._cars is not None:
+                for car in cars:
+                    self._cars[car["car_id"]] = dict(car, version=car.get("version", 0))
+            self._generations[store] += 1
+
+    def signature(self, store):
+        with self._lock:
+            return self._generations[store]
+
+    def locked(self, store):
+        # The signatures count changes accepted here, all under this lock
+        return self._lock
+
+    def check_car(self, car):
+        return self.inner.check_car(car)
+
+    def is_empty(self, store):
+        # Records are added and removed synchronously, so the wrapped engine knows
+        return self.inner.is_empty(store)
+
+    # Batches
+    def commit_batch(self, cars=None, users=None, new_rentals=None, rental_updates=None, versions=None):
+        cars = cars or {}
+        users = users or {}
+        new_rentals = new_rentals or []
+        rental_updates = rental_updates or []
+        versions = versions or {}
+        for _, rental in new_rentals:
+            rental.setdefault("rental_id", new_rental_id())
+
+        with self._lock:
+            # Backpressure: wait for the writer if the queue is full
+            while len(self._queue) >= self.max_pending:
+                self._changed.wait()
+
+            expected_cars = versions.get("cars") or {}
+            car_versions = self.car_versions(set(cars) | set(expected_cars))
+            expected_users = versions.get("users") or {}
+            user_versions = {}
+            for username in set(users) | set(expected_users):
+                user = self.get_user(username)
+                if user is not None:
+                    user_versions[username] = user.get("version", 0)
+            for changes, current, expected in ((cars, car_versions, expected_cars),
+                                               (users, user_versions, expected_users)):
+                if any(key not in current for key in changes):
+                    return False
+                if any(current.get(key) != version for key, version in expected.items()):
+                    return False
+
+            # Pin each rental update to its rental so it can be replayed and merged by id
+            updates = []
+            for username, rental_id, car_id, fields in rental_updates:
+                target = None
+                for rental in self.load_user_rentals(username):
+                    if (rental.get("rental_id") == rental_id if rental_id
+                            else rental["car_id"] == car_id and rental["status"] == "active"):
+                        target = rental
+                        break
+                if target is None or target["status"] != "active":
+                    return False
+                updates.append((username, target.get("rental_id"), car_id, dict(fields)))
+
+            # Versions are assigned here, so the writer stores exactly these
+            batch = {
+                "cars": {car_id: dict(fields, version=car_versions[car_id] + 1) for car_id, fields in cars.items()},
+                "users": {username: dict(fields, version=user_versions[username] + 1)
+                          for username, fields in users.items()},
+                "new_rentals": [(username, dict(rental)) for username, rental in new_rentals],
+                "rental_updates": updates,
+            }
+            self._queue.append(batch)
+            self._apply(batch)
+            for store, changed in (("cars", cars), ("users", users), ("rentals", new_rentals or updates)):
+                if changed:
+                    self._generations[store] += 1
+            self._changed.notify_all()
+            return True
+
+    # Cars
+    def _fleet(self):
+        with self._lock:
+            if self._cars is None:
+                self._cars = {car["car_id"]: car for car in self.inner.load_cars()}
+            return self._cars
+
+    def load_cars(self):
+        with self._lock:
+            return [dict(car) for car in self._fleet().values()]
+
+    def car_versions(self, car_ids):
+        with self._lock:
+            cars = self._fleet()
+            return {car_id: cars[car_id].get("version", 0) for car_id in car_ids if car_id in cars}
+
+    def save_cars(self, cars):
+        return self._synchronous(["cars"], self.inner.save_cars, cars)
+
+    def add_car(self, car):
+        if not self.inner.add_car(car):
+            return False
+        self._added("cars", [car])
+        return True
+
+    def add_cars(self, cars):
+        if not self.inner.add_cars(cars):
+            return False
+        self._added("cars", cars)
+        return True
+
+    def remove_car(self, car_id):
+        return self._synchronous(["cars"], self.inner.remove_car, car_id)
+
+    def update_car(self, car_id, **fields):
+        return self.commit_batch(cars={car_id: fields})
+
+    # Users
+    def load_users(self):
+        users = self.inner.load_users()
+        with self._lock:
+            return [dict(self._users.get(user["username"], user)) for user in users]
+
+    def save_users(self, users):
+        return self._synchronous(["users"], self.inner.save_users, users)
+
+    def add_user(self, user):
+        if not self.inner.add_user(user):
+            return False
+        self._added("users")
+        return True
+
+    def update_user(self, username, **fields):
+        return self.commit_batch(users={username: fields})
+
+    def get_user(self, username):
+        with self._lock:
+            user = self._users.get(username)
+        if user is None:
+            # Not changed since it was stored: only changes made here are
+            # pending, and making one reads the record first
+            user = self.inner.get_user(username)
+            if user is None:
+                return None
+            with self._lock:
+                user = self._users.setdefault(username, user)
+        with self._lock:
+            return dict(user)
+
+    # Admins
+    def load_admins(self):
+        return self.inner.load_admins()
+
+    def get_admin(self, username):
+        return self.inner.get_admin(username)
+
+    def add_admin(self, admin):
+        if not self.inner.add_admin(admin):
+            return False
+        self._added("admins")
+        return True
+
+    # Rentals
+    def _pending_rentals(self):
+        with self._lock:
+            return {username: list(ops) for username, ops in self._rental_ops.items()}
+
+    def load_rentals(self, status=None, start_date=None, end_date=None):
+        pending = self._pending_rentals()
+        rentals = self.inner.load_rentals(status, start_date, end_date)
+        for username in pending:
+            matches = filter_rentals({username: self.load_user_rentals(username)}, status, start_date, end_date)
+            if username in matches:
+                rentals[username] = matches[username]
+            else:
+                rentals.pop(username, None)
+        return rentals
+
+    def save_rentals(self, rentals):
+        return self._synchronous(["rentals"], self.inner.save_rentals, rentals)
+
+    def add_rental(self, username, rental):
+        return self.commit_batch(new_rentals=[(username, rental)])
+
+    def load_user_rentals(self, username):
+        with self._lock:
+            rentals = self._user_rentals.get(username)
+            ops = list(self._rental_ops.get(username, ()))
+        if rentals is None:
+            # Pending changes were taken first: if the writer commits them
+            # in between, the stored rentals already have them
+            rentals = _replay(self.inner.load_user_rentals(username), ops)
+            with self._lock:
+                if username in self._user_rentals:
+                    rentals = self._user_rentals[username]
+                # Changes accepted meanwhile were not in ops
+                elif self._rental_ops.get(username, []) == ops:
+                    self._user_rentals[username] = rentals
+        return [dict(r) for r in rentals]
+
+    def iter_user_rentals(self, username, after=None):
+        with self._lock:
+            held = username in self._user_rentals or username in self._rental_ops
+        if not held:
+            return self.inner.iter_user_rentals(username, after)
+        return resume_after(self.load_user_rentals(username), after, lambda r: r.get("rental_id"))
+
+    def archive_rentals(self, before):
+        return self._synchronous(["rentals"], self.inner.archive_rentals, before)
+
+    def update_rental(self, username, car_id, **fields):
+        return self.commit_batch(rental_updates=[(username, None, car_id, fields)])
+
+    # Totals
+    def rental_totals(self, username):
+        with self._lock:
+            held = username in self._user_rentals or username in self._rental_ops
+        if not held:
+            return self.inner.rental_totals(username)
+        # A customer's totals cover all of their rentals, so recount them
+        return RentalTotals.from_rentals({username: self.load_user_rentals(username)}).customer(username)
+
+    def load_rental_totals(self):
+        pending = self._pending_rentals()
+        totals = self.inner.load_rental_totals()
+        for username in pending:
+            totals[username] = self.rental_totals(username)
+        return totals
+
+    def _car_deltas(self, pending, car_ids):
+        """What the pending rental changes add to the totals of car_ids, against the stored rentals"""
+        deltas = RentalTotals()
+        for username, ops in pending.items():
+            if not any(op[1] in car_ids for op in ops):
+                continue
+            stored = self.inner.load_user_rentals(username)
+            for rental in stored:
+                if rental["car_id"] in car_ids:
+                    deltas.count(username, rental, -1)
+            for rental in _replay(stored, ops):
+                if rental["car_id"] in car_ids:
+                    deltas.count(username, rental)
+        return deltas.cars
+
+    def _with_car_deltas(self, read, car_ids=None):
+        """read() plus the pending changes, retried if the writer commits in between"""
+        while True:
+            pending = self._pending_rentals()
+            wanted = car_ids or {op[1] for ops in pending.values() for op in ops}
+            signature = self.inner.signature("rentals")
+            totals = read()
+            deltas = self._car_deltas(pending, wanted)
+            if self.inner.signature("rentals") == signature:
+                return totals, deltas
+
+    def car_totals(self, car_id):
+        totals, deltas = self._with_car_deltas(lambda: self.inner.car_totals(car_id), {car_id})
+        return RentalTotals({}, {car_id: totals}).merge(RentalTotals({}, deltas)).car(car_id)
+
+    def load_car_totals(self):
+        totals, deltas = self._with_car_deltas(self.inner.load_car_totals)
+        return RentalTotals({}, totals).merge(RentalTotals({}, deltas)).cars
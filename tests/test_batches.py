@@ -0,0 +1,127 @@
+import glob
+import json
+import os
+import pytest
+from models.storage import JsonStorage, MappedStorage
+
+FILE_ENGINES = [JsonStorage, MappedStorage]
+
+
+def car(car_id):
+    return {"car_id": car_id, "brand": "Toyota", "model": "Corolla", "seating_capacity": 5,
+            "rental_price": 50.0, "available": True}
+
+
+def user(username):
+    return {"username": username, "password": "secret", "first_name": "Test", "last_name": "User", "balance": 500.0}
+
+
+def rental(rental_id, car_id):
+    return {"rental_id": rental_id, "car_id": car_id, "start_date": "2030-01-01", "end_date": "2030-01-03",
+            "days": 3, "total_cost": 150.0, "status": "active", "return_date": None, "fine_amount": 0}
+
+
+def setup(engine, tmp_path):
+    storage = engine(str(tmp_path))
+    storage.add_cars([car("1001"), car("1002")])
+    storage.add_user(user("alice"))
+    return storage
+
+
+def rent(storage):
+    """The batch of renting car 1001 to alice"""
+    return storage.commit_batch(cars={"1001": {"available": False}}, users={"alice": {"balance": 350.0}},
+                                new_rentals=[("alice", rental("r1", "1001"))],
+                                versions={"cars": {"1001": 0}, "users": {"alice": 0}})
+
+
+def pending(tmp_path):
+    return glob.glob(os.path.join(str(tmp_path), "batch-*.pending"))
+
+
+def crash_before_applying(storage, monkeypatch):
+    """Make the next batch stop after writing its intent file"""
+    monkeypatch.setattr(storage, "_apply_batch", lambda batch: False)
+
+
+@pytest.mark.parametrize("engine", FILE_ENGINES)
+def test_an_unapplied_batch_is_finished_on_open(tmp_path, monkeypatch, engine):
+    storage = setup(engine, tmp_path)
+    crash_before_applying(storage, monkeypatch)
+    assert not rent(storage)
+    assert len(pending(tmp_path)) == 1
+
+    recovered = engine(str(tmp_path))
+    assert pending(tmp_path) == []
+    assert recovered.get_user("alice")["balance"] == 350.0
+    assert recovered.get_user("alice")["version"] == 1
+    cars = {c["car_id"]: c for c in recovered.load_cars()}
+    assert cars["1001"]["available"] is False and cars["1001"]["version"] == 1
+    assert [r["rental_id"] for r in recovered.load_user_rentals("alice")] == ["r1"]
+
+
+@pytest.mark.parametrize("engine", FILE_ENGINES)
+def test_recovery_does_not_undo_later_writes(tmp_path, monkeypatch, engine):
+    storage = setup(engine, tmp_path)
+    crash_before_applying(storage, monkeypatch)
+    assert not rent(storage)
+    monkeypatch.undo()
+    # Another process changes the car before anyone recovers the batch
+    assert storage.update_car("1001", rental_price=99.0)
+
+    recovered = engine(str(tmp_path))
+    cars = {c["car_id"]: c for c in recovered.load_cars()}
+    assert cars["1001"]["rental_price"] == 99.0
+    assert cars["1001"]["available"] is True
+    assert cars["1001"]["version"] == 1
+    assert recovered.get_user("alice")["balance"] == 350.0
+
+
+@pytest.mark.parametrize("engine", FILE_ENGINES)
+def test_a_fully_applied_batch_is_not_applied_again(tmp_path, monkeypatch, engine):
+    storage = setup(engine, tmp_path)
+    applied = []
+    apply_batch = storage._apply_batch
+    monkeypatch.setattr(storage, "_apply_batch", lambda batch: applied.append(batch) or apply_batch(batch))
+    assert rent(storage)
+    monkeypatch.undo()
+    # The car comes back before the intent file left by a crash is found
+    assert storage.commit_batch(cars={"1001": {"available": True}},
+                                rental_updates=[("alice", "r1", "1001", {"status": "completed"})])
+    expected_user, expected_cars = storage.get_user("alice"), storage.load_cars()
+    with open(os.path.join(str(tmp_path), "batch-crashed.pending"), "w") as f:
+        json.dump(applied[0], f)
+
+    recovered = engine(str(tmp_path))
+    assert pending(tmp_path) == []
+    assert recovered.get_user("alice") == expected_user
+    assert recovered.load_cars() == expected_cars
+    rentals = recovered.load_user_rentals("alice")
+    assert [(r["rental_id"], r["status"]) for r in rentals] == [("r1", "completed")]
+
+
+def test_unapplied_keeps_only_what_is_still_due(tmp_path):
+    storage = setup(JsonStorage, tmp_path)
+    storage.add_user(user("bob"))
+    storage.update_user("bob", balance=10.0)
+    assert storage.commit_batch(new_rentals=[("alice", rental("r1", "1001")), ("alice", rental("r2", "1002"))])
+    storage.commit_batch(rental_updates=[("alice", "r2", "1002", {"status": "completed"})])
+
+    batch = {"cars": {"1001": {"version": 1, "available": False}},
+             "users": {"alice": {"version": 1, "balance": 1.0}, "bob": {"version": 1, "balance": 2.0}},
+             "new_rentals": [],
+             "rental_updates": [["alice", "r1", "1001", {"fine_amount": 5.0}],
+                                ["alice", "r2", "1002", {"fine_amount": 5.0}]],
+             "versions": {"cars": {"1001": 0}, "users": {"alice": 0, "bob": 0}}}
+    unapplied = storage._unapplied(batch)
+    assert unapplied["cars"] == batch["cars"]
+    # bob is at version 1 already
+    assert unapplied["users"] == {"alice": batch["users"]["alice"]}
+    # r2 is no longer active
+    assert unapplied["rental_updates"] == batch["rental_updates"][:1]
+
+
+def test_batches_from_before_versions_apply_as_they_are(tmp_path):
+    storage = setup(JsonStorage, tmp_path)
+    batch = {"cars": {"1001": {"available": False}}, "users": {}, "new_rentals": [], "rental_updates": []}
+    assert storage._unapplied(batch) is batch
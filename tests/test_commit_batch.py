@@ -0,0 +1,94 @@
+import pytest
+from models.storage import ENGINES
+from models.write_behind import WriteBehindStorage
+
+
+def car(car_id):
+    return {"car_id": car_id, "brand": "Toyota", "model": "Corolla", "seating_capacity": 5,
+            "rental_price": 50.0, "available": True}
+
+
+def user(username):
+    return {"username": username, "password": "secret", "first_name": "Test", "last_name": "User", "balance": 500.0}
+
+
+def rental(rental_id, car_id):
+    return {"rental_id": rental_id, "car_id": car_id, "start_date": "2030-01-01", "end_date": "2030-01-03",
+            "days": 3, "total_cost": 150.0, "status": "active", "return_date": None, "fine_amount": 0}
+
+
+@pytest.fixture(params=sorted(ENGINES) + ["json+write-behind"])
+def storage(request, tmp_path):
+    engine, _, mode = request.param.partition("+")
+    storage = ENGINES[engine](str(tmp_path))
+    if mode:
+        storage = WriteBehindStorage(storage)
+    storage.add_cars([car("1001"), car("1002")])
+    storage.add_user(user("alice"))
+    yield storage
+    if mode:
+        storage.close()
+
+
+def rent(storage, car_id="1001", rental_id="r1", checked=None):
+    """Rent car_id to alice as if both were read at version 0, also checking the cars in checked"""
+    return storage.commit_batch(cars={car_id: {"available": False}}, users={"alice": {"balance": 350.0}},
+                                new_rentals=[("alice", rental(rental_id, car_id))],
+                                versions={"cars": {car_id: 0, **(checked or {})}, "users": {"alice": 0}})
+
+
+def unchanged(storage):
+    """True if no batch has been applied since the fixture"""
+    return (storage.car_versions(["1001", "1002"]) == {"1001": 0, "1002": 0}
+            and storage.get_user("alice")["balance"] == 500.0
+            and storage.get_user("alice").get("version", 0) == 0
+            and storage.load_user_rentals("alice") == [])
+
+
+def test_current_versions_commit_and_move_on(storage):
+    assert rent(storage)
+    assert storage.car_versions(["1001", "1002"]) == {"1001": 1, "1002": 0}
+    assert storage.get_user("alice")["version"] == 1
+    assert storage.get_user("alice")["balance"] == 350.0
+    assert [r["rental_id"] for r in storage.load_user_rentals("alice")] == ["r1"]
+
+
+def test_a_stale_car_version_changes_nothing(storage):
+    storage.update_car("1001", rental_price=60.0)
+    assert not rent(storage)
+    assert storage.car_versions(["1001"]) == {"1001": 1}
+    assert storage.get_user("alice")["balance"] == 500.0
+    assert storage.load_user_rentals("alice") == []
+
+
+def test_a_stale_user_version_changes_nothing(storage):
+    storage.update_user("alice", balance=600.0)
+    assert not rent(storage)
+    assert storage.car_versions(["1001"]) == {"1001": 0}
+    assert storage.get_user("alice")["balance"] == 600.0
+    assert storage.load_user_rentals("alice") == []
+
+
+def test_a_record_only_checked_must_be_current_too(storage):
+    storage.update_car("1002", available=False)
+    assert not rent(storage, checked={"1002": 0})
+    assert storage.car_versions(["1001"]) == {"1001": 0}
+    assert storage.load_user_rentals("alice") == []
+
+
+def test_the_second_of_two_commits_from_the_same_read_loses(storage):
+    assert rent(storage)
+    assert not rent(storage, car_id="1002", rental_id="r2")
+    assert storage.car_versions(["1002"]) == {"1002": 0}
+    assert [r["rental_id"] for r in storage.load_user_rentals("alice")] == ["r1"]
+
+
+def test_a_missing_car_changes_nothing(storage):
+    assert not rent(storage, car_id="9999")
+    assert unchanged(storage)
+
+
+def test_an_update_to_a_rental_that_is_not_active_changes_nothing(storage):
+    assert not storage.commit_batch(cars={"1001": {"available": True}},
+                                    rental_updates=[("alice", "r1", "1001", {"status": "completed"})])
+    assert unchanged(storage)
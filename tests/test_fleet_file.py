@@ -0,0 +1,93 @@
+import pytest
+from models.fleet_file import FleetFile
+
+
+def car(car_id, brand="Toyota", model="Corolla"):
+    return {"car_id": car_id, "brand": brand, "model": model, "seating_capacity": 5,
+            "rental_price": 50.0, "available": True}
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    fleet = FleetFile(str(tmp_path / "cars.fleet"))
+    yield fleet
+    fleet.close()
+
+
+def test_append_adds_cars_after_the_last_slot(fleet):
+    assert fleet.is_empty()
+    assert fleet.append([car("1001"), car("1002")])
+    assert fleet.append([car("1003", "Honda", "Civic")])
+
+    assert [c["car_id"] for c in fleet.records()] == ["1001", "1002", "1003"]
+    assert fleet.get("1003") == dict(car("1003", "Honda", "Civic"), version=0)
+    assert fleet.slots == 3
+    assert not fleet.is_empty()
+
+
+def test_append_refuses_taken_ids(fleet):
+    fleet.append([car("1001")])
+    assert not fleet.append([car("1002"), car("1001")])
+    assert not fleet.append([car("1003"), car("1003")])
+    assert [c["car_id"] for c in fleet.records()] == ["1001"]
+
+
+def test_append_refuses_fields_wider_than_their_slot(fleet):
+    with pytest.raises(ValueError):
+        fleet.append([car("1001", brand="B" * 33)])
+    assert fleet.is_empty()
+
+
+def test_append_grows_the_file(tmp_path, fleet):
+    cars = [car(str(i)) for i in range(FleetFile.GROW_BY + 10)]
+    assert fleet.append(cars)
+
+    reopened = FleetFile(str(tmp_path / "cars.fleet"))
+    assert [c["car_id"] for c in reopened.records()] == [c["car_id"] for c in cars]
+    reopened.close()
+
+
+def test_update_rewrites_one_slot_and_bumps_its_version(fleet):
+    fleet.append([car("1001"), car("1002")])
+    before = fleet.signature()
+
+    assert fleet.update("1002", available=False, rental_price=65.0)
+    assert fleet.get("1002")["available"] is False
+    assert fleet.get("1002")["rental_price"] == 65.0
+    assert fleet.get("1002")["version"] == 1
+    assert fleet.get("1001")["version"] == 0
+    assert fleet.signature() != before
+
+
+def test_update_keeps_a_version_it_is_given(fleet):
+    fleet.append([car("1001")])
+    fleet.update("1001", available=False, version=7)
+    assert fleet.get("1001")["version"] == 7
+
+
+def test_update_of_an_unknown_car_changes_nothing(fleet):
+    fleet.append([car("1001")])
+    before = fleet.signature()
+    assert not fleet.update("9999", available=False)
+    assert fleet.signature() == before
+
+
+def test_other_handles_see_updates_and_appends(tmp_path, fleet):
+    fleet.append([car("1001")])
+    other = FleetFile(str(tmp_path / "cars.fleet"))
+    assert other.get("1001")["available"] is True
+
+    fleet.update("1001", available=False)
+    fleet.append([car("1002")])
+    assert other.get("1001")["available"] is False
+    assert [c["car_id"] for c in other.records()] == ["1001", "1002"]
+    other.close()
+
+
+def test_removed_slots_stay_empty(fleet):
+    fleet.append([car("1001"), car("1002")])
+    assert fleet.remove("1001")
+    assert fleet.get("1001") is None
+    assert not fleet.update("1001", available=False)
+    assert fleet.append([car("1003")])
+    assert [c["car_id"] for c in fleet.records()] == ["1002", "1003"]
@@ -0,0 +1,86 @@
+import os
+from models.journal import RentalJournal
+
+
+def rental(rental_id, car_id, status="active", total_cost=100.0):
+    return {"rental_id": rental_id, "car_id": car_id, "start_date": "2030-01-01", "end_date": "2030-01-03",
+            "days": 3, "total_cost": total_cost, "status": status, "return_date": None, "fine_amount": 0}
+
+
+def open_journal(tmp_path, compact_every=RentalJournal.COMPACT_EVERY):
+    return RentalJournal(str(tmp_path / "rentals.json"), str(tmp_path / "rentals.journal"),
+                         compact_every=compact_every, totals_path=str(tmp_path / "rental_totals.json"))
+
+
+def fill(journal):
+    """Two customers' rentals, one of them returned with a fine"""
+    journal.add_batch([("alice", rental("r1", "1001")), ("bob", rental("r2", "1002", total_cost=50.0))], [])
+    journal.add("alice", rental("r3", "1003"))
+    journal.add_batch([], [("alice", "r1", "1001", {"status": "completed", "return_date": "2030-01-05",
+                                                    "fine_amount": 30.0})])
+    journal.update("bob", "1002", {"accrued_fine": 12.0})
+
+
+def test_replay_rebuilds_state_and_totals(tmp_path):
+    fill(open_journal(tmp_path))
+
+    reopened = open_journal(tmp_path)
+    rentals = reopened.load()
+    assert [r["rental_id"] for r in rentals["alice"]] == ["r1", "r3"]
+    assert rentals["alice"][0]["status"] == "completed"
+    assert rentals["bob"][0]["accrued_fine"] == 12.0
+    assert reopened.customer_totals("alice") == {"active": 1, "rentals": 2, "revenue": 200.0, "fines": 30.0}
+    assert reopened.customer_totals("bob") == {"active": 1, "rentals": 1, "revenue": 50.0, "fines": 0}
+    assert reopened.car_totals("1001") == {"rentals": 1, "revenue": 100.0, "fines": 30.0}
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    journal = open_journal(tmp_path, compact_every=3)
+    fill(journal)
+    expected = journal.load()
+
+    # The third event compacted; only the last two are left in the journal
+    with open(tmp_path / "rentals.journal", "rb") as f:
+        assert len(f.read().splitlines()) == 2
+    assert os.path.exists(tmp_path / "rental_totals.json")
+
+    reopened = open_journal(tmp_path)
+    assert reopened.load() == expected
+    assert reopened.all_totals().to_document() == journal.all_totals().to_document()
+
+
+def test_replaying_the_same_events_twice_changes_nothing(tmp_path):
+    journal = open_journal(tmp_path)
+    fill(journal)
+    with open(tmp_path / "rentals.journal", "rb") as f:
+        events = f.read()
+    expected = journal.load()
+    totals = journal.all_totals().to_document()
+
+    # A crash between writing the snapshot and truncating the journal
+    journal.compact()
+    with open(tmp_path / "rentals.journal", "wb") as f:
+        f.write(events)
+
+    reopened = open_journal(tmp_path)
+    assert reopened.load() == expected
+    assert reopened.all_totals().to_document() == totals
+
+
+def test_a_created_event_is_applied_once(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.add("alice", rental("r1", "1001"))
+    journal.add("alice", rental("r1", "1001"))
+
+    reopened = open_journal(tmp_path)
+    assert len(reopened.load()["alice"]) == 1
+    assert reopened.customer_totals("alice")["rentals"] == 1
+
+
+def test_a_partly_written_line_waits_for_its_newline(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.add("alice", rental("r1", "1001"))
+    with open(tmp_path / "rentals.journal", "ab") as f:
+        f.write(b'{"event": "created", "username": "bob"')
+
+    assert list(open_journal(tmp_path).load()) == ["alice"]
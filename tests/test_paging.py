@@ -0,0 +1,71 @@
+import pytest
+from models.paging import iter_pages, paginate, resume_after
+
+
+def key(item):
+    return item["id"]
+
+
+ITEMS = [{"id": f"c{i}"} for i in range(5)]
+
+
+def test_paginate_gives_the_cursor_of_the_last_item():
+    page = paginate(iter(ITEMS), key, page_size=2)
+    assert page.items == ITEMS[:2]
+    assert page.next_cursor == "c1"
+
+
+def test_the_last_page_has_no_cursor():
+    assert paginate(iter(ITEMS), key, page_size=5).next_cursor is None
+    assert paginate(iter(ITEMS[:3]), key, page_size=5).items == ITEMS[:3]
+    assert paginate(iter([]), key).items == []
+
+
+def test_paginate_by_offset():
+    page = paginate(iter(ITEMS), key, page_size=2, offset=3)
+    assert page.items == ITEMS[3:]
+    assert page.next_cursor is None
+
+
+def test_paginate_reads_one_item_past_the_page():
+    read = []
+
+    def items():
+        for item in ITEMS:
+            read.append(item)
+            yield item
+
+    paginate(items(), key, page_size=2)
+    assert read == ITEMS[:3]
+
+
+def test_paginate_rejects_empty_pages():
+    with pytest.raises(ValueError):
+        paginate(iter(ITEMS), key, page_size=0)
+
+
+def test_resume_after_starts_past_the_cursor():
+    assert list(resume_after(ITEMS, None, key)) == ITEMS
+    assert list(resume_after(ITEMS, "c2", key)) == ITEMS[3:]
+    assert list(resume_after(ITEMS, "c4", key)) == []
+
+
+def test_resume_after_an_unknown_cursor_fails():
+    with pytest.raises(ValueError):
+        list(resume_after(ITEMS, "gone", key))
+
+
+def test_cursors_walk_every_item_once():
+    def fetch(cursor):
+        return paginate(resume_after(ITEMS, cursor, key), key, page_size=2)
+
+    pages = list(iter_pages(fetch))
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [item for page in pages for item in page] == ITEMS
+
+
+def test_a_cursor_stays_put_when_items_are_added_in_front():
+    first = paginate(resume_after(ITEMS, None, key), key, page_size=2)
+    grown = [{"id": "new"}] + ITEMS
+    second = paginate(resume_after(grown, first.next_cursor, key), key, page_size=2)
+    assert second.items == ITEMS[2:4]
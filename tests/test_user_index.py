@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import pytest
+from models.storage import ENGINES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tops up its own account and a shared one, printing each result
+WORKER = """
+import sys
+from models.service import RentalService
+service = RentalService()
+for _ in range(int(sys.argv[3])):
+    for username in sys.argv[1:3]:
+        print(username, int(service.top_up(username, 1).ok))
+"""
+
+
+def user(username):
+    return {"username": username, "password": "secret", "first_name": "Test", "last_name": "User", "balance": 0.0}
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_concurrent_top_ups_are_never_lost(tmp_path, engine):
+    processes, calls = 6, 60
+    storage = ENGINES[engine](str(tmp_path))
+    usernames = [f"customer{i}" for i in range(processes)]
+    for username in ["shared"] + usernames:
+        storage.add_user(user(username))
+
+    env = dict(os.environ, CAR_RENTAL_STORAGE=engine, CAR_RENTAL_DATA_DIR=str(tmp_path), CAR_RENTAL_WRITE_BEHIND="",
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER, username, "shared", str(calls)],
+                                env=env, stdout=subprocess.PIPE, text=True)
+               for username in usernames]
+    succeeded = dict.fromkeys(["shared"] + usernames, 0)
+    for worker in workers:
+        words = worker.communicate()[0].split()
+        assert worker.returncode == 0
+        for username, ok in zip(words[::2], words[1::2]):
+            succeeded[username] += int(ok)
+
+    balances = {u["username"]: u["balance"] for u in ENGINES[engine](str(tmp_path)).load_users()}
+    assert balances == succeeded
+    assert all(succeeded[username] == calls for username in usernames)